@@ -0,0 +1,27 @@
+from util import api
+from util.asgi import AsgiApp
+from util.preload_models import preload_models
+from util.setup_dirs import setup_directories
+
+
+def warm_up():
+    setup_directories()
+    # Mesmos modelos que o wsgi.py pré-carrega, antes de aceitar requisições
+    preload_models(
+        (api.Config.DEFAULT_MODEL, api.Config.LIGHT_MODEL)
+        if api.Config.MODEL_ROUTING
+        else (api.Config.DEFAULT_MODEL,)
+    )
+
+
+app = AsgiApp(
+    api.app,
+    workers=api.Config.ASGI_WORKERS,
+    on_startup=[warm_up],
+    max_body_sizes={"/api/batch/remove-background": api.Config.BATCH_MAX_CONTENT_LENGTH},
+)
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("asgi:app", host="0.0.0.0", port=8000)
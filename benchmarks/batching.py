@@ -0,0 +1,73 @@
+"""
+Throughput x latência: inferência por imagem versus micro-batching.
+
+Dispara N requisições de C threads concorrentes contra a sessão do modelo
+(caminho atual, uma inferência por imagem) e contra BatchingSession com
+diferentes tamanhos de batch e tempos de espera.
+
+Uso:
+    python -m benchmarks.batching --requests 64 --concurrency 8 --batch-sizes 2 4 8
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from util.batching import BatchingSession
+from util.constants import DEFAULT_MODEL, PATH_INPUT_TEST
+from util.sessions import get_session
+
+
+def run(predict, image, requests: int, concurrency: int) -> dict:
+    def timed(_):
+        start = time.perf_counter()
+        predict(image)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "images_per_sec": round(requests / elapsed, 2),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--image", default=PATH_INPUT_TEST)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[5, 20])
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB")
+    session = get_session(args.model)
+    session.predict(image)  # aquecimento
+
+    rows = [("per-image", "-", run(session.predict, image, args.requests, args.concurrency))]
+    for batch_size in args.batch_sizes:
+        for wait_ms in args.wait_ms:
+            batcher = BatchingSession(session, batch_size, wait_ms)
+            result = run(batcher.predict, image, args.requests, args.concurrency)
+            result["avg_batch"] = batcher.stats()["avg_batch"]
+            rows.append((f"batch={batch_size}", wait_ms, result))
+
+    print(f"{'mode':>12}{'wait_ms':>9}{'img/s':>9}{'p50_ms':>9}{'p95_ms':>9}{'avg_batch':>11}")
+    for mode, wait_ms, result in rows:
+        print(
+            f"{mode:>12}{wait_ms:>9}{result['images_per_sec']:>9}"
+            f"{result['p50_ms']:>9}{result['p95_ms']:>9}{result.get('avg_batch', 1):>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
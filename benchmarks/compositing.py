@@ -0,0 +1,103 @@
+"""
+Pico de memória e latência da composição: caminho direto versus faixas.
+
+direto: naive_cutout + Image.new + alpha_composite na imagem inteira e
+Image.save do PNG. faixas: util.tiling, com o PNG escrito faixa a faixa. A
+máscara é sintética, então o modelo não é usado. Cada medida roda num processo
+novo para que o pico de RSS (ru_maxrss) seja só dela.
+
+Uso:
+    python -m benchmarks.compositing --megapixels 12 24 48 --rows 256
+"""
+
+import argparse
+import io
+import multiprocessing
+import resource
+import time
+
+from PIL import Image, ImageDraw
+
+from benchmarks.resolution import synthetic_image
+
+
+def _inputs(megapixels: float):
+    image = synthetic_image(megapixels)
+    mask = Image.new("L", image.size, 0)
+    width, height = image.size
+    ImageDraw.Draw(mask).ellipse(
+        (width // 4, height // 6, 3 * width // 4, 5 * height // 6), fill=255
+    )
+    return image, mask
+
+
+def _run(megapixels: float, tiled: bool, rows: int, compression: int, queue) -> None:
+    from rembg.bg import naive_cutout
+
+    from util.tiling import composite_strips, write_png
+
+    image, mask = _inputs(megapixels)
+    image.load()
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    buffer = io.BytesIO()
+    if tiled:
+        strips = composite_strips(image, mask, "#ffffff", rows)
+        write_png(strips, image.size, buffer, compression)
+    else:
+        cutout = naive_cutout(image, mask)
+        output = Image.new(mode="RGBA", size=cutout.size, color="#ffffff")
+        output.alpha_composite(cutout)
+        output.save(buffer, "PNG", compress_level=compression)
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(
+        {
+            "ms": round(elapsed * 1000, 1),
+            # A saída comprimida também fica em memória nos dois casos
+            "peak_delta_mb": round((peak_kb - baseline_kb) / 1024, 1),
+            "output_mb": round(len(buffer.getvalue()) / 1024 / 1024, 1),
+        }
+    )
+
+
+def measure(megapixels: float, tiled: bool, rows: int, compression: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_run, args=(megapixels, tiled, rows, compression, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 24, 48])
+    parser.add_argument("--rows", type=int, default=256)
+    parser.add_argument("--compression", type=int, default=1)
+    args = parser.parse_args()
+
+    columns = ["megapixels", "direct_ms", "tiled_ms", "direct_mb", "tiled_mb", "direct_out", "tiled_out"]
+    print("".join(f"{column:>12}" for column in columns))
+    for megapixels in args.megapixels:
+        direct = measure(megapixels, False, args.rows, args.compression)
+        tiled = measure(megapixels, True, args.rows, args.compression)
+        row = [
+            megapixels,
+            direct["ms"],
+            tiled["ms"],
+            direct["peak_delta_mb"],
+            tiled["peak_delta_mb"],
+            direct["output_mb"],
+            tiled["output_mb"],
+        ]
+        print("".join(f"{value:>12}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
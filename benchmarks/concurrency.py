@@ -0,0 +1,205 @@
+"""
+Concorrência: Gunicorn do startup.sh (gthread) versus o modo ASGI (uvicorn).
+
+Abre N clientes lentos, que enviam um upload de um byte por segundo, e mede
+em paralelo a latência e o throughput de clientes normais. No Gunicorn cada
+upload lento ocupa uma das GUNICORN_THREADS threads até terminar; no modo ASGI
+o corpo é lido no event loop e o pool (ASGI_WORKERS) só recebe requisições
+completas. Os dois servidores usam o mesmo número de threads. Também mede o
+RSS da árvore de processos do servidor com os clientes lentos conectados.
+
+Sem o modelo disponível use --path /api/health, que mede só o servidor.
+
+Uso:
+    python -m benchmarks.concurrency --slow-clients 0 64 1000 --requests 40
+    python -m benchmarks.concurrency --path "/api/process?name=bench.jpg" --megapixels 2
+"""
+
+import argparse
+import asyncio
+import http.client
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.download import free_port
+from benchmarks.suite import BENCH_ENV, jpeg_bytes, summarize
+from benchmarks.resolution import synthetic_image
+from util.constants import BASE_DIR
+
+
+def start(server: str, port: int, threads: int) -> subprocess.Popen:
+    env = dict(os.environ, **BENCH_ENV)
+    if server == "gunicorn":
+        # Mesma linha do startup.sh, com 1 worker de `threads` threads
+        env.update(
+            GUNICORN_BIND=f"127.0.0.1:{port}",
+            GUNICORN_WORKERS="1",
+            GUNICORN_THREADS=str(threads),
+            GUNICORN_LOG_LEVEL="warning",
+        )
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+    else:
+        env["ASGI_WORKERS"] = str(threads)
+        command = [
+            sys.executable, "-m", "uvicorn", "asgi:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ]
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/api/health")
+            if connection.getresponse().status == 200:
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{server} did not start")
+
+
+def tree_rss_mb(pid: int) -> float:
+    """RSS somado do processo e dos filhos (Linux)."""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+            with open(f"/proc/{current}/task/{current}/children") as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            continue
+    return round(total / 1024, 1)
+
+
+class SlowClients:
+    """Clientes que abrem um POST e enviam o corpo a um byte por segundo."""
+
+    def __init__(self, port: int, count: int):
+        self.port = port
+        self.count = count
+        self.connected = 0
+        self._loop = asyncio.new_event_loop()
+        self._stop = None
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(self._run(),))
+
+    async def _client(self) -> None:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        except OSError:
+            return
+        self.connected += 1
+        writer.write(
+            b"POST /api/upload HTTP/1.1\r\nHost: localhost\r\n"
+            # multipart: o Flask lê o corpo inteiro para montar request.files
+            b"Content-Type: multipart/form-data; boundary=x\r\n"
+            b"Content-Length: 1000000\r\n\r\n"
+        )
+        try:
+            while not self._stop.is_set():
+                writer.write(b"x")
+                await writer.drain()
+                try:
+                    await asyncio.wait_for(self._stop.wait(), 1)
+                except asyncio.TimeoutError:
+                    pass
+        except OSError:
+            pass
+        finally:
+            writer.close()
+
+    async def _run(self) -> None:
+        self._stop = asyncio.Event()
+        await asyncio.gather(*(self._client() for _ in range(self.count)))
+
+    def __enter__(self):
+        self._thread.start()
+        deadline = time.time() + 30
+        while self.connected < self.count and time.time() < deadline:
+            time.sleep(0.1)
+        time.sleep(1)  # deixa os servidores aceitarem e despacharem as conexões
+        return self
+
+    def __exit__(self, *exc_info):
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join()
+        self._loop.close()
+
+
+def active_requests(
+    port: int, path: str, body: bytes | None, requests: int, concurrency: int, timeout: float
+) -> dict:
+    """Requisições normais; as que passam de `timeout` segundos contam como falha."""
+    method = "POST" if body else "GET"
+
+    def send(_):
+        start = time.perf_counter()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+            connection.request(method, path, body=body)
+            response = connection.getresponse()
+            response.read()
+            connection.close()
+            status = response.status
+        except OSError:
+            status = None
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(send, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "ok": sum(1 for _, status in results if status == 200),
+        "req_per_sec": round(requests / elapsed, 2),
+        **summarize([latency for latency, _ in results]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--servers", nargs="+", default=["gunicorn", "asgi"])
+    parser.add_argument("--slow-clients", type=int, nargs="+", default=[0, 64, 1000])
+    parser.add_argument("--threads", type=int, default=4, help="Threads of each server")
+    parser.add_argument("--path", default="/api/health")
+    parser.add_argument("--megapixels", type=float, default=2, help="Body for POST paths")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=10)
+    args = parser.parse_args()
+
+    body = None
+    if args.path.startswith("/api/process"):
+        body = jpeg_bytes(synthetic_image(args.megapixels))
+
+    columns = ["ok", "req_per_sec", "p50_ms", "p95_ms", "rss_mb"]
+    print(f"{'server':>10}{'slow':>8}" + "".join(f"{column:>13}" for column in columns))
+    for server in args.servers:
+        port = free_port()
+        process = start(server, port, args.threads)
+        try:
+            for slow in args.slow_clients:
+                with SlowClients(port, slow):
+                    result = active_requests(
+                        port, args.path, body, args.requests, args.concurrency, args.timeout
+                    )
+                    result["rss_mb"] = tree_rss_mb(process.pid)
+                print(
+                    f"{server:>10}{slow:>8}"
+                    + "".join(f"{result[column]:>13}" for column in columns)
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
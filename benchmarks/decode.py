@@ -0,0 +1,86 @@
+"""
+Decodificação de JPEGs grandes na resolução da inferência: completa + redução
+versus modo draft (DCT em 1/2, 1/4 ou 1/8) + redução.
+
+Cada medida roda num processo novo para que o pico de RSS (ru_maxrss) seja só
+dela. Não usa o modelo: mede o que acontece antes da inferência.
+
+Uso:
+    python -m benchmarks.decode --megapixels 12 24 48 --max-side 1024 512
+"""
+
+import argparse
+import io
+import multiprocessing
+import resource
+import statistics
+import time
+
+from PIL import Image, ImageOps
+
+from benchmarks.resolution import synthetic_image
+
+
+def _run(data: bytes, max_side: int, draft: bool, iterations: int, queue) -> None:
+    from util.ImageHandler import ImageHandler
+
+    def decode():
+        image = Image.open(io.BytesIO(data))
+        if draft:
+            return ImageHandler._decode_reduced(image, max_side)
+        return ImageHandler._downscale(ImageOps.exif_transpose(image), max_side)
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        decode()
+        latencies.append(time.perf_counter() - start)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(
+        {
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            "peak_delta_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        }
+    )
+
+
+def measure(data: bytes, max_side: int, draft: bool, iterations: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(data, max_side, draft, iterations, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[12, 24, 48])
+    parser.add_argument("--max-side", type=int, nargs="+", default=[1024, 512])
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args()
+
+    columns = ["megapixels", "max_side", "full_ms", "draft_ms", "full_mb", "draft_mb"]
+    print("".join(f"{column:>12}" for column in columns))
+    for megapixels in args.megapixels:
+        buffer = io.BytesIO()
+        synthetic_image(megapixels).save(buffer, "JPEG", quality=90)
+        data = buffer.getvalue()
+        for max_side in args.max_side:
+            full = measure(data, max_side, False, args.iterations)
+            draft = measure(data, max_side, True, args.iterations)
+            row = [
+                megapixels,
+                max_side,
+                full["mean_ms"],
+                draft["mean_ms"],
+                full["peak_delta_mb"],
+                draft["peak_delta_mb"],
+            ]
+            print("".join(f"{value:>12}" for value in row))
+
+
+if __name__ == "__main__":
+    main()
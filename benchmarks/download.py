@@ -0,0 +1,138 @@
+"""
+Throughput de /api/download num Gunicorn real.
+
+Compara o envio com sendfile (padrão do Gunicorn com o caminho do arquivo) e
+sem sendfile (--no-sendfile, o arquivo passa pelo Python em blocos), e para
+cada um os clientes que sempre baixam o arquivo inteiro (comportamento de
+antes, sem ETag) com os que revalidam com If-None-Match e recebem 304.
+
+Uso:
+    python -m benchmarks.download --requests 500 --concurrency 8 --megapixels 12
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from util.constants import BASE_DIR, PATH_OUTPUT
+
+FILE_NAME = "bench_download.png"
+
+
+def make_file(megapixels: float) -> int:
+    """PNG RGBA de ruído (incompressível) com o tamanho pedido; retorna os bytes."""
+    side = int((megapixels * 1_000_000) ** 0.5)
+    pixels = np.random.default_rng(0).integers(0, 256, (side, side, 4), dtype=np.uint8)
+    path = os.path.join(PATH_OUTPUT, FILE_NAME)
+    Image.fromarray(pixels, mode="RGBA").save(path, compress_level=1)
+    return os.path.getsize(path)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, sendfile: bool, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable, "-m", "gunicorn",
+        "--bind", f"127.0.0.1:{port}",
+        "--workers", str(workers),
+        "--threads", "4",
+        "--log-level", "warning",
+        "util.api:app",
+    ]
+    if not sendfile:
+        command.append("--no-sendfile")
+    # Sem limite de requisições por minuto durante a medida
+    env = dict(os.environ, RATELIMIT_ENABLED="0")
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    for _ in range(100):
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return server
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Gunicorn did not start")
+
+
+def run(port: int, requests: int, concurrency: int, conditional: bool) -> dict:
+    path = f"/api/download?file={FILE_NAME}"
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", path)
+    response = connection.getresponse()
+    etag = response.getheader("ETag")
+    response.read()
+    headers = {"If-None-Match": etag} if conditional else {}
+
+    def fetch(_):
+        client = http.client.HTTPConnection("127.0.0.1", port)
+        start = time.perf_counter()
+        client.request("GET", path, headers=headers)
+        response = client.getresponse()
+        size = len(response.read())
+        client.close()
+        return time.perf_counter() - start, response.status, size
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(result[0] for result in results)
+    statuses = {result[1] for result in results}
+    transferred = sum(result[2] for result in results)
+    return {
+        "status": ",".join(map(str, sorted(statuses))),
+        "req_per_sec": round(requests / elapsed, 1),
+        "mb_per_sec": round(transferred / elapsed / 1024 / 1024, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    size = make_file(args.megapixels)
+    print(f"File: {size / 1024 / 1024:.1f} MB, {args.requests} requests, "
+          f"concurrency {args.concurrency}")
+    columns = ["status", "req_per_sec", "mb_per_sec", "p50_ms", "p95_ms"]
+    print(f"{'scenario':>28}" + "".join(f"{column:>14}" for column in columns))
+    try:
+        for sendfile in (False, True):
+            port = free_port()
+            server = start_server(port, sendfile, args.workers)
+            try:
+                for conditional in (False, True):
+                    result = run(port, args.requests, args.concurrency, conditional)
+                    scenario = (
+                        f"{'sendfile' if sendfile else 'no-sendfile'}"
+                        f" + {'If-None-Match' if conditional else 'full GET'}"
+                    )
+                    print(f"{scenario:>28}" + "".join(f"{result[c]:>14}" for c in columns))
+            finally:
+                server.terminate()
+                server.wait()
+    finally:
+        os.remove(os.path.join(PATH_OUTPUT, FILE_NAME))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Latência do fluxo em três chamadas (upload, remove-background, download)
+versus /api/process, que decodifica, processa e responde sem passar pelo disco.
+
+Usa o test client do Flask, então mede o custo da aplicação sem a rede. O
+cache de resultados e o reaproveitamento das saídas já gravadas são desligados
+para que as duas rotas façam a inferência.
+
+Uso:
+    python -m benchmarks.in_memory_path --iterations 20
+"""
+
+import argparse
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from util import api
+from util.cache import ResultCache
+from util.constants import PATH_INPUT_TEST
+from util.storage import FileStore
+
+
+class FreshOutputs(FileStore):
+    """Saídas que nunca constam como gravadas: toda chamada processa de novo."""
+
+    def exists(self, file_id: str) -> bool:
+        return False
+
+
+def three_calls(client, data: bytes, file_name: str) -> None:
+    response = client.post(
+        "/api/upload",
+        data={"file": (io.BytesIO(data), file_name)},
+        content_type="multipart/form-data",
+    )
+    file_id = response.json["id"]
+    response = client.post("/api/remove-background", query_string={"id": file_id})
+    assert response.status_code == 200, response.json
+    response = client.get("/api/download", query_string={"id": response.json["id"]})
+    assert response.status_code == 200
+    response.close()
+
+
+def in_memory(client, data: bytes, file_name: str) -> None:
+    response = client.post("/api/process", query_string={"name": file_name}, data=data)
+    assert response.status_code == 200, response.json
+    response.close()
+
+
+def measure(flow, client, data: bytes, file_name: str, iterations: int) -> dict:
+    flow(client, data, file_name)  # aquecimento
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        flow(client, data, file_name)
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--image", default=PATH_INPUT_TEST)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    api.limiter.enabled = False
+    api.result_cache = ResultCache(max_bytes=0)
+    with open(args.image, "rb") as f:
+        data = f.read()
+    file_name = f"bench_{os.path.basename(args.image)}"
+
+    with tempfile.TemporaryDirectory() as tmp_dir, api.app.test_client() as client:
+        api.uploads = FileStore(os.path.join(tmp_dir, "entrada"))
+        api.outputs = FreshOutputs(os.path.join(tmp_dir, "saida"))
+        api.originals = FileStore(os.path.join(tmp_dir, "originais"))
+        results = {
+            "upload + remove + download": measure(
+                three_calls, client, data, file_name, args.iterations
+            ),
+            "/api/process": measure(in_memory, client, data, file_name, args.iterations),
+        }
+
+    print(f"{'flow':>28}{'mean_ms':>10}{'p50_ms':>10}{'p95_ms':>10}")
+    for flow, result in results.items():
+        print(
+            f"{flow:>28}{result['mean_ms']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Comparação dos modelos permitidos: latência, memória e IoU da máscara.
+
+Cada modelo roda num processo novo sobre o mesmo conjunto local de imagens. O
+RSS é lido depois de carregar o modelo e processar o conjunto; a IoU compara a
+máscara binarizada (alfa >= 128) de cada modelo com a do modelo de referência
+(o primeiro da lista).
+
+Uso:
+    python -m benchmarks.models --images imagens/originais
+    python -m benchmarks.models --models u2net u2netp silueta isnet-general-use
+"""
+
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import statistics
+import time
+
+import numpy as np
+from PIL import Image
+
+from util.batch import find_images
+from util.constants import ALLOWED_MODELS, PATH_INPUT
+
+
+def _run(model_name: str, paths: list, queue) -> None:
+    from rembg import remove
+
+    from util.sessions import get_session
+
+    start = time.perf_counter()
+    session = get_session(model_name)
+    load_seconds = time.perf_counter() - start
+
+    latencies, masks = [], []
+    for path in paths:
+        image = Image.open(path).convert("RGB")
+        start = time.perf_counter()
+        mask = remove(image, session=session, only_mask=True)
+        latencies.append(time.perf_counter() - start)
+        buffer = io.BytesIO()
+        mask.save(buffer, "PNG")
+        masks.append(buffer.getvalue())
+
+    queue.put(
+        {
+            "model": model_name,
+            "load_s": round(load_seconds, 2),
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "masks": masks,
+        }
+    )
+
+
+def measure(model_name: str, paths: list) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(model_name, paths, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def iou(mask: bytes, reference: bytes) -> float:
+    a = np.asarray(Image.open(io.BytesIO(mask))) >= 128
+    b = np.asarray(Image.open(io.BytesIO(reference))) >= 128
+    union = np.logical_or(a, b).sum()
+    return float(np.logical_and(a, b).sum() / union) if union else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--images", default=PATH_INPUT)
+    parser.add_argument("--models", nargs="+", default=ALLOWED_MODELS)
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.images, path) for path in find_images(args.images)]
+    if not paths:
+        parser.error(f"No images found in {args.images}")
+
+    results = [measure(model_name, paths) for model_name in args.models]
+    reference = results[0]["masks"]
+    for result in results:
+        result["iou"] = round(
+            statistics.mean(iou(m, r) for m, r in zip(result.pop("masks"), reference)), 4
+        )
+
+    print(f"{len(paths)} images, IoU against {args.models[0]}")
+    columns = ["model", "load_s", "mean_ms", "p50_ms", "rss_mb", "iou"]
+    print("".join(f"{column:>20}" for column in columns))
+    for result in results:
+        print("".join(f"{result[column]:>20}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
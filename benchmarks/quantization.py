@@ -0,0 +1,70 @@
+"""
+FP32 versus INT8: latência, throughput e diferença das máscaras.
+
+Roda o modelo original e a variante quantizada (gerada por util.quantize) no
+mesmo conjunto de imagens, cada um num processo novo, e compara as máscaras da
+variante com as do FP32: IoU da máscara binarizada e erro absoluto médio (MAE)
+do alfa, de 0 a 1.
+
+Uso:
+    python -m util.quantize --model u2net --mode static
+    python -m benchmarks.quantization --model u2net --images imagens/originais
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+
+import numpy as np
+from PIL import Image
+
+from benchmarks.models import iou, measure
+from util.batch import find_images
+from util.constants import DEFAULT_MODEL, PATH_INPUT
+from util.sessions import QUANTIZED_SUFFIX
+
+
+def mae(mask: bytes, reference: bytes) -> float:
+    a = np.asarray(Image.open(io.BytesIO(mask)), dtype=np.float32)
+    b = np.asarray(Image.open(io.BytesIO(reference)), dtype=np.float32)
+    return float(np.abs(a - b).mean() / 255)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--images", default=PATH_INPUT)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    paths = [os.path.join(args.images, path) for path in find_images(args.images)]
+    if not paths:
+        parser.error(f"No images found in {args.images}")
+
+    results = [
+        measure(model_name, paths)
+        for model_name in (args.model, f"{args.model}{QUANTIZED_SUFFIX}")
+    ]
+    reference = results[0]["masks"]
+    for result in results:
+        masks = result.pop("masks")
+        result["images_per_sec"] = round(1000 / result["mean_ms"], 2)
+        result["iou"] = round(statistics.mean(map(iou, masks, reference)), 4)
+        result["mae"] = round(statistics.mean(map(mae, masks, reference)), 4)
+    results[1]["speedup"] = round(results[0]["mean_ms"] / results[1]["mean_ms"], 2)
+    results[0]["speedup"] = 1.0
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{len(paths)} images, masks compared with {args.model} (FP32)")
+    columns = ["model", "mean_ms", "p50_ms", "images_per_sec", "speedup", "rss_mb", "iou", "mae"]
+    print("".join(f"{column:>16}" for column in columns))
+    for result in results:
+        print("".join(f"{result[column]:>16}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Latência e pico de memória da remoção de fundo por resolução de inferência.
+
+Gera imagens sintéticas de vários tamanhos e mede cada combinação de tamanho e
+max_side num processo novo, para que o pico de RSS (ru_maxrss) de uma medida
+não contamine a seguinte. O cache de máscaras é desligado.
+
+Uso:
+    python -m benchmarks.resolution --megapixels 2 8 24 --max-side 0 2048 1024 512
+"""
+
+import argparse
+import json
+import multiprocessing
+import resource
+import statistics
+import time
+
+from PIL import Image, ImageDraw
+
+
+def synthetic_image(megapixels: float) -> Image.Image:
+    """Foto 3:2 com um objeto central sobre um fundo em gradiente."""
+    width = int((megapixels * 1_000_000 * 1.5) ** 0.5)
+    height = int(width / 1.5)
+    image = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    draw.ellipse(
+        (width // 4, height // 6, 3 * width // 4, 5 * height // 6), fill=(200, 60, 40)
+    )
+    return image
+
+
+def _run(megapixels: float, max_side: int | None, iterations: int, queue) -> None:
+    import io
+
+    from util import ImageHandler as image_handler_module
+    from util.ImageHandler import ImageHandler
+    from util.cache import ResultCache
+
+    image_handler_module.mask_cache = ResultCache(max_bytes=0)
+    buffer = io.BytesIO()
+    synthetic_image(megapixels).save(buffer, "JPEG", quality=90)
+    data = buffer.getvalue()
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    ImageHandler("bench.jpg", data=data).remove_background(max_side)  # aquecimento
+    latencies = []
+    for _ in range(iterations):
+        handler = ImageHandler("bench.jpg", data=data)
+        start = time.perf_counter()
+        handler.remove_background(max_side)
+        latencies.append(time.perf_counter() - start)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put(
+        {
+            "megapixels": megapixels,
+            "max_side": max_side or "full",
+            "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+            "p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "peak_rss_mb": round(peak_kb / 1024, 1),
+            "peak_delta_mb": round((peak_kb - baseline_kb) / 1024, 1),
+        }
+    )
+
+
+def measure(megapixels: float, max_side: int | None, iterations: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_run, args=(megapixels, max_side, iterations, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[2, 8, 24])
+    parser.add_argument(
+        "--max-side", type=int, nargs="+", default=[0, 2048, 1024, 512], help="0 = full"
+    )
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = [
+        measure(megapixels, max_side or None, args.iterations)
+        for megapixels in args.megapixels
+        for max_side in args.max_side
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    columns = ["megapixels", "max_side", "mean_ms", "p50_ms", "peak_rss_mb", "peak_delta_mb"]
+    print("".join(f"{column:>14}" for column in columns))
+    for result in results:
+        print("".join(f"{result[column]:>14}" for column in columns))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Relatório de memória por worker do Gunicorn.
+
+Sobe o gunicorn com gunicorn.conf.py, opcionalmente faz algumas requisições de
+aquecimento e lê /proc/<pid>/smaps_rollup do master e de cada worker. O PSS
+(proportional set size) divide as páginas compartilhadas entre os processos,
+então a soma do PSS é o consumo real do container; o RSS conta as páginas
+herdadas do master em cada worker.
+
+Uso (Linux):
+    python -m benchmarks.rss_per_worker --workers 4 --warmup 4
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+from util.constants import BASE_DIR
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def read_memory(pid: int) -> dict:
+    """Lê os campos de memória (em MB) de /proc/<pid>/smaps_rollup."""
+    memory = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            name = parts[0].rstrip(":")
+            if name in FIELDS:
+                memory[name] = round(int(parts[1]) / 1024, 1)
+    return memory
+
+
+def children(pid: int) -> list:
+    result = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            result.extend(int(child) for child in f.read().split())
+    return sorted(result)
+
+
+def wait_for_workers(pid: int, workers: int, timeout: float) -> list:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        pids = children(pid)
+        if len(pids) >= workers:
+            return pids
+        time.sleep(0.5)
+    raise TimeoutError(f"Gunicorn did not start {workers} workers in {timeout}s")
+
+
+def wait_for_health(url: str, timeout: float) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"{url}/api/health", timeout=2)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"{url} did not answer in {timeout}s")
+
+
+def warmup(url: str, requests: int, file_name: str) -> None:
+    for _ in range(requests):
+        request = urllib.request.Request(
+            f"{url}/api/remove-background?file={file_name}", method="POST"
+        )
+        urllib.request.urlopen(request, timeout=300)
+
+
+def report(args) -> dict:
+    env = dict(
+        os.environ,
+        GUNICORN_BIND=f"127.0.0.1:{args.port}",
+        GUNICORN_WORKERS=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        GUNICORN_PRELOAD="1" if args.preload else "0",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=BASE_DIR,
+        env=env,
+    )
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        worker_pids = wait_for_workers(process.pid, args.workers, args.timeout)
+        wait_for_health(url, args.timeout)
+        warmup(url, args.warmup, args.file)
+        workers = {pid: read_memory(pid) for pid in worker_pids}
+        master = read_memory(process.pid)
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+    total_pss = master["Pss"] + sum(worker["Pss"] for worker in workers.values())
+    return {
+        "preload": args.preload,
+        "workers": args.workers,
+        "threads": args.threads,
+        "warmup_requests": args.warmup,
+        "master": master,
+        "per_worker": workers,
+        "total_pss_mb": round(total_pss, 1),
+    }
+
+
+def print_table(result: dict) -> None:
+    header = f"{'process':>14}" + "".join(f"{field:>15}" for field in FIELDS)
+    print(header)
+    rows = [("master", result["master"])]
+    rows += [(f"worker {pid}", memory) for pid, memory in result["per_worker"].items()]
+    for name, memory in rows:
+        print(f"{name:>14}" + "".join(f"{memory.get(f, 0):>15}" for f in FIELDS))
+    print(f"Total PSS: {result['total_pss_mb']} MB (preload={result['preload']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--preload", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--warmup", type=int, default=0, help="Requests before measuring")
+    parser.add_argument("--file", default="teste.jpg", help="File in imagens/entrada")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    result = report(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_table(result)
+
+
+if __name__ == "__main__":
+    main()
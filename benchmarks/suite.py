@@ -0,0 +1,349 @@
+"""
+Suíte de benchmarks reproduzível do pipeline e da API, com saída em JSON.
+
+Pipeline: para cada imagem (sintéticas de --megapixels e as do repositório em
+--images) mede remove_background, add_background e save do ImageHandler, cada
+operação num processo novo: latência, pico de RSS acima do processo já aquecido
+e o tempo médio de cada etapa (util.metrics). Como o recorte é aplicado só na
+gravação, remove_background/add_background medem decode + inferência e save
+mede composição, encode e escrita.
+
+API: throughput de POST /api/process com N clientes simultâneos, pelo test
+client do Flask ou, com --gunicorn, num Gunicorn local.
+
+Os caches e o rate limit ficam desligados e as imagens sintéticas são sempre
+as mesmas, então execuções na mesma máquina são comparáveis: grave o JSON por
+commit e use --compare para ver a variação em relação a um resultado anterior.
+
+Uso:
+    python -m benchmarks.suite --output benchmarks/results/$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --quick --compare benchmarks/results/abc1234.json
+    python -m benchmarks.suite --gunicorn --workers 2 --concurrency 1 4 8
+"""
+
+import argparse
+import http.client
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+
+from benchmarks.resolution import synthetic_image
+from util.constants import BASE_DIR, DEFAULT_MODEL, PATH_INPUT_TEST
+
+OPERATIONS = ("remove_background", "add_background", "save")
+PACKAGES = ("numpy", "onnxruntime", "pillow", "rembg", "flask", "gunicorn")
+# Sem cache nem rate limit nos processos medidos; vai para o ambiente antes de
+# criar os processos, que leem util.constants ao importar este módulo
+BENCH_ENV = {
+    "RESULT_CACHE_MAX_BYTES": "0",
+    "MASK_CACHE_MAX_BYTES": "0",
+    "RATELIMIT_ENABLED": "0",
+}
+
+
+def jpeg_bytes(image, quality: int = 90) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def load_images(megapixels: list, paths: list) -> list:
+    """(nome, bytes JPEG/PNG) das imagens sintéticas e dos arquivos informados."""
+    images = [
+        (f"synthetic-{mp:g}mp.jpg", jpeg_bytes(synthetic_image(mp))) for mp in megapixels
+    ]
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append((os.path.basename(path), f.read()))
+    return images
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[max(0, int(round(len(values) * fraction)) - 1)]
+
+
+def summarize(latencies: list) -> dict:
+    return {
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+    }
+
+
+def _run_operation(
+    name: str, data: bytes, operation: str, iterations: int, model_name: str, queue
+) -> None:
+    from util import metrics
+    from util.ImageHandler import ImageHandler
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+
+        def handler():
+            # Entrada em memória e saídas no diretório temporário
+            instance = ImageHandler(os.path.join(tmp_dir, name), model_name, data=data)
+            instance.output_path = os.path.join(tmp_dir, f"out-{name}.png")
+            instance.originals_path = os.path.join(tmp_dir, f"original-{name}")
+            return instance
+
+        # Aquecimento com uma imagem pequena: carrega o modelo sem elevar o pico
+        small = ImageHandler(
+            os.path.join(tmp_dir, "warmup.jpg"), model_name,
+            data=jpeg_bytes(synthetic_image(0.1)),
+        )
+        small.remove_background()
+        small.encode()
+        baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        latencies = []
+        stages = metrics.Histogram("stages", "", "stage")
+        for _ in range(iterations):
+            instance = handler()
+            if operation == "save":
+                instance.remove_background()
+            # Só as etapas da operação medida
+            metrics.stage_seconds.clear()
+            start = time.perf_counter()
+            if operation == "remove_background":
+                instance.remove_background()
+            elif operation == "add_background":
+                instance.add_background("#ffffff")
+            else:
+                instance.save()
+            latencies.append(time.perf_counter() - start)
+            stages.merge(metrics.stage_seconds.snapshot())
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        width, height = instance.image.size
+
+    # Média por execução da operação (uma etapa pode rodar mais de uma vez)
+    stages_ms = {
+        stage: round(series["sum"] / iterations * 1000, 1)
+        for stage, series in sorted(stages.snapshot().items())
+    }
+    queue.put(
+        {
+            "image": name,
+            "megapixels": round(width * height / 1_000_000, 2),
+            "operation": operation,
+            "iterations": iterations,
+            **summarize(latencies),
+            "peak_delta_mb": round((peak_kb - baseline_kb) / 1024, 1),
+            "stages_ms": stages_ms,
+        }
+    )
+
+
+def measure_operation(
+    name: str, data: bytes, operation: str, iterations: int, model_name: str
+) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(
+        target=_run_operation, args=(name, data, operation, iterations, model_name, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def _fire(send, requests: int, concurrency: int) -> dict:
+    """Executa `send` (que retorna o status HTTP) `requests` vezes com `concurrency` threads."""
+
+    def timed(_):
+        start = time.perf_counter()
+        status = send()
+        return time.perf_counter() - start, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, range(requests)))
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": sum(1 for _, status in results if status != 200),
+        "req_per_sec": round(requests / elapsed, 2),
+        **summarize([latency for latency, _ in results]),
+    }
+
+
+def _run_api_client(data: bytes, requests: int, concurrencies: list, queue) -> None:
+    from util.api import app
+
+    path = "/api/process?name=bench.jpg"
+
+    def send():
+        with app.test_client() as client:
+            response = client.post(path, data=data)
+            response.close()
+            return response.status_code
+
+    send()  # aquecimento
+    queue.put([dict(_fire(send, requests, c), mode="flask") for c in concurrencies])
+
+
+def measure_api(
+    data: bytes, requests: int, concurrencies: list, gunicorn: bool = False, workers: int = 2
+) -> list:
+    """Throughput de /api/process com o modelo de REMBG_MODEL no ambiente."""
+    if not gunicorn:
+        context = multiprocessing.get_context("spawn")
+        queue = context.Queue()
+        process = context.Process(
+            target=_run_api_client, args=(data, requests, concurrencies, queue)
+        )
+        process.start()
+        results = queue.get()
+        process.join()
+        return results
+
+    from benchmarks.download import free_port, start_server
+
+    port = free_port()
+    server = start_server(port, sendfile=True, workers=workers)
+    path = "/api/process?name=bench.jpg"
+
+    def send():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        connection.request("POST", path, body=data, headers={"Content-Type": "image/jpeg"})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        return response.status
+
+    try:
+        for _ in range(workers):
+            send()  # aquecimento de cada worker (aproximado)
+        return [
+            dict(_fire(send, requests, c), mode=f"gunicorn-{workers}w") for c in concurrencies
+        ]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def environment(model_name: str) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpu_count": os.cpu_count(),
+        "model": model_name,
+        "packages": versions,
+    }
+
+
+def compare(previous: dict, current: dict) -> list:
+    """Linhas com a variação de p50 (pipeline) e req/s (API) entre dois resultados."""
+    lines = []
+    old = {(r["image"], r["operation"]): r for r in previous.get("pipeline", [])}
+    for result in current["pipeline"]:
+        before = old.get((result["image"], result["operation"]))
+        if before and before["p50_ms"]:
+            change = (result["p50_ms"] / before["p50_ms"] - 1) * 100
+            lines.append(
+                f"{result['image']:>24} {result['operation']:>18} p50 "
+                f"{before['p50_ms']:>9} -> {result['p50_ms']:>9} ms ({change:+.1f}%)"
+            )
+    old = {(r["mode"], r["concurrency"]): r for r in previous.get("api", [])}
+    for result in current["api"]:
+        before = old.get((result["mode"], result["concurrency"]))
+        if before and before["req_per_sec"]:
+            change = (result["req_per_sec"] / before["req_per_sec"] - 1) * 100
+            lines.append(
+                f"{result['mode']:>24} {'concurrency ' + str(result['concurrency']):>18} "
+                f"req/s {before['req_per_sec']:>7} -> {result['req_per_sec']:>7} ({change:+.1f}%)"
+            )
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--megapixels", type=float, nargs="*", default=[1, 4, 12])
+    parser.add_argument("--images", nargs="*", default=[PATH_INPUT_TEST], help="Bundled images")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--api-megapixels", type=float, default=2)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--gunicorn", action="store_true", help="Measure a local Gunicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--no-api", action="store_true")
+    parser.add_argument("--quick", action="store_true", help="Small images and few iterations")
+    parser.add_argument("--output", help="Write the JSON here instead of stdout")
+    parser.add_argument("--compare", help="Previous JSON result to compare against")
+    args = parser.parse_args(argv)
+    if args.quick:
+        # Só troca o que não foi passado explicitamente
+        for name, value in (("megapixels", [0.5, 2]), ("iterations", 2), ("requests", 8)):
+            if getattr(args, name) == parser.get_default(name):
+                setattr(args, name, value)
+
+    # Herdado pelos processos medidos e pelo Gunicorn
+    os.environ.update(BENCH_ENV, REMBG_MODEL=args.model)
+    results = {"environment": environment(args.model), "pipeline": [], "api": []}
+    for name, data in load_images(args.megapixels, args.images):
+        for operation in args.operations:
+            result = measure_operation(name, data, operation, args.iterations, args.model)
+            results["pipeline"].append(result)
+            print(
+                f"{name:>24} {operation:>18} p50 {result['p50_ms']:>9} ms "
+                f"peak +{result['peak_delta_mb']} MB",
+                file=sys.stderr,
+            )
+    if not args.no_api:
+        data = jpeg_bytes(synthetic_image(args.api_megapixels))
+        results["api"] = measure_api(
+            data, args.requests, args.concurrency, args.gunicorn, args.workers
+        )
+        for result in results["api"]:
+            print(
+                f"{result['mode']:>24} {'concurrency ' + str(result['concurrency']):>18} "
+                f"{result['req_per_sec']} req/s, p95 {result['p95_ms']} ms, "
+                f"{result['errors']} errors",
+                file=sys.stderr,
+            )
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+        for line in compare(previous, results):
+            print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
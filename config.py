@@ -10,8 +10,95 @@ class Config:
     # File configuration
     MAX_CONTENT_LENGTH = MAX_CONTENT_LENGTH
     ALLOWED_EXTENSIONS = ALLOWED_EXTENSIONS
+    MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    DOWNLOAD_MAX_AGE = DOWNLOAD_MAX_AGE
+
+    # Output encoding
+    OUTPUT_FORMAT = OUTPUT_FORMAT
+    OUTPUT_QUALITY = OUTPUT_QUALITY
+    SYNC_COMPRESSION = SYNC_COMPRESSION
+    BACKGROUND_COMPRESSION = BACKGROUND_COMPRESSION
+    COMPOSITE_TILE_ROWS = COMPOSITE_TILE_ROWS
+
+    # Model configuration
+    DEFAULT_MODEL = DEFAULT_MODEL
+    ALLOWED_MODELS = ALLOWED_MODELS
+    MODEL_ROUTING = MODEL_ROUTING
+    LIGHT_MODEL = LIGHT_MODEL
+    ROUTING_MAX_PIXELS = ROUTING_MAX_PIXELS
+    ROUTING_QUEUE_DEPTH = ROUTING_QUEUE_DEPTH
+    INFERENCE_BATCH_SIZE = INFERENCE_BATCH_SIZE
+    INFERENCE_BATCH_WAIT_MS = INFERENCE_BATCH_WAIT_MS
+    QUALITY_PRESETS = QUALITY_PRESETS
+    DEFAULT_QUALITY = DEFAULT_QUALITY
+
+    # ONNX Runtime session options
+    ORT_INTRA_OP_THREADS = ORT_INTRA_OP_THREADS
+    ORT_INTER_OP_THREADS = ORT_INTER_OP_THREADS
+    ORT_EXECUTION_MODE = ORT_EXECUTION_MODE
+    ORT_GRAPH_OPTIMIZATION = ORT_GRAPH_OPTIMIZATION
+    ORT_CPU_MEM_ARENA = ORT_CPU_MEM_ARENA
+    ORT_MEM_PATTERN = ORT_MEM_PATTERN
+    ORT_OPTIMIZED_MODEL_DIR = ORT_OPTIMIZED_MODEL_DIR
+    QUANTIZED_MODEL_DIR = QUANTIZED_MODEL_DIR
+
+    # Async job queue
+    JOBS_DB_PATH = JOBS_DB_PATH
+    JOB_WORKERS = JOB_WORKERS
+    JOB_QUEUE_SIZE = JOB_QUEUE_SIZE
+    JOB_LEASE_TIMEOUT = JOB_LEASE_TIMEOUT
+    JOB_TTL = JOB_TTL
+
+    # Batch endpoint
+    BATCH_WORKERS = BATCH_WORKERS
+    BATCH_MAX_ITEMS = BATCH_MAX_ITEMS
+    BATCH_MAX_CONTENT_LENGTH = BATCH_MAX_CONTENT_LENGTH
+    BATCH_MAX_MEMBER_BYTES = BATCH_MAX_MEMBER_BYTES
+    BATCH_SPOOL_MEMORY_BYTES = BATCH_SPOOL_MEMORY_BYTES
+
+    # Result cache
+    RESULT_CACHE_DIR = RESULT_CACHE_DIR
+    RESULT_CACHE_MAX_BYTES = RESULT_CACHE_MAX_BYTES
+    RESULT_CACHE_MEMORY_BYTES = RESULT_CACHE_MEMORY_BYTES
+    RESULT_CACHE_RESCAN_INTERVAL = RESULT_CACHE_RESCAN_INTERVAL
+    MASK_CACHE_DIR = MASK_CACHE_DIR
+    MASK_CACHE_MAX_BYTES = MASK_CACHE_MAX_BYTES
+    MASK_CACHE_MEMORY_BYTES = MASK_CACHE_MEMORY_BYTES
+
+    # Storage backend
+    STORAGE_BACKEND = STORAGE_BACKEND
+    S3_BUCKET = S3_BUCKET
+    S3_PREFIX = S3_PREFIX
+    S3_ENDPOINT_URL = S3_ENDPOINT_URL
+    S3_REGION = S3_REGION
+    S3_MAX_POOL_CONNECTIONS = S3_MAX_POOL_CONNECTIONS
+    S3_MULTIPART_THRESHOLD = S3_MULTIPART_THRESHOLD
+    S3_MULTIPART_CHUNKSIZE = S3_MULTIPART_CHUNKSIZE
+    PRESIGNED_URL_EXPIRES = PRESIGNED_URL_EXPIRES
+
+    # Retention of entrada/, saida/ and originais/
+    INPUT_TTL = INPUT_TTL
+    INPUT_MAX_BYTES = INPUT_MAX_BYTES
+    OUTPUT_TTL = OUTPUT_TTL
+    OUTPUT_MAX_BYTES = OUTPUT_MAX_BYTES
+    ORIGINALS_TTL = ORIGINALS_TTL
+    ORIGINALS_MAX_BYTES = ORIGINALS_MAX_BYTES
+    RETENTION_INTERVAL = RETENTION_INTERVAL
+    RETENTION_SHARDS_PER_STEP = RETENTION_SHARDS_PER_STEP
+    ORIGINALS_MODE = ORIGINALS_MODE
     
+    # Per-request profiling
+    PROFILING_ENABLED = PROFILING_ENABLED
+    PROFILING_TOKEN = PROFILING_TOKEN
+    PROFILER = PROFILER
+    PROFILE_SAMPLE_INTERVAL = PROFILE_SAMPLE_INTERVAL
+    PROFILE_DIR = PROFILE_DIR
+
+    # ASGI server
+    ASGI_WORKERS = ASGI_WORKERS
+
     # Flask configuration
+    RATELIMIT_ENABLED = RATELIMIT_ENABLED
     DEBUG = DEBUG
     TESTING = TESTING
     SECRET_KEY = SECRET_KEY
@@ -0,0 +1,37 @@
+"""
+Configuração do Gunicorn.
+
+Cada worker importa wsgi.py e cria as suas sessões do onnxruntime antes de
+atender requisições. A app nunca é importada no master: o onnxruntime cria
+threads nativas já no import, e um processo criado por fork depois disso trava
+ou aborta ao sair (std::system_error), mesmo sem sessões. Por isso não há
+preload_app nem pesos compartilhados por copy-on-write; cada worker tem a sua
+cópia do modelo.
+
+GUNICORN_PRELOAD=1: o master baixa os arquivos dos modelos num processo
+separado (python -m util.preload_models --download-only) antes de criar os
+workers, que então só leem os arquivos do disco em vez de baixarem ao mesmo
+tempo.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import sys
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+download_models = os.getenv("GUNICORN_PRELOAD", "0") == "1"
+
+# 0 = um worker por CPU disponível
+workers = int(os.getenv("GUNICORN_WORKERS", "1")) or multiprocessing.cpu_count()
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def on_starting(server):
+    if download_models:
+        # Processo separado: o master não importa o onnxruntime
+        result = subprocess.run([sys.executable, "-m", "util.preload_models", "--download-only"])
+        if result.returncode != 0:
+            server.log.warning("Model download failed; workers will retry on load")
@@ -7,15 +7,17 @@ export PYTHONPATH=/app:$PYTHONPATH
 # echo "Configurando diretórios..."
 # python -c "from util.setup_dirs import setup_directories; setup_directories()"
 
-# Pré-carrega os modelos do rembg (com timeout para não travar o processo)
-echo "Pré-carregando modelos (timeout 60s)..."
-timeout 3 python -m util.preload_models || echo "Aviso: Pré-carregamento de modelos falhou, mas continuando a inicialização"
+# Os modelos do rembg são pré-carregados pelo próprio worker ao importar wsgi.py
+# (util/preload_models.py), no mesmo registry de sessões usado pelas requisições.
 
-# Inicia o Gunicorn com configurações otimizadas
+# SERVER_MODE=asgi: uvicorn com o event loop cuidando de uploads e downloads e a
+# inferência num pool de ASGI_WORKERS threads (ver util/asgi.py).
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+    echo "Iniciando servidor Uvicorn (ASGI)..."
+    exec uvicorn asgi:app --host 0.0.0.0 --port "${PORT:-8000}" --workers "${UVICORN_WORKERS:-1}"
+fi
+
+# Inicia o Gunicorn com configurações otimizadas (ver gunicorn.conf.py).
+# GUNICORN_PRELOAD=1 baixa os modelos uma vez antes de criar os workers.
 echo "Iniciando servidor Gunicorn..."
-exec gunicorn --bind 0.0.0.0:8000 \
-              --workers 1 \
-              --threads 4 \
-              --timeout 120 \
-              --log-level info \
-              wsgi:app
+exec gunicorn -c gunicorn.conf.py wsgi:app
@@ -1,11 +1,21 @@
+import hashlib
 import pytest
 from flask.testing import FlaskClient
 from util.api import app
 import io
+import os
 
 
 @pytest.fixture
-def client():
+def client(tmp_path, monkeypatch):
+    from util import api
+    from util.storage import FileStore
+
+    # Arquivos guardados por id vão para um diretório temporário
+    for name in ("uploads", "outputs", "originals"):
+        monkeypatch.setattr(api, name, FileStore(str(tmp_path / name)))
+    # O limite por minuto é do processo inteiro e não é o que estes testes cobrem
+    monkeypatch.setattr(api.limiter, "enabled", False)
     app.testing = True
     with app.test_client() as client:
         yield client
@@ -22,6 +32,28 @@ def test_upload_file(client: FlaskClient):
     assert "fileName" in response.json
 
 
+def test_upload_file_deduplicates_by_content(client: FlaskClient):
+    from util import api
+    from util.cache import file_digest
+    from util.constants import PATH_INPUT_TEST
+
+    ids = []
+    for name in ("teste.jpg", "outro.jpg"):
+        with open(PATH_INPUT_TEST, "rb") as f:
+            data = {"file": (f, name)}
+            response = client.post(
+                "/api/upload", data=data, content_type="multipart/form-data"
+            )
+        assert response.status_code == 200
+        assert response.json["fileName"] == name
+        ids.append(response.json["id"])
+    assert ids[0] == ids[1] == file_digest(PATH_INPUT_TEST)
+    path = api.uploads.path(ids[0])
+    assert path.endswith(f"/{ids[0][:2]}/{ids[0][2:4]}/{ids[0]}.jpg")
+    assert api.uploads.metadata(ids[0])["filename"] == "teste.jpg"
+    assert len(os.listdir(os.path.dirname(path))) == 2  # arquivo e metadados
+
+
 def test_upload_file_no_file(client: FlaskClient):
     # No file part in request
     response = client.post("/api/upload", data={}, content_type="multipart/form-data")
@@ -45,6 +77,22 @@ def test_upload_file_empty_filename(client: FlaskClient):
     assert "error" in response.json
 
 
+def test_upload_file_invalid_content(client: FlaskClient):
+    # Extensão válida, mas o conteúdo não é uma imagem
+    data = {"file": (io.BytesIO(b"fake data"), "fake.jpg")}
+    response = client.post("/api/upload", data=data, content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert response.json["error"] == "The file is not a valid image"
+
+
+def test_upload_file_too_large(client: FlaskClient, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 1000)
+    data = {"file": (io.BytesIO(b"x" * 2000), "big.jpg")}
+    response = client.post("/api/upload", data=data, content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert "error" in response.json
+
+
 def test_add_background(client: FlaskClient):
     params = {"file": "teste.jpg", "color": "#FFFFFF"}
     response = client.post("/api/add-background", query_string=params)
@@ -114,6 +162,21 @@ def test_health_check(client: FlaskClient):
     assert "healthy" in response.json.values()
 
 
+def test_metrics(client: FlaskClient):
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert "# TYPE removebg_stage_seconds histogram" in body
+    # A própria requisição de métricas está em andamento (streams não lidos
+    # por outros testes ainda contam)
+    in_flight = next(
+        line for line in body.splitlines() if line.startswith("removebg_requests_in_flight ")
+    )
+    assert int(in_flight.split()[1]) >= 1
+    assert "process_resident_memory_bytes" in body
+
+
 def test_add_background(client: FlaskClient):
     params = {"file": "teste.jpg", "color": "#FFFFFF"}
     response = client.post("/api/add-background", query_string=params)
@@ -133,3 +196,505 @@ def test_download_image(client: FlaskClient):
     response = client.get("/api/download", query_string=params)
     assert response.status_code == 200
     assert response.content_type == "image/png"
+
+
+def test_remove_background_async(client: FlaskClient, tmp_path, monkeypatch):
+    import time
+
+    from util import api
+    from util.jobs import JobQueue
+
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), poll_interval=0.05)
+    queue.register("remove-background", api.process_image)
+    monkeypatch.setattr(api, "job_queue", queue)
+    monkeypatch.setattr(api, "render_image", lambda handler, *args: b"png-bytes")
+
+    params = {"file": "teste.jpg", "async": "1"}
+    try:
+        response = client.post("/api/remove-background", query_string=params)
+        assert response.status_code == 202
+        job_id = response.json["job_id"]
+
+        deadline = time.time() + 5
+        while True:
+            response = client.get(f"/api/jobs/{job_id}")
+            assert response.status_code == 200
+            if response.json["status"] not in ("queued", "running") or time.time() > deadline:
+                break
+            time.sleep(0.02)
+    finally:
+        queue.stop()
+    assert response.json["status"] == "done"
+    download_url = response.json["download_url"]
+    assert "/api/download?id=" in download_url
+
+    response = client.get(download_url)
+    assert response.status_code == 200
+    assert response.data == b"png-bytes"
+
+
+def test_job_status_not_found(client: FlaskClient):
+    response = client.get("/api/jobs/notfound")
+    assert response.status_code == 404
+    assert "error" in response.json
+
+
+def test_remove_background_cache_hit_skips_inference(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.cache import ResultCache, file_digest, make_key
+    from util.constants import PATH_INPUT_TEST
+
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    key = make_key(
+        file_digest(PATH_INPUT_TEST),
+        "remove-background",
+        model=api.Config.DEFAULT_MODEL,
+        color=None,
+    )
+    # O resultado já gravado em saida/ é o cache da rota
+    with open("imagens/saida/teste.png", "rb") as f:
+        api.outputs.put(key, f.read(), "png", filename="teste.png")
+    monkeypatch.setattr(api, "result_cache", cache)
+    monkeypatch.setattr(
+        api.ImageHandler, "remove_background", lambda self: pytest.fail("inference ran")
+    )
+
+    response = client.post("/api/remove-background", query_string={"file": "teste.jpg"})
+    assert response.status_code == 200
+    assert response.json["id"] == key
+    assert cache.stats()["misses"] == 0
+
+
+def test_persisted_result_is_stored_once(client: FlaskClient, tmp_path, monkeypatch):
+    from PIL import Image
+    from util import api
+    from util.cache import ResultCache
+    from util.constants import PATH_INPUT_TEST
+
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(api, "result_cache", cache)
+    calls = []
+
+    def fake_mask(self, max_side=None):
+        calls.append(1)
+        return Image.new("L", self.image.size, 255)
+
+    monkeypatch.setattr(api.ImageHandler, "get_mask", fake_mask)
+    with open(PATH_INPUT_TEST, "rb") as f:
+        content = f.read()
+    file_id = client.post(
+        "/api/upload",
+        data={"file": (io.BytesIO(content), "foto.jpg")},
+        content_type="multipart/form-data",
+    ).json["id"]
+
+    response = client.post(
+        "/api/add-background", query_string={"id": file_id, "color": "#ff0000"}
+    )
+    assert response.status_code == 200
+    assert api.outputs.exists(response.json["id"])
+
+    for _ in range(2):
+        response = client.post(
+            "/api/process",
+            query_string={"name": "foto.jpg", "persist": "1"},
+            data=content,
+            content_type="application/octet-stream",
+        )
+        assert response.status_code == 200
+        api.persist_executor.submit(lambda: None).result()  # espera a gravação
+    # Um resultado por requisição distinta em saida/ e nada no result_cache;
+    # a segunda chamada a /api/process veio de saida/
+    assert len(calls) == 2
+    assert cache.stats()["memory_bytes"] == 0
+    assert not os.path.isdir(str(tmp_path / "cache"))
+    stored = [path.name for path in (tmp_path / "outputs").glob("*/*/*.json")]
+    assert len(stored) == 2
+
+
+def test_remove_background_by_id(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.cache import ResultCache
+    from util.constants import PATH_INPUT_TEST
+
+    with open(PATH_INPUT_TEST, "rb") as f:
+        data = {"file": (f, "foto.jpg")}
+        file_id = client.post(
+            "/api/upload", data=data, content_type="multipart/form-data"
+        ).json["id"]
+    cache = ResultCache(str(tmp_path / "cache"), max_bytes=1024 * 1024)
+    monkeypatch.setattr(api, "result_cache", cache)
+    calls = []
+    monkeypatch.setattr(
+        api, "render_image", lambda handler, *args: calls.append(1) or b"png-bytes"
+    )
+
+    response = client.post("/api/remove-background", query_string={"id": file_id})
+    assert response.status_code == 200
+    output_id = response.json["id"]
+    assert f"id={output_id}" in response.json["download_url"]
+    # Mesma requisição, mesmo id: o resultado já gravado é reaproveitado
+    response = client.post("/api/remove-background", query_string={"id": file_id})
+    assert response.json["id"] == output_id
+    assert len(calls) == 1
+
+    response = client.get("/api/download", query_string={"id": output_id})
+    assert response.status_code == 200
+    assert response.data == b"png-bytes"
+    assert 'filename=foto.png' in response.headers["Content-Disposition"]
+
+
+def test_remove_background_with_memory_storage(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.cache import ResultCache
+    from util.constants import PATH_INPUT_TEST
+    from util.storage import MemoryStore
+
+    # Backend sem disco local: entrada lida em memória, download em stream
+    for name in ("uploads", "outputs", "originals"):
+        monkeypatch.setattr(api, name, MemoryStore(str(tmp_path)))
+    monkeypatch.setattr(api, "result_cache", ResultCache(str(tmp_path / "cache"), max_bytes=0))
+    inputs = []
+    monkeypatch.setattr(
+        api, "render_image", lambda handler, *args: inputs.append(handler.data) or b"png-bytes"
+    )
+    with open(PATH_INPUT_TEST, "rb") as f:
+        content = f.read()
+    file_id = client.post(
+        "/api/upload",
+        data={"file": (io.BytesIO(content), "foto.jpg")},
+        content_type="multipart/form-data",
+    ).json["id"]
+
+    output_id = client.post("/api/remove-background", query_string={"id": file_id}).json["id"]
+    assert inputs == [content]
+    assert api.originals.metadata(file_id)["filename"] == "foto.jpg"
+    response = client.get("/api/download", query_string={"id": output_id})
+    assert response.status_code == 200
+    assert response.data == b"png-bytes"
+    assert response.headers["ETag"] == f'"{hashlib.sha256(b"png-bytes").hexdigest()}"'
+
+
+def test_download_from_remote_storage_supports_range(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.storage import MemoryStore
+
+    opened = []
+
+    class RemoteStore(MemoryStore):
+        def open(self, file_id, start=0):
+            opened.append(start)
+            return super().open(file_id, start)
+
+    outputs = RemoteStore(str(tmp_path))
+    monkeypatch.setattr(api, "outputs", outputs)
+    output_id = hashlib.sha256(b"0123456789").hexdigest()
+    outputs.put(output_id, b"0123456789", "png", filename="foto.png")
+
+    response = client.get("/api/download", query_string={"id": output_id})
+    assert response.status_code == 200
+    assert response.headers["Content-Length"] == "10"
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.data == b"0123456789"
+
+    response = client.get(
+        "/api/download", query_string={"id": output_id}, headers={"Range": "bytes=6-8"}
+    )
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == "bytes 6-8/10"
+    assert response.data == b"678"
+    # O trecho é pedido ao backend a partir do offset, sem ler o começo
+    assert opened == [0, 6]
+
+    response = client.get(
+        "/api/download", query_string={"id": output_id}, headers={"Range": "bytes=20-"}
+    )
+    assert response.status_code == 416
+
+
+def test_download_redirects_to_presigned_url(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.storage import MemoryStore
+
+    class PresignedStore(MemoryStore):
+        def url(self, file_id, filename):
+            return f"https://bucket.example/{file_id}?filename={filename}&X-Amz-Signature=abc"
+
+    outputs = PresignedStore(str(tmp_path))
+    monkeypatch.setattr(api, "outputs", outputs)
+    output_id = "a" * 64
+    outputs.put(output_id, b"png-bytes", "png", filename="foto.png")
+    response = client.get("/api/download", query_string={"id": output_id})
+    assert response.status_code == 302
+    assert response.headers["Location"].startswith(f"https://bucket.example/{output_id}")
+
+
+def test_remove_background_unknown_id(client: FlaskClient):
+    response = client.post("/api/remove-background", query_string={"id": "0" * 64})
+    assert response.status_code == 404
+    response = client.post("/api/remove-background", query_string={"id": "../x"})
+    assert response.status_code == 400
+    response = client.get("/api/download", query_string={"id": "0" * 64})
+    assert response.status_code == 404
+
+
+def test_add_backgrounds_no_color(client: FlaskClient):
+    response = client.post("/api/add-backgrounds", query_string={"file": "teste.jpg"})
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_add_backgrounds_honours_resolution_and_format(client: FlaskClient, monkeypatch):
+    from PIL import Image
+    from util.constants import PATH_INPUT_TEST
+    from util.ImageHandler import ImageHandler
+
+    calls = []
+
+    def fake_mask(self, max_side=None):
+        calls.append(max_side)
+        return Image.new("L", self.image.size, 255)
+
+    monkeypatch.setattr(ImageHandler, "get_mask", fake_mask)
+    with open(PATH_INPUT_TEST, "rb") as f:
+        data = {"file": (f, "foto.jpg")}
+        file_id = client.post(
+            "/api/upload", data=data, content_type="multipart/form-data"
+        ).json["id"]
+
+    query = {"id": file_id, "color": ["#FFFFFF", "#000000"], "max_side": "64"}
+    response = client.post("/api/add-backgrounds", query_string={**query, "format": "webp"})
+    assert response.status_code == 200
+    assert calls == [64]
+    for output_id in response.json["ids"].values():
+        download = client.get("/api/download", query_string={"id": output_id})
+        assert Image.open(io.BytesIO(download.data)).format == "WEBP"
+
+    response = client.post(
+        "/api/add-backgrounds",
+        query_string={"id": file_id, "color": "#FFFFFF", "quality": "preview"},
+    )
+    assert response.status_code == 200
+    output_id = response.json["ids"]["#FFFFFF"]
+    download = client.get("/api/download", query_string={"id": output_id})
+    assert max(Image.open(io.BytesIO(download.data)).size) <= 512
+    assert "_preview.png" in download.headers["Content-Disposition"]
+
+    response = client.post(
+        "/api/add-backgrounds", query_string={**query, "quality": "ultra"}
+    )
+    assert response.status_code == 400
+
+
+def test_process_in_memory_cache_hit(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.cache import ResultCache, file_digest, make_key
+    from util.constants import PATH_INPUT_TEST
+
+    cache = ResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    key = make_key(
+        file_digest(PATH_INPUT_TEST),
+        "remove-background",
+        model=api.Config.DEFAULT_MODEL,
+        color=None,
+    )
+    cache.put(key, b"cached-png")
+    monkeypatch.setattr(api, "result_cache", cache)
+
+    with open(PATH_INPUT_TEST, "rb") as f:
+        response = client.post(
+            "/api/process", query_string={"name": "teste.jpg"}, data=f.read()
+        )
+    assert response.status_code == 200
+    assert response.content_type == "image/png"
+    assert response.data == b"cached-png"
+
+
+def test_process_in_memory_invalid_image(client: FlaskClient):
+    data = {"file": (io.BytesIO(b"not an image"), "fake.png")}
+    response = client.post("/api/process", data=data, content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_process_in_memory_no_data(client: FlaskClient):
+    response = client.post("/api/process")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_process_persist_keeps_color_in_result_id(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.cache import ResultCache
+    from util.constants import PATH_INPUT_TEST
+
+    monkeypatch.setattr(api, "result_cache", ResultCache(str(tmp_path / "cache"), max_bytes=0))
+    monkeypatch.setattr(
+        api, "render_image", lambda handler, color, *args: f"png {color}".encode()
+    )
+    with open(PATH_INPUT_TEST, "rb") as f:
+        content = f.read()
+    response = client.post(
+        "/api/process",
+        query_string={"name": "foto.jpg", "color": "#ffffff", "persist": "1"},
+        data=content,
+    )
+    assert response.status_code == 200
+    assert response.data == b"png #ffffff"
+    # Espera a gravação em segundo plano
+    api.persist_executor.submit(lambda: None).result()
+
+    # O resultado colorido não pode ser servido como o do remove-background
+    file_id = hashlib.sha256(content).hexdigest()
+    output_id = client.post("/api/remove-background", query_string={"id": file_id}).json["id"]
+    response = client.get("/api/download", query_string={"id": output_id})
+    assert response.data == b"png None"
+
+
+def test_batch_remove_background_reports_item_errors(client: FlaskClient):
+    import json
+    import zipfile
+
+    data = {"files": [(io.BytesIO(b"fake data"), "notes.txt")]}
+    response = client.post(
+        "/api/batch/remove-background", data=data, content_type="multipart/form-data"
+    )
+    assert response.status_code == 200
+    assert response.content_type == "application/zip"
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["failed"] == 1
+
+
+def test_batch_remove_background_invalid_zip(client: FlaskClient):
+    response = client.post(
+        "/api/batch/remove-background", data=b"not a zip", content_type="application/zip"
+    )
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_batch_remove_background_raw_zip_checks_image_size(client: FlaskClient, monkeypatch):
+    import json
+    import zipfile
+
+    from util import api
+    from util.constants import PATH_INPUT_TEST
+
+    monkeypatch.setattr(api, "render_image", lambda handler, *args: b"png-bytes")
+    monkeypatch.setattr(api.Config, "MAX_IMAGE_PIXELS", 100)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.write(PATH_INPUT_TEST, "foto.jpg")
+    response = client.post(
+        "/api/batch/remove-background",
+        data=buffer.getvalue(),
+        content_type="application/zip",
+    )
+    assert response.status_code == 200
+    manifest = json.loads(zipfile.ZipFile(io.BytesIO(response.data)).read("manifest.json"))
+    assert manifest["failed"] == 1
+    assert "Image too large" in manifest["items"][0]["error"]
+
+
+def test_batch_remove_background_no_images(client: FlaskClient):
+    response = client.post("/api/batch/remove-background")
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_process_in_memory_invalid_quality(client: FlaskClient):
+    from util.constants import PATH_INPUT_TEST
+
+    with open(PATH_INPUT_TEST, "rb") as f:
+        response = client.post(
+            "/api/process",
+            query_string={"name": "teste.jpg", "quality": "ultra"},
+            data=f.read(),
+        )
+    assert response.status_code == 400
+    assert "quality" in response.json["error"]
+
+
+def test_remove_background_invalid_max_side(client: FlaskClient):
+    response = client.post(
+        "/api/remove-background", query_string={"file": "teste.jpg", "max_side": "-1"}
+    )
+    assert response.status_code == 400
+    assert "error" in response.json
+
+
+def test_remove_background_invalid_model(client: FlaskClient):
+    response = client.post(
+        "/api/remove-background", query_string={"file": "teste.jpg", "model": "sam"}
+    )
+    assert response.status_code == 400
+    assert "model" in response.json["error"]
+
+
+def test_download_image_conditional_get(client: FlaskClient):
+    response = client.get("/api/download", query_string={"file": "teste.png"})
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    response = client.get(
+        "/api/download", query_string={"file": "teste.png"}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.data == b""
+
+
+def test_download_image_range(client: FlaskClient):
+    response = client.get(
+        "/api/download", query_string={"file": "teste.png"}, headers={"Range": "bytes=0-99"}
+    )
+    assert response.status_code == 206
+    assert len(response.data) == 100
+    assert response.data.startswith(b"\x89PNG")
+
+
+def test_download_image_versioned_url_is_immutable(client: FlaskClient):
+    from util.cache import file_digest
+    from util.constants import PATH_OUTPUT
+
+    version = file_digest(f"{PATH_OUTPUT}teste.png")
+    response = client.get("/api/download", query_string={"file": "teste.png", "v": version})
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{version}"'
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "no-cache" not in response.headers["Cache-Control"]
+
+
+def test_process_in_memory_webp_cache_hit(client: FlaskClient, tmp_path, monkeypatch):
+    from util import api
+    from util.cache import ResultCache, file_digest, make_key
+    from util.constants import PATH_INPUT_TEST
+
+    cache = ResultCache(str(tmp_path), max_bytes=1024 * 1024)
+    key = make_key(
+        file_digest(PATH_INPUT_TEST),
+        "remove-background",
+        model=api.Config.DEFAULT_MODEL,
+        color=None,
+        format="webp",
+    )
+    cache.put(key, b"cached-webp")
+    monkeypatch.setattr(api, "result_cache", cache)
+
+    with open(PATH_INPUT_TEST, "rb") as f:
+        response = client.post(
+            "/api/process",
+            query_string={"name": "teste.jpg", "format": "webp"},
+            data=f.read(),
+        )
+    assert response.status_code == 200
+    assert response.content_type == "image/webp"
+    assert response.data == b"cached-webp"
+
+
+def test_remove_background_invalid_format(client: FlaskClient):
+    response = client.post(
+        "/api/remove-background", query_string={"file": "teste.jpg", "format": "gif"}
+    )
+    assert response.status_code == 400
+    assert "format" in response.json["error"]
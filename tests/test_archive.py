@@ -0,0 +1,78 @@
+import io
+import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from util.archive import iter_zip_items, output_name, process_batch, spool, stream_zip
+
+
+def render(name, data):
+    if data == b"boom":
+        raise RuntimeError("inference failed")
+    return data.upper()
+
+
+def build_zip(files: dict) -> io.BytesIO:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    buffer.seek(0)
+    return buffer
+
+
+def run_batch(items):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        chunks = list(stream_zip(process_batch(render, items, executor, window=2)))
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks))), chunks
+
+
+def test_batch_zip_with_manifest():
+    items = iter_zip_items(
+        build_zip(
+            {
+                "a.jpg": b"aaa",
+                "dir/b.png": b"bbb",
+                "c.txt": b"ccc",
+                "d.jpg": b"boom",
+                "a.png": b"second",
+            }
+        )
+    )
+    archive, chunks = run_batch(items)
+    assert len(chunks) > 1
+    assert archive.read("a.png") in (b"AAA", b"SECOND")
+    assert sorted(archive.namelist()) == ["a.png", "a_1.png", "dir/b.png", "manifest.json"]
+
+    manifest = json.loads(archive.read("manifest.json"))
+    assert manifest["ok"] == 3
+    assert manifest["failed"] == 2
+    errors = {item["name"]: item["error"] for item in manifest["items"] if item["status"] == "error"}
+    assert "Invalid file extension" in errors["c.txt"]
+    assert errors["d.jpg"] == "inference failed"
+
+
+def test_output_name_stays_inside_archive():
+    assert output_name("../../etc/passwd.jpg") == "etc/passwd.png"
+    assert output_name("/abs/foto.jpeg") == "abs/foto.png"
+
+
+def test_zip_members_above_limit_are_rejected():
+    items = iter_zip_items(
+        build_zip({"a.jpg": b"a" * 100, "b.jpg": b"b" * 10}), max_member_bytes=50
+    )
+    archive, _ = run_batch(items)
+    assert archive.namelist() == ["b.png", "manifest.json"]
+    manifest = json.loads(archive.read("manifest.json"))
+    errors = {item["name"]: item.get("error") for item in manifest["items"]}
+    assert errors["a.jpg"] == "File too large: 100 bytes (max 50)"
+
+
+def test_spool_moves_large_bodies_to_disk():
+    small = spool(io.BytesIO(b"x" * 10), max_memory=100)
+    large = spool(io.BytesIO(b"x" * 1000), max_memory=100)
+    assert not small._rolled
+    assert large._rolled
+    assert large.read() == b"x" * 1000
+    small.close()
+    large.close()
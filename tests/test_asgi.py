@@ -0,0 +1,110 @@
+from util.api import app
+from util.asgi import AsgiApp, build_environ
+from util.constants import PATH_OUTPUT
+import asyncio
+import json
+import os
+import pytest
+
+
+def call(asgi_app, method: str, path: str, query: bytes = b"", body: bytes = b"", headers=()):
+    """Executa uma requisição HTTP no app ASGI; retorna (status, headers, corpo)."""
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query,
+        "headers": [(b"host", b"localhost"), *headers],
+        "http_version": "1.1",
+        "server": ("localhost", 8000),
+        "client": ("127.0.0.1", 5000),
+    }
+    # O corpo chega em pedaços, como de um cliente lento
+    chunks = [body[i : i + 7] for i in range(0, len(body), 7)] or [b""]
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app(scope, receive, send))
+    start = sent[0]
+    assert start["type"] == "http.response.start"
+    body = b"".join(message.get("body", b"") for message in sent[1:])
+    assert sent[-1].get("more_body", False) is False
+    return start["status"], dict(start["headers"]), body
+
+
+@pytest.fixture
+def asgi_app():
+    asgi_app = AsgiApp(app, workers=2)
+    yield asgi_app
+    asgi_app.executor.shutdown()
+
+
+def test_asgi_serves_flask_routes(asgi_app):
+    status, headers, body = call(asgi_app, "GET", "/api/health")
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert json.loads(body)["status"] == "healthy"
+
+
+def test_asgi_passes_request_body(asgi_app):
+    status, _, body = call(
+        asgi_app, "POST", "/api/process", query=b"name=teste.jpg", body=b"not an image"
+    )
+    assert status == 400
+    assert json.loads(body)["error"] == "The file is not a valid image"
+
+
+def test_asgi_streams_files(asgi_app):
+    path = os.path.join(PATH_OUTPUT, "asgi_test.png")
+    with open(path, "wb") as f:
+        f.write(os.urandom(200_000))
+    try:
+        status, headers, body = call(
+            asgi_app, "GET", "/api/download", query=b"file=asgi_test.png"
+        )
+        assert status == 200
+        with open(path, "rb") as f:
+            assert body == f.read()
+        assert headers[b"content-length"] == b"200000"
+    finally:
+        os.remove(path)
+
+
+def test_asgi_rejects_large_bodies(asgi_app, monkeypatch):
+    monkeypatch.setitem(app.config, "MAX_CONTENT_LENGTH", 10)
+    status, _, _ = call(asgi_app, "POST", "/api/process", body=b"x" * 11)
+    assert status == 413
+    status, _, _ = call(
+        asgi_app, "POST", "/api/process", body=b"x", headers=[(b"content-length", b"100")]
+    )
+    assert status == 413
+
+
+def test_build_environ_merges_headers():
+    scope = {
+        "method": "GET",
+        "path": "/api/health",
+        "query_string": b"a=1",
+        "headers": [
+            (b"content-type", b"text/plain"),
+            (b"transfer-encoding", b"chunked"),
+            (b"accept", b"text/html"),
+            (b"accept", b"application/json"),
+        ],
+        "http_version": "1.1",
+    }
+    environ = build_environ(scope, None, 12)
+    assert environ["CONTENT_TYPE"] == "text/plain"
+    assert environ["CONTENT_LENGTH"] == "12"
+    assert "HTTP_TRANSFER_ENCODING" not in environ
+    assert environ["HTTP_ACCEPT"] == "text/html,application/json"
+    assert environ["QUERY_STRING"] == "a=1"
@@ -0,0 +1,72 @@
+import os
+import time
+
+from util.batch import BatchState, find_images, output_path_for, run
+
+
+def make_tree(tmp_path):
+    input_dir = tmp_path / "entrada"
+    (input_dir / "sub").mkdir(parents=True)
+    for name in ("a.jpg", "sub/b.PNG", "notes.txt", "semextensao"):
+        (input_dir / name).write_bytes(b"data")
+    return str(input_dir), str(tmp_path / "saida")
+
+
+def test_find_images_walks_tree(tmp_path):
+    input_dir, _ = make_tree(tmp_path)
+    assert find_images(input_dir) == ["a.jpg", os.path.join("sub", "b.PNG")]
+
+
+def test_batch_state_up_to_date(tmp_path):
+    input_dir, output_dir = make_tree(tmp_path)
+    state = BatchState(output_dir, {"model": "u2net", "color": None})
+    assert not state.is_up_to_date(input_dir, output_dir, "a.jpg")
+
+    output_path = output_path_for(output_dir, "a.jpg")
+    os.makedirs(output_dir, exist_ok=True)
+    with open(output_path, "wb") as f:
+        f.write(b"png")
+    assert state.is_up_to_date(input_dir, output_dir, "a.jpg")
+
+    # Entrada alterada depois do resultado
+    future = time.time() + 10
+    os.utime(os.path.join(input_dir, "a.jpg"), (future, future))
+    assert not state.is_up_to_date(input_dir, output_dir, "a.jpg")
+
+
+def test_batch_state_is_discarded_when_settings_change(tmp_path):
+    _, output_dir = make_tree(tmp_path)
+    os.makedirs(output_dir)
+    state = BatchState(output_dir, {"model": "u2net", "color": None})
+    state.done["a.jpg"] = [1, 4]
+    state.save()
+    assert BatchState(output_dir, {"model": "u2net", "color": None}).done == {"a.jpg": [1, 4]}
+    assert BatchState(output_dir, {"model": "u2netp", "color": None}).done == {}
+
+
+def test_batch_run_skips_up_to_date_outputs(tmp_path):
+    input_dir, output_dir = make_tree(tmp_path)
+    for relative_path in find_images(input_dir):
+        output_path = output_path_for(output_dir, relative_path)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "wb") as f:
+            f.write(b"png")
+
+    summary = run(input_dir, output_dir, processes=1)
+    assert summary["total"] == 2
+    assert summary["skipped"] == 2
+    assert summary["processed"] == 0
+
+
+def test_batch_does_not_use_server_mask_cache(tmp_path, monkeypatch):
+    from util import ImageHandler as image_handler_module
+    from util.batch import _use_mask_cache
+
+    monkeypatch.setattr(image_handler_module, "mask_cache", image_handler_module.mask_cache)
+    _use_mask_cache(None)
+    assert not image_handler_module.mask_cache.enabled
+
+    _use_mask_cache(str(tmp_path / "mascaras"))
+    cache = image_handler_module.mask_cache
+    assert cache.enabled
+    assert cache.directory == str(tmp_path / "mascaras")
@@ -0,0 +1,90 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from util.batching import BatchingSession
+
+
+class FakeInnerSession:
+    def __init__(self, batch_dim="batch_size", fail=False):
+        self.batch_dim = batch_dim
+        self.fail = fail
+        self.calls = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input", shape=[self.batch_dim, 3, 320, 320])]
+
+    def run(self, output_names, feed):
+        if self.fail:
+            raise RuntimeError("inference failed")
+        tensor = feed["input"]
+        self.calls.append(tensor.shape[0])
+        return [tensor[:, :1, :, :] * tensor[:, 2:, :, :], tensor]
+
+
+def FakeSession(inner_session):
+    """U2netSession do rembg (predict e normalize reais) sem carregar o modelo."""
+    from rembg.sessions.u2net import U2netSession
+
+    session = U2netSession.__new__(U2netSession)
+    session.model_name = "u2net"
+    session.inner_session = inner_session
+    return session
+
+
+def predict_concurrently(batcher, images):
+    masks = [None] * len(images)
+
+    def worker(i):
+        masks[i] = batcher.predict(images[i])[0]
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(images))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return masks
+
+
+def test_batching_groups_concurrent_requests():
+    inner = FakeInnerSession()
+    batcher = BatchingSession(FakeSession(inner), max_batch_size=4, max_wait_ms=200)
+    images = [Image.linear_gradient("L").resize((40 + i, 30)) for i in range(8)]
+    masks = predict_concurrently(batcher, images)
+    assert [mask.size for mask in masks] == [image.size for image in images]
+    assert sum(inner.calls) == 8
+    assert max(inner.calls) > 1
+    assert batcher.stats()["images"] == 8
+
+
+def test_batching_fixed_batch_model_runs_one_image_per_call():
+    inner = FakeInnerSession(batch_dim=1)
+    batcher = BatchingSession(FakeSession(inner), max_batch_size=4, max_wait_ms=200)
+    images = [Image.linear_gradient("L").resize((32, 32)) for _ in range(4)]
+    predict_concurrently(batcher, images)
+    assert inner.calls == [1, 1, 1, 1]
+
+
+def test_batching_propagates_errors():
+    batcher = BatchingSession(FakeSession(FakeInnerSession(fail=True)), max_wait_ms=1)
+    with pytest.raises(RuntimeError):
+        batcher.predict(Image.linear_gradient("L"))
+
+
+def test_batching_matches_session_predict():
+    session = FakeSession(FakeInnerSession())
+    batcher = BatchingSession(session, max_batch_size=4, max_wait_ms=200)
+    images = [
+        Image.merge("RGB", [Image.linear_gradient("L").rotate(90 * c) for c in range(3)])
+        .resize((50 + 7 * i, 40 + 3 * i))
+        for i in range(4)
+    ]
+    masks = predict_concurrently(batcher, images)
+    assert max(session.inner_session.calls) > 1
+    for image, mask in zip(images, masks):
+        expected = session.predict(image)[0]
+        assert mask.size == expected.size
+        assert mask.tobytes() == expected.tobytes()
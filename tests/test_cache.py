@@ -0,0 +1,60 @@
+from util.cache import ResultCache, file_digest, make_key
+from util.constants import PATH_INPUT_TEST
+
+
+def test_make_key_depends_on_operation_and_params():
+    content_hash = file_digest(PATH_INPUT_TEST)
+    remove = make_key(content_hash, "remove-background", model="u2net", color=None)
+    assert remove == make_key(content_hash, "remove-background", color=None, model="u2net")
+    assert remove != make_key(content_hash, "add-background", model="u2net", color="#fff")
+    assert remove != make_key(content_hash, "remove-background", model="u2netp", color=None)
+    assert remove != make_key("0" * 64, "remove-background", model="u2net", color=None)
+
+
+def test_result_cache_memory_and_disk_tiers(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1024, memory_max_bytes=1024)
+    assert cache.get("ab12") is None
+    cache.put("ab12", b"png-bytes")
+    assert cache.get("ab12") == b"png-bytes"
+    assert cache.stats()["memory_hits"] == 1
+
+    # Um novo processo encontra o resultado em disco
+    restarted = ResultCache(str(tmp_path), max_bytes=1024, memory_max_bytes=0)
+    assert restarted.get("ab12") == b"png-bytes"
+    stats = restarted.stats()
+    assert stats["disk_hits"] == 1
+    assert stats["memory_items"] == 0
+    assert stats["hit_ratio"] == 1.0
+
+
+def test_result_cache_evicts_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=20, memory_max_bytes=0)
+    cache.put("aa01", b"x" * 8)
+    cache.put("bb02", b"y" * 8)
+    cache.get("aa01")
+    cache.put("cc03", b"z" * 8)
+    assert cache.get("bb02") is None
+    assert cache.get("aa01") == b"x" * 8
+    assert not (tmp_path / "bb" / "bb02").exists()
+    assert cache.stats()["evictions"] == 1
+
+
+def test_result_cache_disabled(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=0)
+    cache.put("aa01", b"data")
+    assert cache.get("aa01") is None
+    assert not cache.enabled
+
+
+def test_result_cache_is_shared_between_processes(tmp_path):
+    first = ResultCache(str(tmp_path), max_bytes=20, memory_max_bytes=0, rescan_interval=0)
+    second = ResultCache(str(tmp_path), max_bytes=20, memory_max_bytes=0, rescan_interval=0)
+    first.put("aa01", b"x" * 8)
+    # Gravado depois que o segundo montou o índice: ainda é encontrado no disco
+    assert second.get("aa01") == b"x" * 8
+    first.put("bb02", b"y" * 8)
+    second.put("cc03", b"z" * 8)
+    # O limite vale para o que os dois gravaram juntos
+    assert second.stats()["disk_bytes"] <= 20
+    assert first.get("aa01") is None
+    assert second.get("cc03") == b"z" * 8
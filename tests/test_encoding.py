@@ -0,0 +1,54 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from util.encoding import encode, mimetype_for, validate_compression, validate_format
+
+
+def rgba_image() -> Image.Image:
+    pixels = np.zeros((120, 160, 4), dtype=np.uint8)
+    pixels[..., 0] = np.arange(160, dtype=np.uint8)
+    pixels[..., 1] = 80
+    pixels[30:90, 40:120, 3] = 255
+    return Image.fromarray(pixels, mode="RGBA")
+
+
+@pytest.mark.parametrize("output_format", ["png", "webp"])
+def test_encode_lossless_is_pixel_identical(output_format):
+    image = rgba_image()
+    for compression in (0, 1, 9):
+        decoded = Image.open(io.BytesIO(encode(image, output_format, compression)))
+        assert decoded.format == output_format.upper()
+        decoded = np.asarray(decoded.convert("RGBA"))
+        visible = np.asarray(image)[..., 3] > 0
+        # Pixels totalmente transparentes podem ter o RGB descartado
+        np.testing.assert_array_equal(decoded[visible], np.asarray(image)[visible])
+
+
+def test_encode_png_compression_levels():
+    image = rgba_image()
+    assert len(encode(image, "png", 9)) <= len(encode(image, "png", 0))
+
+
+def test_encode_webp_lossy():
+    decoded = Image.open(io.BytesIO(encode(rgba_image(), "webp-lossy", 4)))
+    assert decoded.format == "WEBP"
+    assert decoded.mode == "RGBA"
+
+
+def test_validate_format_and_compression():
+    assert validate_format("webp") == "webp"
+    with pytest.raises(ValueError, match="Invalid format"):
+        validate_format("gif")
+    assert validate_compression("9") == 9
+    for value in ("10", "-1", "fast", None):
+        with pytest.raises(ValueError, match="compression"):
+            validate_compression(value)
+
+
+def test_mimetype_for():
+    assert mimetype_for("teste.png") == "image/png"
+    assert mimetype_for("teste.webp") == "image/webp"
+    assert mimetype_for("teste.avif") == "image/avif"
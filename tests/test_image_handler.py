@@ -6,6 +6,16 @@ import pytest
 import os
 
 
+@pytest.fixture(autouse=True)
+def originals_store(tmp_path, monkeypatch):
+    from util import ImageHandler as image_handler_module
+    from util.storage import FileStore
+
+    store = FileStore(str(tmp_path / "originais"))
+    monkeypatch.setattr(image_handler_module, "originals", store)
+    return store
+
+
 def image_handler() -> ImageHandler:
     input_path = f"{PATH_INPUT}{TEST_FILE}"
     return ImageHandler(input_path)
@@ -72,6 +82,125 @@ def test_image_handler_resize_invalid_mode(image_handler=image_handler()):
         image_handler.resize_image("invalid_mode")
 
 
+def fake_mask_session(monkeypatch, tmp_path):
+    """Troca a inferência por uma máscara fixa e conta as chamadas."""
+    from util import ImageHandler as image_handler_module
+    from util.cache import ResultCache
+
+    calls = []
+
+    def fake_remove(image, session=None, only_mask=False):
+        calls.append(image.size)
+        return Image.new("L", image.size, 255)
+
+    monkeypatch.setattr(image_handler_module, "remove", fake_remove)
+    monkeypatch.setattr(ImageHandler, "_get_session", lambda self: None)
+    monkeypatch.setattr(
+        image_handler_module, "mask_cache", ResultCache(str(tmp_path), max_bytes=1 << 24)
+    )
+    return calls
+
+
+def test_image_handler_add_background_reuses_mask(monkeypatch, tmp_path):
+    calls = fake_mask_session(monkeypatch, tmp_path)
+    for color in ("#fff", "#000", "red"):
+        handler = image_handler()
+        handler.add_background(color)
+        assert handler.image.getpixel((0, 0))[3] == 255
+    assert len(calls) == 1
+
+
+def test_image_handler_save_backgrounds(monkeypatch, tmp_path):
+    calls = fake_mask_session(monkeypatch, tmp_path)
+    handler = image_handler()
+    output_paths = handler.save_backgrounds(["#ffffff", "#000000"])
+    assert [os.path.basename(path) for path in output_paths] == [
+        "teste_ffffff.png",
+        "teste_000000.png",
+    ]
+    assert len(calls) == 1
+    for path in output_paths:
+        assert Image.open(path).size == handler.image.size
+        os.remove(path)
+
+
+def test_image_handler_resize_image_max_side(image_handler=image_handler()):
+    width, height = image_handler.image.size
+    image_handler.resize_image(200)
+    assert max(image_handler.image.size) == 200
+    assert image_handler.image.size[1] == round(height * 200 / width)
+
+
+def test_image_handler_get_mask_reduced_resolution(monkeypatch, tmp_path):
+    calls = fake_mask_session(monkeypatch, tmp_path)
+    handler = image_handler()
+    mask = handler.get_mask(max_side=256)
+    # A inferência vê a cópia reduzida; a máscara volta no tamanho original
+    assert max(calls[0]) == 256
+    assert mask.size == handler.image.size
+    assert mask.mode == "L"
+
+
+def test_image_handler_save_webp(tmp_path):
+    handler = ImageHandler(f"{PATH_INPUT}{TEST_FILE}", output_format="webp")
+    assert handler.output_path.endswith("teste.webp")
+    handler.save()
+    assert Image.open(handler.output_path).format == "WEBP"
+    os.remove(handler.output_path)
+
+
+def test_image_handler_decode_reduced_uses_jpeg_draft():
+    handler = image_handler()
+    image = handler._open()
+    reduced = ImageHandler._decode_reduced(image, 100)
+    # O draft decodifica em escala 1/4 em vez da resolução total (785x435)
+    assert image.size == (197, 109)
+    assert reduced.size == (100, 55)
+
+
+def test_image_handler_decode_reduced_applies_exif_orientation(tmp_path):
+    path = tmp_path / "rotated.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotação de 90 graus
+    Image.new("RGB", (800, 400), "red").save(path, exif=exif)
+    reduced = ImageHandler._decode_reduced(Image.open(path), 200)
+    assert reduced.size == (100, 200)
+
+
+def test_image_handler_records_stage_timings(monkeypatch, tmp_path):
+    from util import metrics
+
+    fake_mask_session(monkeypatch, tmp_path)
+    metrics.stage_seconds.clear()
+    handler = image_handler()
+    handler.output_path = str(tmp_path / "teste.png")
+    handler.remove_background()
+    handler.save(compression=1)
+    stages = metrics.stage_seconds.snapshot()
+    for stage in ("decode", "inference", "composite", "encode", "write", "copy_original"):
+        assert stages[stage]["count"] == 1, stage
+
+
+
+def test_image_handler_saves_in_memory_original_by_content(tmp_path, originals_store):
+    import io
+
+    inputs = []
+    for color in ("red", "blue"):
+        buffer = io.BytesIO()
+        Image.new("RGB", (8, 8), color).save(buffer, "PNG")
+        handler = ImageHandler(f"{PATH_INPUT}foto.png", data=buffer.getvalue())
+        handler.output_path = str(tmp_path / f"{color}.png")
+        handler.save(data=b"result")
+        inputs.append(handler)
+
+    # Mesmo nome de arquivo, conteúdos diferentes: um original por sha256
+    for handler in inputs:
+        with originals_store.open(handler.content_hash) as f:
+            assert f.read() == handler.data
+        assert originals_store.metadata(handler.content_hash)["filename"] == "foto.png"
+    assert not os.path.exists(f"{PATH_INPUT}foto.png")
+
 if __name__ == "__main__":
     funcs = [
         test_image_handler_instance,
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+
+from util.jobs import DONE, FAILED, QUEUED, RUNNING, JobQueue, QueueFullError
+
+
+def make_queue(tmp_path, **kwargs):
+    queue = JobQueue(db_path=str(tmp_path / "jobs.db"), poll_interval=0.05, **kwargs)
+    queue.register("echo", lambda file_name: f"{file_name}.png")
+    return queue
+
+
+def wait_for(queue, job_id, status, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not reach {status}")
+
+
+def test_job_queue_runs_jobs(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.start()
+    try:
+        job_id = queue.submit("echo", file_name="teste")
+        job = wait_for(queue, job_id, DONE)
+        assert job["result"] == "teste.png"
+    finally:
+        queue.stop()
+
+
+def test_job_queue_records_failures(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.register("boom", lambda: 1 / 0)
+    queue.start()
+    try:
+        job = wait_for(queue, queue.submit("boom"), FAILED)
+        assert "division by zero" in job["error"]
+    finally:
+        queue.stop()
+
+
+def test_job_queue_rejects_when_full(tmp_path):
+    queue = make_queue(tmp_path, max_pending=2)
+    queue.submit("echo", file_name="a")
+    queue.submit("echo", file_name="b")
+    with pytest.raises(QueueFullError):
+        queue.submit("echo", file_name="c")
+    assert queue.pending() == 2
+
+
+def test_job_queue_unknown_operation(tmp_path):
+    with pytest.raises(ValueError):
+        make_queue(tmp_path).submit("nope")
+
+
+def test_job_queue_survives_restart(tmp_path):
+    queue = make_queue(tmp_path)
+    queued_id = queue.submit("echo", file_name="queued")
+    running_id = queue.submit("echo", file_name="running")
+    # Simula um processo que morreu com o job em andamento: o lease não é renovado
+    queue._claim()
+    assert queue.get(queued_id)["status"] == RUNNING
+    with queue._connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET updated_at = ? WHERE id = ?",
+            (time.time() - queue.lease_timeout - 1, queued_id),
+        )
+    assert queue.get(running_id)["status"] == QUEUED
+
+    restarted = make_queue(tmp_path)
+    restarted.start()
+    try:
+        assert wait_for(restarted, queued_id, DONE)["result"] == "queued.png"
+        assert wait_for(restarted, running_id, DONE)["result"] == "running.png"
+    finally:
+        restarted.stop()
+
+
+def test_job_queue_renews_lease_of_running_jobs(tmp_path):
+    queue = make_queue(tmp_path, lease_timeout=0.3)
+    release = threading.Event()
+    queue.register("slow", lambda: release.wait(5) and "slow.png")
+    queue.start()
+    try:
+        job_id = queue.submit("slow")
+        wait_for(queue, job_id, RUNNING)
+        # Roda por mais que o lease: a renovação impede que volte para a fila
+        time.sleep(1)
+        assert queue.get(job_id)["status"] == RUNNING
+        release.set()
+        assert wait_for(queue, job_id, DONE)["result"] == "slow.png"
+    finally:
+        release.set()
+        queue.stop()
+
+
+def test_job_queue_purges_finished_jobs(tmp_path):
+    queue = make_queue(tmp_path, ttl=100)
+    old_id = queue.submit("echo", file_name="old")
+    recent_id = queue.submit("echo", file_name="recent")
+    queued_id = queue.submit("echo", file_name="queued")
+    with queue._connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+            (DONE, time.time() - 101, old_id),
+        )
+        connection.execute("UPDATE jobs SET status = ? WHERE id = ?", (FAILED, recent_id))
+        connection.execute(
+            "UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time() - 101, queued_id)
+        )
+    queue._maintain()
+    assert queue.get(old_id) is None
+    assert queue.get(recent_id)["status"] == FAILED
+    assert queue.get(queued_id)["status"] == QUEUED
+
+
+def test_job_queue_ignores_finish_after_lease_lost(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.submit("echo", file_name="stale")
+    stale = queue._claim()
+    # O lease expira e o job volta para a fila enquanto o worker antigo ainda roda
+    with queue._connect() as connection:
+        connection.execute(
+            "UPDATE jobs SET updated_at = ? WHERE id = ?",
+            (time.time() - queue.lease_timeout - 1, job_id),
+        )
+    queue._maintain()
+    assert queue.get(job_id)["status"] == QUEUED
+
+    assert queue._finish(stale, FAILED, error="stale worker") is False
+    assert queue.get(job_id)["status"] == QUEUED
+
+    current = queue._claim()
+    assert current["owner"] != stale["owner"]
+    assert queue._finish(stale, DONE, result="stale.png") is False
+    assert queue._finish(current, DONE, result="current.png") is True
+    job = queue.get(job_id)
+    assert (job["status"], job["result"]) == (DONE, "current.png")
@@ -0,0 +1,63 @@
+from util import metrics
+from util.metrics import Histogram, Stopwatch, TimedWriter, render, timed
+import io
+import time
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test.", "stage", buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.5, 5.0):
+        histogram.observe("decode", seconds)
+    lines = histogram.render()
+    assert 'test_seconds_bucket{stage="decode",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="decode",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{stage="decode",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{stage="decode"} 3' in lines
+    assert "# TYPE test_seconds histogram" in lines
+
+
+def test_timed_records_even_on_error():
+    metrics.stage_seconds.clear()
+    try:
+        with timed("inference"):
+            raise RuntimeError
+    except RuntimeError:
+        pass
+    assert metrics.stage_seconds.snapshot()["inference"]["count"] == 1
+
+
+def test_stopwatch_counts_only_its_own_time():
+    producing, writing = Stopwatch(), Stopwatch()
+
+    def slow_items():
+        for item in range(3):
+            time.sleep(0.01)
+            yield item
+
+    buffer = io.BytesIO()
+    writer = TimedWriter(buffer, writing)
+    for item in producing.iterate(slow_items()):
+        writer.write(bytes([item]))
+    assert buffer.getvalue() == b"\x00\x01\x02"
+    assert producing.seconds >= 0.03
+    assert writing.seconds < producing.seconds
+
+
+def test_render_exposes_process_metrics():
+    sessions = {"loads": {"u2net": {"count": 1, "seconds": 1.5}}}
+    caches = {"result": {"memory_hits": 2, "disk_hits": 1, "misses": 1, "hit_ratio": 0.75}}
+    body = render(sessions, caches, queue_depth=3)
+    assert 'removebg_model_load_seconds{model="u2net"} 1.5' in body
+    assert 'removebg_cache_hits_total{cache="result"} 3' in body
+    assert 'removebg_cache_hit_ratio{cache="result"} 0.75' in body
+    assert "removebg_job_queue_depth 3" in body
+    assert "removebg_requests_in_flight " in body
+    rss = next(line for line in body.splitlines() if line.startswith("process_resident"))
+    assert int(rss.split()[1]) > 0
+
+
+def test_render_without_resident_memory(monkeypatch):
+    monkeypatch.setattr(metrics, "resident_memory_bytes", lambda: None)
+    body = render({}, {}, queue_depth=0)
+    assert "# TYPE process_resident_memory_bytes gauge" in body
+    assert not any(line.startswith("process_resident") for line in body.splitlines())
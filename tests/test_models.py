@@ -0,0 +1,47 @@
+import pytest
+
+from util.models import resolve_model, route_model
+
+
+def test_route_model_small_image_uses_light_model():
+    assert route_model((320, 240), default_model="u2net", light_model="u2netp") == "u2netp"
+
+
+def test_route_model_large_image_uses_default_model():
+    calls = []
+
+    def queue_depth():
+        calls.append(1)
+        return 0
+
+    model = route_model(
+        (4000, 3000), queue_depth, default_model="u2net", light_model="u2netp"
+    )
+    assert model == "u2net"
+    assert calls == [1]
+
+
+def test_route_model_long_queue_uses_light_model():
+    model = route_model(
+        (4000, 3000),
+        lambda: 20,
+        default_model="u2net",
+        light_model="u2netp",
+        max_queue_depth=8,
+    )
+    assert model == "u2netp"
+
+
+def test_resolve_model_allowlist():
+    allowed = ["u2net", "u2netp"]
+    assert resolve_model("u2netp", (10, 10), allowed_models=allowed) == "u2netp"
+    with pytest.raises(ValueError, match="Invalid model"):
+        resolve_model("sam", (10, 10), allowed_models=allowed)
+
+
+def test_resolve_model_without_request_uses_routing_only_when_enabled():
+    from util.constants import DEFAULT_MODEL, LIGHT_MODEL
+
+    assert resolve_model(None, (10, 10), routing=False) == DEFAULT_MODEL
+    assert resolve_model(None, (10, 10), routing=True) == LIGHT_MODEL
+    assert resolve_model("auto", (10, 10), routing=False) == LIGHT_MODEL
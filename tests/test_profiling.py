@@ -0,0 +1,114 @@
+from util.profiling import profile_call
+from util.api import app, is_profile_request
+from config import Config
+import json
+import pstats
+import pytest
+import time
+
+
+def busy_wait(seconds: float) -> str:
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+def test_sampling_profile_writes_speedscope_file(tmp_path):
+    result, profile_id = profile_call(
+        busy_wait, 0.1, name="busy", profiler="sampling", directory=str(tmp_path)
+    )
+    assert result == "done"
+    with open(tmp_path / f"{profile_id}.speedscope.json") as f:
+        profile = json.load(f)
+    frames = [frame["name"] for frame in profile["shared"]["frames"]]
+    assert "busy_wait" in frames
+    sampled = profile["profiles"][0]
+    assert sampled["type"] == "sampled"
+    assert len(sampled["samples"]) == len(sampled["weights"]) > 0
+    # As pilhas vão da raiz para a folha
+    leaves = {frames[stack[-1]] for stack in sampled["samples"]}
+    assert "busy_wait" in leaves
+
+
+def test_cprofile_profile_is_written_even_on_error(tmp_path):
+    def fail():
+        busy_wait(0.01)
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        profile_call(fail, profiler="cprofile", directory=str(tmp_path))
+    (path,) = tmp_path.glob("*.prof")
+    functions = {function for _, _, function in pstats.Stats(str(path)).stats}
+    assert "busy_wait" in functions
+
+
+def test_profile_call_rejects_unknown_profiler(tmp_path):
+    with pytest.raises(ValueError):
+        profile_call(busy_wait, 0, profiler="perf", directory=str(tmp_path))
+
+
+def test_profile_request_requires_config(monkeypatch):
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", False)
+    with app.test_request_context("/api/remove-background", headers={"X-Profile": "1"}):
+        assert not is_profile_request()
+
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", True)
+    with app.test_request_context("/api/remove-background", headers={"X-Profile": "true"}):
+        assert is_profile_request()
+    # Só o header: a query string vai para os logs de acesso
+    with app.test_request_context("/api/remove-background?profile=1"):
+        assert not is_profile_request()
+    with app.test_request_context("/api/remove-background"):
+        assert not is_profile_request()
+
+
+def test_profile_request_checks_token(monkeypatch):
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(Config, "PROFILING_TOKEN", "s3cret")
+    with app.test_request_context("/api/remove-background", headers={"X-Profile": "1"}):
+        assert not is_profile_request()
+    with app.test_request_context("/api/remove-background?profile=s3cret"):
+        assert not is_profile_request()
+    with app.test_request_context("/api/remove-background", headers={"X-Profile": "s3cret"}):
+        assert is_profile_request()
+
+
+def test_remove_background_returns_profile_id(monkeypatch, tmp_path):
+    import util.api
+
+    monkeypatch.setattr(Config, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(Config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(util.api, "choose_model", lambda *args: Config.DEFAULT_MODEL)
+    monkeypatch.setattr(
+        util.api, "process_image", lambda *args, **kwargs: busy_wait(0.05) and "0" * 64
+    )
+    monkeypatch.setattr(util.api, "get_download_url", lambda output_id: output_id)
+    app.testing = True
+    with app.test_client() as client:
+        response = client.post(
+            "/api/remove-background?file=teste.jpg", headers={"X-Profile": "1"}
+        )
+        assert response.status_code == 200
+        profile_id = response.headers["X-Profile-Id"]
+        assert (tmp_path / f"{profile_id}.speedscope.json").exists()
+
+        monkeypatch.setattr(Config, "PROFILING_ENABLED", False)
+        response = client.post(
+            "/api/remove-background?file=teste.jpg", headers={"X-Profile": "1"}
+        )
+        assert "X-Profile-Id" not in response.headers
+
+
+def test_sampling_profile_uses_interval(tmp_path, monkeypatch):
+    import util.profiling
+
+    intervals = []
+    original = util.profiling.SamplingProfiler
+    monkeypatch.setattr(
+        util.profiling,
+        "SamplingProfiler",
+        lambda interval: intervals.append(interval) or original(interval),
+    )
+    profile_call(busy_wait, 0.01, profiler="sampling", directory=str(tmp_path), interval=0.002)
+    assert intervals == [0.002]
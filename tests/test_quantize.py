@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from util.quantize import NORMALIZATION, calibration_inputs, normalize
+
+
+def test_normalize_matches_rembg():
+    from rembg.sessions.base import BaseSession
+
+    image = Image.linear_gradient("L").resize((300, 200)).convert("RGB")
+    mean, std, size = NORMALIZATION["u2net"]
+    fake_session = SimpleNamespace(
+        inner_session=SimpleNamespace(get_inputs=lambda: [SimpleNamespace(name="input")])
+    )
+    expected = BaseSession.normalize(fake_session, image, mean, std, size)["input"]
+    np.testing.assert_allclose(normalize(image, mean, std, size), expected, rtol=1e-6)
+
+
+def test_calibration_inputs(tmp_path):
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"{i}.png"
+        Image.new("RGB", (64 + i, 48), (10 * i, 100, 200)).save(path)
+        paths.append(str(path))
+
+    inputs = list(calibration_inputs(paths, "u2net", "input.1"))
+    assert len(inputs) == 3
+    assert inputs[0]["input.1"].shape == (1, 3, 320, 320)
+    assert inputs[0]["input.1"].dtype == np.float32
+
+
+def test_quantized_model_not_found(monkeypatch, tmp_path):
+    from util import sessions as sessions_module
+
+    monkeypatch.setattr(sessions_module, "QUANTIZED_MODEL_DIR", str(tmp_path))
+    with pytest.raises(ValueError, match="util.quantize"):
+        sessions_module._create_session("u2net-int8")
+
+
+def test_quantized_model_loads_through_session_path(monkeypatch, tmp_path):
+    import rembg.sessions
+
+    from util import sessions as sessions_module
+
+    class FakeSession:
+        def __init__(self, model_name, sess_opts):
+            self.model_name = model_name
+            self.model_path = self.download_models()
+
+        @classmethod
+        def download_models(cls, *args, **kwargs):
+            return "fp32.onnx"
+
+    (tmp_path / "fake-int8.onnx").write_bytes(b"int8")
+    monkeypatch.setitem(rembg.sessions.sessions, "fake", FakeSession)
+    monkeypatch.setattr(sessions_module, "QUANTIZED_MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(sessions_module, "ORT_OPTIMIZED_MODEL_DIR", "")
+
+    session = sessions_module._create_session("fake-int8")
+    assert session.model_name == "fake-int8"
+    assert session.model_path == str(tmp_path / "fake-int8.onnx")
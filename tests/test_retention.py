@@ -0,0 +1,147 @@
+import hashlib
+import os
+import time
+
+from util.retention import ORPHAN_AGE, Retention, Sweeper
+from util.storage import FileStore
+
+
+def stored(store: FileStore, data: bytes, accessed: float) -> str:
+    """Grava `data` no store com o último acesso em `accessed`."""
+    file_id = hashlib.sha256(data).hexdigest()
+    store.put(file_id, data, "png")
+    json_path = store.path(file_id)[: -len(".png")] + ".json"
+    os.utime(json_path, (accessed, accessed))
+    return file_id
+
+
+def test_expired_files_are_removed(tmp_path):
+    store = FileStore(str(tmp_path))
+    now = time.time()
+    old = stored(store, b"old", now - 1000)
+    recent = stored(store, b"recent", now - 10)
+    retention = Retention(store, ttl=100)
+    retention.step(shards=256, now=now)
+    assert not store.exists(old)
+    assert not list(tmp_path.glob(f"*/*/{old}.*"))
+    assert store.exists(recent)
+    stats = retention.stats()
+    assert stats["expired"] == 1
+    assert stats["files"] == 1
+    assert stats["complete"]
+
+
+def test_scan_is_incremental(tmp_path):
+    store = FileStore(str(tmp_path))
+    now = time.time()
+    ids = [stored(store, bytes([i]), now) for i in range(8)]
+    shards = len({file_id[:2] for file_id in ids})
+    retention = Retention(store, ttl=100)
+    retention.step(shards=1, now=now)
+    assert retention.stats()["files"] < len(ids)
+    assert not retention.stats()["complete"]
+    for _ in range(shards - 1):
+        retention.step(shards=1, now=now)
+    assert retention.stats()["files"] == len(ids)
+    assert retention.stats()["complete"]
+
+
+def test_quota_evicts_least_recently_accessed(tmp_path):
+    store = FileStore(str(tmp_path))
+    now = time.time()
+    first = stored(store, b"a" * 1000, now - 30)
+    second = stored(store, b"b" * 1000, now - 20)
+    third = stored(store, b"c" * 1000, now - 10)
+    # O mais antigo foi lido de novo
+    store.touch(first)
+    retention = Retention(store)
+    retention.step(shards=256, now=now)
+    total = retention.stats()["bytes"]
+    retention.max_bytes = total - 1
+    retention.step(shards=256, now=now)
+    assert store.exists(first)
+    assert not store.exists(second)
+    assert store.exists(third)
+    assert retention.stats()["evicted"] == 1
+    assert retention.stats()["bytes"] <= retention.max_bytes
+
+
+def test_orphans_and_stale_temp_files_are_removed(tmp_path):
+    store = FileStore(str(tmp_path))
+    now = time.time()
+    file_id = stored(store, b"data", now)
+    data_path = store.path(file_id)
+    os.remove(data_path[: -len(".png")] + ".json")
+    with store.temp_file() as f:
+        f.write(b"partial")
+    for path in (data_path, f.name):
+        os.utime(path, (now - ORPHAN_AGE - 1, now - ORPHAN_AGE - 1))
+    fresh_path = store.path(stored(store, b"fresh", now))
+    os.remove(fresh_path[: -len(".png")] + ".json")
+
+    retention = Retention(store, ttl=100)
+    retention.step(shards=256, now=now)
+    assert not os.path.exists(data_path)
+    assert not os.path.exists(f.name)
+    # Gravação que pode estar em andamento fica
+    assert os.path.exists(fresh_path)
+    assert retention.stats()["orphans"] == 2
+
+
+def test_only_one_sweeper_holds_the_lock(tmp_path):
+    store = FileStore(str(tmp_path / "store"))
+    lock_path = str(tmp_path / "retention.lock")
+    first = Sweeper({"input": Retention(store, ttl=100)}, lock_path=lock_path)
+    second = Sweeper({"input": Retention(store, ttl=100)}, lock_path=lock_path)
+    assert first.step()
+    assert not second.step()
+    first.stop()
+    assert second.step()
+    second.stop()
+
+
+def test_sweeper_is_disabled_without_file_locks(tmp_path, monkeypatch):
+    from util import retention
+
+    monkeypatch.setattr(retention, "fcntl", None)
+    store = FileStore(str(tmp_path / "store"))
+    sweeper = Sweeper(
+        {"input": Retention(store, ttl=100)}, lock_path=str(tmp_path / "retention.lock")
+    )
+    sweeper.start()
+    assert sweeper._thread is None
+    assert not sweeper.step()
+
+
+def test_hardlinked_files_count_once(tmp_path):
+    inputs = FileStore(str(tmp_path / "entrada"))
+    originals = FileStore(str(tmp_path / "originais"))
+    now = time.time()
+    data = b"x" * 10_000
+    file_id = stored(inputs, data, now - 1000)
+    originals.copy(file_id, inputs.path(file_id), "png", hardlink=True)
+    assert os.stat(originals.path(file_id)).st_nlink == 2
+
+    links = {}
+    input_retention = Retention(inputs, links=links)
+    originals_retention = Retention(originals, links=links)
+    for retention in (input_retention, originals_retention):
+        retention.step(shards=256, now=now)
+    sizes = [r.stats()["bytes"] for r in (input_retention, originals_retention)]
+    # Os dados entram numa cota só; cada diretório conta o seu .json
+    assert sum(sizes) < 2 * len(data)
+    assert max(sizes) > len(data) > min(sizes)
+
+    # Remover um link não libera os dados; o outro diretório passa a contá-los
+    input_retention.ttl = 100
+    input_retention.step(shards=256, now=now)
+    assert not inputs.exists(file_id)
+    assert input_retention.stats()["freed_bytes"] < len(data)
+    originals_retention.step(shards=256, now=now)
+    assert originals_retention.stats()["bytes"] > len(data)
+
+    originals_retention.max_bytes = 1
+    originals_retention.step(shards=256, now=now)
+    assert not originals.exists(file_id)
+    assert originals_retention.stats()["freed_bytes"] > len(data)
+    assert links == {}
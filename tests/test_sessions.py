@@ -0,0 +1,155 @@
+import os
+import threading
+
+import pytest
+
+from util.sessions import SessionRegistry
+
+
+def fake_factory(model_name, providers):
+    return object()
+
+
+def test_session_registry_reuses_session():
+    registry = SessionRegistry(factory=fake_factory)
+    first = registry.get("u2net")
+    second = registry.get("u2net")
+    assert first is second
+    stats = registry.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["loads"]["u2net"]["count"] == 1
+
+
+def test_session_registry_keys_by_providers():
+    registry = SessionRegistry(factory=fake_factory)
+    cpu = registry.get("u2net", ["CPUExecutionProvider"])
+    default = registry.get("u2net")
+    assert cpu is not default
+    assert registry.stats()["loaded"] == ["u2net", "u2net[CPUExecutionProvider]"]
+
+
+def test_session_registry_loads_once_under_concurrency():
+    calls = []
+
+    def slow_factory(model_name, providers):
+        calls.append(model_name)
+        threading.Event().wait(0.05)
+        return object()
+
+    registry = SessionRegistry(factory=slow_factory)
+    threads = [threading.Thread(target=registry.get, args=("u2net",)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["u2net"]
+    assert registry.stats()["hits"] == 7
+
+
+def test_session_registry_unknown_model():
+    registry = SessionRegistry()
+    with pytest.raises(ValueError):
+        registry.get("not-a-model")
+
+
+def test_session_options_from_config(monkeypatch):
+    from util.sessions import session_options
+
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    sess_opts = session_options(
+        intra_op_threads=2,
+        inter_op_threads=1,
+        execution_mode="parallel",
+        graph_optimization="basic",
+        cpu_mem_arena=False,
+    )
+    assert sess_opts.intra_op_num_threads == 2
+    assert sess_opts.inter_op_num_threads == 1
+    assert sess_opts.execution_mode.name == "ORT_PARALLEL"
+    assert sess_opts.graph_optimization_level.name == "ORT_ENABLE_BASIC"
+    assert sess_opts.enable_cpu_mem_arena is False
+
+
+def test_session_options_threads_fall_back_to_omp(monkeypatch):
+    from util.sessions import session_options
+
+    monkeypatch.setenv("OMP_NUM_THREADS", "1")
+    sess_opts = session_options(intra_op_threads=0, inter_op_threads=0)
+    assert sess_opts.intra_op_num_threads == 1
+    assert sess_opts.inter_op_num_threads == 1
+
+
+def test_session_options_invalid_level():
+    from util.sessions import session_options
+
+    with pytest.raises(ValueError, match="graph optimization"):
+        session_options(graph_optimization="maximum")
+
+
+def test_create_session_caches_optimized_model(monkeypatch, tmp_path):
+    import rembg.sessions
+
+    from util import sessions as sessions_module
+
+    loads = []
+
+    class FakeSession:
+        def __init__(self, model_name, sess_opts):
+            loads.append(
+                (self.download_models(), sess_opts.graph_optimization_level.name)
+            )
+            # O onnxruntime grava o grafo otimizado em optimized_model_filepath
+            if sess_opts.optimized_model_filepath:
+                with open(sess_opts.optimized_model_filepath, "wb") as f:
+                    f.write(b"optimized")
+
+        @classmethod
+        def download_models(cls, *args, **kwargs):
+            return "original.onnx"
+
+    monkeypatch.setitem(rembg.sessions.sessions, "fake", FakeSession)
+    monkeypatch.setattr(sessions_module, "ORT_OPTIMIZED_MODEL_DIR", str(tmp_path))
+
+    sessions_module._create_session("fake")
+    sessions_module._create_session("fake")
+
+    cached_path = sessions_module.optimized_model_path("fake", str(tmp_path))
+    assert loads[0][0] == "original.onnx"
+    assert loads[1] == (cached_path, "ORT_DISABLE_ALL")
+    assert [p.name for p in tmp_path.iterdir()] == [os.path.basename(cached_path)]
+
+
+def test_optimized_model_path_depends_on_device(monkeypatch, tmp_path):
+    import onnxruntime as ort
+
+    from util.sessions import optimized_model_path
+
+    monkeypatch.setattr(ort, "get_device", lambda: "CPU")
+    cpu_path = optimized_model_path("u2net", str(tmp_path))
+    monkeypatch.setattr(ort, "get_device", lambda: "GPU")
+    gpu_path = optimized_model_path("u2net", str(tmp_path))
+    assert cpu_path != gpu_path
+    assert gpu_path.endswith("-gpu.onnx")
+
+
+def test_download_models_does_not_create_sessions(monkeypatch):
+    import rembg.sessions
+
+    from util.preload_models import download_models
+
+    calls = []
+
+    class FakeSession:
+        def __init__(self, *args):
+            calls.append("session")
+
+        @classmethod
+        def download_models(cls, *args, **kwargs):
+            calls.append("download")
+            return "fake.onnx"
+
+    monkeypatch.setitem(rembg.sessions.sessions, "fake", FakeSession)
+    assert download_models(("fake", "fake-int8"))
+    assert calls == ["download"]
+    assert not download_models(("missing",))
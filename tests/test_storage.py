@@ -0,0 +1,191 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from util.s3 import S3Store
+from util.storage import FileStore, MemoryStore, RangeReader
+
+
+def file_id(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_put_shards_and_keeps_metadata(tmp_path):
+    store = FileStore(str(tmp_path))
+    key = file_id(b"abc")
+    assert store.put(key, b"abc", "png", filename="foto.png")
+    path = store.path(key)
+    assert path == os.path.join(str(tmp_path), key[:2], key[2:4], f"{key}.png")
+    with open(path, "rb") as f:
+        assert f.read() == b"abc"
+    metadata = store.metadata(key)
+    assert metadata["filename"] == "foto.png"
+    assert metadata["size"] == 3
+
+
+def test_put_same_id_is_stored_once(tmp_path):
+    store = FileStore(str(tmp_path))
+    key = file_id(b"abc")
+    assert store.put(key, b"abc", "png", filename="a.png")
+    assert not store.put(key, b"abc", "png", filename="b.png")
+    source = tmp_path / "source.png"
+    source.write_bytes(b"abc")
+    assert not store.copy(key, str(source), "png", filename="c.png")
+    assert store.metadata(key)["filename"] == "a.png"
+    # Sem temporários esquecidos na raiz
+    assert sorted(os.listdir(tmp_path)) == [key[:2], "source.png"]
+
+
+def test_invalid_and_missing_ids(tmp_path):
+    store = FileStore(str(tmp_path))
+    with pytest.raises(ValueError):
+        store.path("../../etc/passwd")
+    with pytest.raises(FileNotFoundError):
+        store.path("0" * 64)
+    assert not store.exists("0" * 64)
+
+
+def test_copy_with_hardlink_shares_the_file(tmp_path):
+    store = FileStore(str(tmp_path / "store"))
+    source = tmp_path / "source.png"
+    source.write_bytes(b"abc")
+    key = file_id(b"abc")
+    assert store.copy(key, str(source), "png", hardlink=True)
+    assert os.path.samefile(store.path(key), source)
+    assert store.remove(key) > 0
+    assert not store.exists(key)
+    assert source.read_bytes() == b"abc"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    """S3 falso em memória (moto), sem rede."""
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket="test")
+        yield client
+
+
+@pytest.fixture(params=["local", "memory", "s3"])
+def store(request, tmp_path):
+    if request.param == "local":
+        return FileStore(str(tmp_path / "store"))
+    if request.param == "memory":
+        return MemoryStore(str(tmp_path))
+    client = request.getfixturevalue("s3_client")
+    return S3Store("test", "entrada/", client=client, temp_dir=str(tmp_path))
+
+
+def test_backend_put_open_remove(store):
+    key = file_id(b"abc")
+    assert store.put(key, b"abc", "png", filename="foto.png")
+    assert not store.put(key, b"abc", "png", filename="outra.png")
+    assert store.exists(key)
+    assert store.metadata(key)["filename"] == "foto.png"
+    assert store.etag(key) == key
+    with store.open(key) as f:
+        assert f.read() == b"abc"
+    assert store.remove(key) >= 3
+    assert not store.exists(key)
+    with pytest.raises(FileNotFoundError):
+        store.open(key)
+    with pytest.raises(FileNotFoundError):
+        store.metadata(key)
+
+
+def test_backend_open_from_offset(store):
+    key = file_id(b"0123456789")
+    store.put(key, b"0123456789", "png")
+    with store.open(key, 4) as f:
+        assert f.read() == b"456789"
+    with RangeReader(store, key) as reader:
+        reader.seek(7)
+        assert reader.read(2) == b"78"
+        assert reader.tell() == 9
+        reader.seek(2)
+        assert reader.read() == b"23456789"
+
+
+def test_backend_put_file_consumes_temp_file(store):
+    key = file_id(b"abc")
+    with store.temp_file() as f:
+        f.write(b"abc")
+    assert store.put_file(key, f.name, "jpg", filename="foto.jpg")
+    assert not os.path.exists(f.name)
+    with store.temp_file() as f:
+        f.write(b"abc")
+    assert not store.put_file(key, f.name, "jpg")
+    assert not os.path.exists(f.name)
+    assert store.metadata(key)["size"] == 3
+
+
+def test_backend_copy_from_other_backend(store, tmp_path):
+    source = MemoryStore(str(tmp_path))
+    key = file_id(b"abc")
+    source.put(key, b"abc", "jpg", filename="foto.jpg", width=3)
+    assert store.copy_from(source, key, filename="original.jpg")
+    metadata = store.metadata(key)
+    assert (metadata["extension"], metadata["filename"], metadata["width"]) == (
+        "jpg",
+        "original.jpg",
+        3,
+    )
+    with store.open(key) as f:
+        assert f.read() == b"abc"
+
+
+def test_s3_copy_between_stores_stays_on_server(s3_client, tmp_path):
+    uploads = S3Store("test", "entrada/", client=s3_client, temp_dir=str(tmp_path))
+    originals = S3Store("test", "originais/", client=s3_client, temp_dir=str(tmp_path))
+    key = file_id(b"abc")
+    uploads.put(key, b"abc", "jpg", filename="foto.jpg")
+    assert originals.copy_from(uploads, key)
+    assert originals.metadata(key)["filename"] == "foto.jpg"
+    objects = s3_client.list_objects_v2(Bucket="test")["Contents"]
+    assert sorted(item["Key"] for item in objects) == [
+        f"entrada/{key[:2]}/{key[2:4]}/{key}",
+        f"originais/{key[:2]}/{key[2:4]}/{key}",
+    ]
+    assert os.listdir(tmp_path) == []
+
+
+def test_s3_large_files_use_multipart_upload(s3_client, tmp_path):
+    part = 5 * 1024 * 1024
+    store = S3Store(
+        "test",
+        "saida/",
+        client=s3_client,
+        temp_dir=str(tmp_path),
+        multipart_threshold=part,
+        multipart_chunksize=part,
+    )
+    data = os.urandom(2 * part + 1)
+    key = file_id(data)
+    assert store.put(key, data, "png")
+    head = s3_client.head_object(Bucket="test", Key=f"saida/{key[:2]}/{key[2:4]}/{key}")
+    # ETag de upload multipart: <md5 das partes>-<número de partes>
+    assert head["ETag"].strip('"').endswith("-3")
+    assert head["ContentType"] == "image/png"
+    buffer = io.BytesIO()
+    with store.open(key) as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            buffer.write(chunk)
+    assert buffer.getvalue() == data
+
+
+def test_s3_presigned_download_url(s3_client, tmp_path):
+    store = S3Store("test", "saida/", client=s3_client, temp_dir=str(tmp_path))
+    key = file_id(b"abc")
+    store.put(key, b"abc", "png", filename="foto final.png")
+    url = store.url(key, "foto final.png")
+    assert f"saida/{key[:2]}/{key[2:4]}/{key}" in url
+    assert "Signature" in url
+    assert "foto%2520final.png" in url
+    store.presigned_expires = 0
+    assert store.url(key, "foto.png") is None
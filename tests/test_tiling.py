@@ -0,0 +1,97 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+from rembg.bg import naive_cutout
+
+from util.tiling import composite, composite_strips, write_png
+
+
+def random_inputs(size=(257, 301), seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    image = Image.fromarray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    mask = Image.fromarray(rng.integers(0, 256, (height, width), dtype=np.uint8))
+    return image, mask
+
+
+def reference(image, mask, color=None):
+    """Caminho direto anterior ao processamento em faixas."""
+    cutout = naive_cutout(image, mask)
+    if color is None:
+        return cutout
+    output = Image.new(mode="RGBA", size=cutout.size, color=color)
+    output.alpha_composite(cutout)
+    return output
+
+
+@pytest.mark.parametrize("rows", [1, 37, 64, 1000])
+@pytest.mark.parametrize("color", [None, "#3366ff", "white"])
+def test_composite_is_pixel_identical(rows, color):
+    image, mask = random_inputs()
+    expected = np.asarray(reference(image, mask, color))
+    np.testing.assert_array_equal(np.asarray(composite(image, mask, color, rows)), expected)
+
+
+@pytest.mark.parametrize("compression", [0, 1, 9])
+@pytest.mark.parametrize("color", [None, "#3366ff"])
+def test_write_png_is_pixel_identical(compression, color):
+    image, mask = random_inputs(seed=1)
+    buffer = io.BytesIO()
+    write_png(composite_strips(image, mask, color, rows=50), image.size, buffer, compression)
+
+    decoded = Image.open(io.BytesIO(buffer.getvalue()))
+    decoded.load()
+    assert decoded.mode == "RGBA"
+    assert decoded.size == image.size
+    np.testing.assert_array_equal(np.asarray(decoded), np.asarray(reference(image, mask, color)))
+
+
+def test_image_handler_encode_matches_reference(monkeypatch, tmp_path):
+    from tests.test_image_handler import fake_mask_session, image_handler
+
+    fake_mask_session(monkeypatch, tmp_path)
+    handler = image_handler()
+    handler.add_background("#ff0000")
+    decoded = Image.open(io.BytesIO(handler.encode(1)))
+
+    source = image_handler().image
+    expected = reference(source, Image.new("L", source.size, 255), "#ff0000")
+    np.testing.assert_array_equal(np.asarray(decoded), np.asarray(expected))
+    np.testing.assert_array_equal(np.asarray(handler.image), np.asarray(expected))
+
+
+def test_write_png_keeps_icc_profile_and_dpi():
+    image, mask = random_inputs(size=(40, 30))
+    buffer = io.BytesIO()
+    write_png(
+        composite_strips(image, mask, rows=7),
+        image.size,
+        buffer,
+        icc_profile=b"icc-profile",
+        dpi=(300, 300),
+    )
+    decoded = Image.open(io.BytesIO(buffer.getvalue()))
+    decoded.load()
+    assert decoded.info["icc_profile"] == b"icc-profile"
+    assert decoded.info["dpi"] == pytest.approx((300, 300), abs=0.01)
+    np.testing.assert_array_equal(np.asarray(decoded), np.asarray(reference(image, mask)))
+
+
+@pytest.mark.parametrize("output_format", ["png", "webp"])
+def test_image_handler_output_keeps_source_metadata(monkeypatch, tmp_path, output_format):
+    from tests.test_image_handler import fake_mask_session
+    from util.ImageHandler import ImageHandler
+
+    fake_mask_session(monkeypatch, tmp_path)
+    path = tmp_path / "perfil.jpg"
+    image, _ = random_inputs(size=(64, 48))
+    image.save(path, icc_profile=b"icc-profile", dpi=(200, 200))
+
+    handler = ImageHandler(str(path), output_format=output_format)
+    handler.remove_background()
+    decoded = Image.open(io.BytesIO(handler.encode(1)))
+    assert decoded.info["icc_profile"] == b"icc-profile"
+    if output_format == "png":
+        assert decoded.info["dpi"] == pytest.approx((200, 200), abs=0.01)
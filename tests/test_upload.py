@@ -0,0 +1,113 @@
+import hashlib
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from util.storage import FileStore
+from util.upload import read_header, save_upload
+
+BOUNDARY = b"test-boundary"
+
+
+def image_bytes(image_format: str, size=(64, 48), exif: bytes = b"") -> bytes:
+    buffer = io.BytesIO()
+    options = {"exif": exif} if exif else {}
+    Image.new("RGB", size, "red").save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def multipart(filename: str, data: bytes, field: str = "file") -> bytes:
+    return (
+        b"--" + BOUNDARY + b"\r\n"
+        b'Content-Disposition: form-data; name="note"\r\n\r\nhello\r\n'
+        b"--" + BOUNDARY + b"\r\n"
+        + f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'.encode()
+        + b"Content-Type: application/octet-stream\r\n\r\n"
+        + data
+        + b"\r\n--" + BOUNDARY + b"--\r\n"
+    )
+
+
+class CountingStream(io.BytesIO):
+    """Conta quantos bytes do corpo foram lidos."""
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed = self.tell()
+        return data
+
+
+def test_read_header_png_and_jpeg():
+    assert read_header(image_bytes("PNG")[:24]) == ("PNG", 64, 48)
+    # SOF depois de um segmento EXIF grande
+    jpeg = image_bytes("JPEG", (30, 20), exif=b"Exif\x00\x00" + b"\x00" * 20_000)
+    assert read_header(jpeg) == ("JPEG", 30, 20)
+    # Bytes insuficientes pedem mais dados
+    assert read_header(b"") is None
+    assert read_header(jpeg[:1000]) is None
+    with pytest.raises(ValueError):
+        read_header(b"GIF89a" + b"\x00" * 100)
+
+
+def test_save_upload_writes_file(tmp_path):
+    store = FileStore(str(tmp_path))
+    data = image_bytes("JPEG", (300, 200))
+    file_id, name = save_upload(
+        io.BytesIO(multipart("photo.jpg", data)), BOUNDARY, store, chunk_size=1024
+    )
+    assert name == "photo.jpg"
+    assert file_id == hashlib.sha256(data).hexdigest()
+    with open(store.path(file_id), "rb") as f:
+        assert f.read() == data
+    assert store.metadata(file_id)["width"] == 300
+    assert os.listdir(tmp_path) == [file_id[:2]]  # sem temporários
+
+    # Mesmo conteúdo com outro nome: nada novo é gravado
+    again, _ = save_upload(io.BytesIO(multipart("copy.jpeg", data)), BOUNDARY, store)
+    assert again == file_id
+    assert store.metadata(file_id)["filename"] == "photo.jpg"
+    assert len(os.listdir(os.path.dirname(store.path(file_id)))) == 2
+
+
+@pytest.mark.parametrize(
+    "filename",
+    ["C:\\fotos\\foto.jpg", "\\\\servidor\\fotos\\foto.jpg", "fotos/foto.jpg", "foto.jpg"],
+)
+def test_save_upload_strips_client_directories(tmp_path, filename):
+    body = multipart(filename, image_bytes("JPEG"))
+    _, name = save_upload(io.BytesIO(body), BOUNDARY, FileStore(str(tmp_path)))
+    assert name == "foto.jpg"
+
+
+def test_save_upload_rejects_early(tmp_path):
+    # Cabeçalho PNG de 50000x50000 seguido de muitos dados
+    header = image_bytes("PNG")[:16] + (50_000).to_bytes(4, "big") * 2
+    stream = CountingStream(multipart("big.png", header + b"\x00" * 10_000_000))
+    with pytest.raises(ValueError, match="Image too large"):
+        save_upload(stream, BOUNDARY, FileStore(str(tmp_path)), chunk_size=64 * 1024)
+    assert stream.consumed <= 64 * 1024
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.parametrize(
+    "filename, data, error",
+    [
+        ("fake.png", b"not an image at all", "not a valid image"),
+        ("photo.png", image_bytes("JPEG"), "does not match"),
+        ("notes.txt", b"text", "Invalid file extension"),
+        ("", b"x", "No file selected"),
+    ],
+)
+def test_save_upload_rejects_invalid_files(tmp_path, filename, data, error):
+    with pytest.raises(ValueError, match=error):
+        save_upload(io.BytesIO(multipart(filename, data)), BOUNDARY, FileStore(str(tmp_path)))
+    assert os.listdir(tmp_path) == []
+
+
+def test_save_upload_without_file_part(tmp_path):
+    body = multipart("photo.jpg", image_bytes("JPEG"), field="other")
+    with pytest.raises(ValueError, match="No file part"):
+        save_upload(io.BytesIO(body), BOUNDARY, FileStore(str(tmp_path)))
+    assert os.listdir(tmp_path) == []
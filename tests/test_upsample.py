@@ -0,0 +1,37 @@
+import numpy as np
+from PIL import Image
+
+from util.upsample import guided_upsample
+
+
+def step_image(size: tuple, edge: int) -> Image.Image:
+    """Metade esquerda escura e direita clara, com a borda na coluna `edge`."""
+    width, height = size
+    pixels = np.zeros((height, width), dtype=np.uint8)
+    pixels[:, edge:] = 220
+    return Image.fromarray(pixels, mode="L").convert("RGB")
+
+
+def test_guided_upsample_size_and_mode():
+    guide = step_image((400, 300), 200)
+    mask = Image.new("L", (100, 75), 128)
+    result = guided_upsample(mask, guide)
+    assert result.size == (400, 300)
+    assert result.mode == "L"
+
+
+def test_guided_upsample_follows_guide_edges():
+    guide = step_image((800, 200), 401)
+    mask = step_image((100, 25), 50).convert("L").point(lambda v: 255 if v else 0)
+
+    guided = np.asarray(guided_upsample(mask, guide), dtype=np.int16)
+    bilinear = np.asarray(mask.resize(guide.size, Image.Resampling.BILINEAR), dtype=np.int16)
+
+    # Longe da borda a máscara se mantém
+    assert guided[100, 50] < 10
+    assert guided[100, 750] > 245
+    # Perto da borda a transição é mais curta que a do bilinear
+    def transition_width(row):
+        return int(((row > 25) & (row < 230)).sum())
+
+    assert transition_width(guided[100]) < transition_width(bilinear[100])
@@ -1,65 +1,294 @@
+import hashlib
+import io
+import math
 import os
-import shutil
+import time
+from functools import cached_property
+
+from loguru import logger
 from rembg import remove
-from PIL import Image
+from PIL import Image, ImageColor, ImageOps
 
-from util.constants import PATH_ORIGINALS, PATH_OUTPUT
+from util.batching import get_batching_session
+from util.cache import file_digest, make_key, mask_cache
+from util.constants import (
+    DEFAULT_MODEL,
+    INFERENCE_BATCH_SIZE,
+    ORIGINALS_MODE,
+    OUTPUT_FORMAT,
+    PATH_OUTPUT,
+)
+from util.encoding import encode, extension_for, source_metadata, validate_format
+from util.metrics import Stopwatch, TimedWriter, stage_seconds, timed
+from util.sessions import get_session
+from util.storage import originals
+from util.tiling import composite, composite_strips, write_png
+from util.upsample import guided_upsample
 
 
 class ImageHandler:
-    def __init__(self, input_path: str):
+    def __init__(
+        self,
+        input_path: str,
+        model_name: str = DEFAULT_MODEL,
+        data: bytes | None = None,
+        output_format: str = OUTPUT_FORMAT,
+        name: str | None = None,
+    ):
+        """
+        `data` permite processar bytes já em memória (ex. corpo da requisição);
+        nesse caso `input_path` só define os nomes usados se o resultado for salvo.
+        `output_format` é um dos formatos de util.encoding (png, webp, ...).
+        `name` é o nome original do arquivo, quando o caminho não o tem (ex. uma
+        entrada guardada pelo id); os nomes de saída derivam dele.
+        """
         self.input_path = input_path
-        print(f"Initializing ImageHandler with path: {input_path}")
-        print(f"File exists: {os.path.exists(input_path)}")
+        self.name = name
+        self.model_name = model_name
+        self.data = data
+        self.output_format = validate_format(output_format)
+        logger.debug(f"Initializing ImageHandler with path: {input_path}")
 
-        if not os.path.exists(input_path):
+        if data is None and not os.path.exists(input_path):
             raise FileNotFoundError(f"File not found: {input_path}")
 
         (self.nome_sem_extensão, self.nome_com_extensão) = self._get_nome()
         self.output_path = self._get_output_path()
-        self.originals_path = self._get_originals_path()
-        self.image = Image.open(self.input_path)
+        # Image.open só lê o cabeçalho; os pixels são decodificados no primeiro uso
+        self.image = self._open()
+
+    @property
+    def image(self) -> Image.Image:
+        # O recorte fica pendente até alguém precisar da imagem inteira; encode e
+        # save de PNG escrevem direto das faixas sem montá-la
+        if self._composite is not None:
+            with timed("composite"):
+                self._image = composite(*self._composite)
+            self._composite = None
+        return self._image
+
+    @image.setter
+    def image(self, value: Image.Image) -> None:
+        self._image = value
+        self._composite = None
 
-    def _get_originals_path(self):
-        return f"{PATH_ORIGINALS}{self.nome_com_extensão}"
+    def _open(self) -> Image.Image:
+        if self.data is None:
+            return Image.open(self.input_path)
+        return Image.open(io.BytesIO(self.data))
 
-    def _get_output_path(self) -> str:
-        return f"{PATH_OUTPUT}{self.nome_sem_extensão}.png"
+    def _get_output_path(self, suffix: str = "") -> str:
+        extension = extension_for(self.output_format)
+        return f"{PATH_OUTPUT}{self.nome_sem_extensão}{suffix}.{extension}"
 
     def _get_nome(self):
         # Usa os.path para lidar com caminhos Windows e Unix
-        nome_com_extensão = os.path.basename(self.input_path)
+        nome_com_extensão = os.path.basename(self.name or self.input_path)
         nome_sem_extensão = os.path.splitext(nome_com_extensão)[0]
         return nome_sem_extensão, nome_com_extensão
 
-    def remove_background(self) -> None:
-        output = remove(self.image)
-        self.image = output
+    def _get_session(self):
+        if INFERENCE_BATCH_SIZE > 1:
+            return get_batching_session(self.model_name)
+        return get_session(self.model_name)
+
+    @cached_property
+    def content_hash(self) -> str:
+        if self.data is not None:
+            return hashlib.sha256(self.data).hexdigest()
+        return file_digest(self.input_path)
+
+    def get_mask(self, max_side: int | None = None) -> Image.Image:
+        """
+        Máscara alfa (modo L) da imagem atual, calculada uma vez por entrada e modelo.
+        Com `max_side` a inferência roda numa cópia reduzida e a máscara é ampliada
+        seguindo as bordas da imagem original.
+        """
+        if max_side is not None and max(self.image.size) <= max_side:
+            max_side = None
+        if max_side is None:
+            self.load()
+        params = {"model": self.model_name, "size": self.image.size, "mode": self.image.mode}
+        if max_side is not None:
+            params["max_side"] = max_side
+        key = make_key(self.content_hash, "mask", **params)
+        data = mask_cache.get(key)
+        if data is not None:
+            return Image.open(io.BytesIO(data))
+
+        if max_side is None:
+            with timed("inference"):
+                mask = remove(self.image, session=self._get_session(), only_mask=True)
+        else:
+            # Decodifica a entrada de novo já reduzida só para a inferência; a
+            # resolução total só é decodificada depois, para o guia e o recorte
+            with timed("decode"):
+                small = self._decode_reduced(self._open(), max_side)
+            with timed("inference"):
+                small_mask = remove(small, session=self._get_session(), only_mask=True)
+            self.load()
+            with timed("upsample"):
+                mask = guided_upsample(small_mask, ImageOps.exif_transpose(self.image))
+        if mask_cache.enabled:
+            buffer = io.BytesIO()
+            mask.save(buffer, "PNG")
+            mask_cache.put(key, buffer.getvalue())
+        return mask
+
+    def remove_background(self, max_side: int | None = None) -> None:
+        # Mesmo resultado de rembg.remove, mas com a máscara reaproveitável
+        mask = self.get_mask(max_side)
+        self._composite = (ImageOps.exif_transpose(self.image), mask, None)
+
+    def add_background(self, color: str = "black", max_side: int | None = None) -> None:
+        ImageColor.getrgb(color)  # cor inválida falha antes da inferência
+        mask = self.get_mask(max_side)
+        self._composite = (ImageOps.exif_transpose(self.image), mask, color)
+
+    def load(self) -> None:
+        """Decodifica os pixels da entrada, se ainda não foram decodificados."""
+        if self._composite is None and getattr(self._image, "fp", None) is not None:
+            with timed("decode"):
+                self._image.load()
+
+    def _write(self, fp, compression: int) -> None:
+        # No PNG em faixas composição, compressão e escrita se intercalam; cada
+        # uma é cronometrada à parte e o encode fica com o restante
+        composing, writing = Stopwatch(), Stopwatch()
+        if self._composite is not None and self.output_format == "png":
+            image, mask, color = self._composite
+            start = time.perf_counter()
+            strips = composing.iterate(composite_strips(image, mask, color))
+            write_png(
+                strips,
+                image.size,
+                TimedWriter(fp, writing),
+                compression,
+                **source_metadata(image),
+            )
+            stage_seconds.observe("composite", composing.seconds)
+        else:
+            image = self.image
+            self.load()
+            start = time.perf_counter()
+            data = encode(image, self.output_format, compression)
+            TimedWriter(fp, writing).write(data)
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe("encode", elapsed - composing.seconds - writing.seconds)
+        if not isinstance(fp, io.BytesIO):
+            stage_seconds.observe("write", writing.seconds)
+
+    def encode(self, compression: int = 6) -> bytes:
+        """Imagem atual no formato de saída, sem passar pelo disco (compressão 0-9)."""
+        buffer = io.BytesIO()
+        self._write(buffer, compression)
+        return buffer.getvalue()
+
+    def save(self, data: bytes | None = None, compression: int = 6) -> None:
+        """Salva a imagem processada; `data` grava uma imagem já codificada (ex. do cache)."""
+        with open(self.output_path, "wb") as f:
+            if data is None:
+                self._write(f, compression)
+            else:
+                with timed("write"):
+                    f.write(data)
+        self._save_original()
 
-    def add_background(self, color: str = "black") -> None:
-        self.remove_background()
-        output = Image.new(mode="RGBA", size=self.image.size, color=color)
-        output.alpha_composite(self.image)
-        self.image = output
+    def _save_original(self) -> None:
+        with timed("copy_original"):
+            self._copy_original()
 
-    def save(self) -> None:
-        self.image.save(self.output_path)
-        if self.nome_sem_extensão != "teste":
-            shutil.copy(self.input_path, self.originals_path)
+    def _copy_original(self) -> None:
+        # ORIGINALS_MODE: hardlink (sem espaço extra), copy ou skip; guardado pelo
+        # sha256, então nomes iguais de entradas diferentes não colidem
+        if ORIGINALS_MODE == "skip":
             return
-        shutil.copy(self.input_path, self.originals_path)
+        extension = os.path.splitext(self.nome_com_extensão)[1].lstrip(".").lower()
+        if self.data is not None:
+            # Entrada recebida em memória: vai direto para o store, sem passar por entrada/
+            originals.put(
+                self.content_hash, self.data, extension, filename=self.nome_com_extensão
+            )
+        else:
+            originals.copy(
+                self.content_hash,
+                self.input_path,
+                extension,
+                hardlink=ORIGINALS_MODE == "hardlink",
+                filename=self.nome_com_extensão,
+            )
+
+    def _backgrounds(self, colors: list, max_side: int | None = None):
+        """Aplica cada cor sobre uma única máscara; gera o caminho de saída de cada uma."""
+        suffixes = [
+            "_" + "".join(f"{c:02x}" for c in ImageColor.getrgb(color))
+            for color in colors
+        ]
+        self.remove_background(max_side)
+        image, mask, _ = self._composite
+        for color, suffix in zip(colors, suffixes):
+            self._composite = (image, mask, color)
+            yield self._get_output_path(suffix)
+        self._composite = (image, mask, None)
+
+    def save_backgrounds(
+        self, colors: list, compression: int = 6, max_side: int | None = None
+    ) -> list:
+        """Salva uma variante por cor a partir de uma única máscara; retorna os caminhos."""
+        output_paths = []
+        for output_path in self._backgrounds(colors, max_side):
+            with open(output_path, "wb") as f:
+                self._write(f, compression)
+            output_paths.append(output_path)
+        self._save_original()
+        return output_paths
+
+    def encode_backgrounds(
+        self, colors: list, compression: int = 6, max_side: int | None = None
+    ):
+        """Como save_backgrounds, sem gravar: gera (caminho de saída, bytes) de cada cor."""
+        for output_path in self._backgrounds(colors, max_side):
+            yield output_path, self.encode(compression)
 
     def show(self) -> None:
         self.image.show()
 
-    def resize_image(self, size: tuple | str = "half") -> None:
+    @classmethod
+    def _decode_reduced(cls, image: Image.Image, max_side: int) -> Image.Image:
+        """
+        Imagem ainda não decodificada -> cópia com o maior lado `max_side`. JPEG usa
+        o modo draft, que decodifica direto em 1/2, 1/4 ou 1/8 da resolução.
+        """
+        if image.format == "JPEG" and max(image.size) > max_side:
+            scale = max_side / max(image.size)
+            # A escala escolhida é a menor que ainda não fica abaixo deste tamanho
+            image.draft(image.mode, tuple(math.ceil(i * scale) for i in image.size))
+        return cls._downscale(ImageOps.exif_transpose(image), max_side)
+
+    @staticmethod
+    def _downscale(image: Image.Image, max_side: int) -> Image.Image:
+        """Cópia com o maior lado limitado a `max_side`, mantendo a proporção."""
+        scale = max_side / max(image.size)
+        if scale >= 1:
+            return image
+        size = tuple(max(1, round(i * scale)) for i in image.size)
+        # reducing_gap faz a maior parte da redução com Image.reduce (muito mais rápido)
+        return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+    def resize_image(self, size: tuple | str | int = "half") -> None:
+        """Redimensiona para (largura, altura), pela metade ou, com um int, limita o maior lado."""
         if isinstance(size, tuple):
             size = (int(size[0]), int(size[1]))
+        elif isinstance(size, int) and not isinstance(size, bool) and size > 0:
+            # Sem decodificar a resolução total quando a imagem ainda não foi carregada
+            with timed("decode"):
+                self.image = self._decode_reduced(self.image, size)
+            return
         elif size == "half":
             size = tuple([int(i / 2) for i in self.image.size])
         else:
             raise ValueError(
-                "Invalid size parameter. Use 'half' or a tuple (width, height)."
+                "Invalid size parameter. Use 'half', a tuple (width, height) or a max side."
             )
         self.image = self.image.resize(size)
 
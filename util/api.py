@@ -1,12 +1,45 @@
-from flask import Flask, jsonify, request, send_file
+from concurrent.futures import ThreadPoolExecutor
+from flask import (
+    Flask,
+    Response,
+    g,
+    jsonify,
+    redirect,
+    request,
+    send_file,
+    stream_with_context,
+)
 from flasgger import Swagger
+from PIL import Image, UnidentifiedImageError
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
+from werkzeug.wsgi import FileWrapper
 from util.ImageHandler import ImageHandler
+import hmac
+import io
 import os
+import zipfile
 from util import setup_directories
 from util.constants import PATH_INPUT, PATH_OUTPUT
+from util.archive import iter_zip_items, process_batch, spool, stream_zip
+from util.batching import batching_stats
+from util.cache import file_etag, make_key, mask_cache, result_cache
+from util.encoding import (
+    extension_for,
+    mimetype_for,
+    validate_compression,
+    validate_format,
+)
+from util.jobs import QueueFullError, job_queue
+from util import metrics
+from util.profiling import profile_call
+from util.retention import sweeper
+from util.storage import RangeReader, Store, originals, outputs, uploads
+from util.upload import save_upload
+from util.models import resolve_model
+from util.sessions import registry
 from config import Config
 import logging
 
@@ -54,6 +87,7 @@ swagger_template = {
 Swagger(app, config=swagger_config, template=swagger_template)
 
 # Configure rate limiting with in-memory storage
+app.config["RATELIMIT_ENABLED"] = Config.RATELIMIT_ENABLED
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
@@ -68,7 +102,9 @@ app.config["SWAGGER"] = {
     "specs_route": "/apidocs/",
 }
 
-# Configuração para upload de arquivos
+# Configuração para upload de arquivos: corpos acima do limite são recusados
+# com 413 enquanto são lidos (a rota de lotes tem um limite próprio)
+app.config["MAX_CONTENT_LENGTH"] = Config.MAX_CONTENT_LENGTH
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
 
 
@@ -77,6 +113,16 @@ def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+@app.errorhandler(RequestEntityTooLarge)
+def request_entity_too_large(e):
+    return (
+        jsonify(
+            {"error": f"Request body too large (max {request.max_content_length} bytes)"}
+        ),
+        413,
+    )
+
+
 # Improved error handling for the upload_file endpoint
 @app.route("/api/upload", methods=["POST"])
 def upload_file():
@@ -92,18 +138,21 @@ def upload_file():
         in: formData
         type: file
         required: true
-        description: Arquivo de imagem (png, jpg, jpeg)
+        description: Arquivo de imagem (png, jpg, jpeg); o conteúdo precisa bater com a extensão e ter no máximo MAX_IMAGE_PIXELS pixels
     responses:
       200:
         description: Sucesso
         schema:
           type: object
           properties:
+            id:
+              type: string
+              description: Id do arquivo (sha256 do conteúdo), usado em remove-background e add-background; o mesmo conteúdo recebe sempre o mesmo id e é guardado uma vez só
             fileName:
               type: string
-              description: Nome do arquivo salvo
+              description: Nome original do arquivo
         examples:
-          application/json: { "fileName": "teste.jpg" }
+          application/json: { "id": "b5d4...", "fileName": "teste.jpg" }
       400:
         description: Erro na requisição
         schema:
@@ -113,6 +162,10 @@ def upload_file():
               type: string
         examples:
           application/json: { "error": "No file selected for uploading" }
+      413:
+        description: Corpo acima de MAX_CONTENT_LENGTH
+        examples:
+          application/json: { "error": "Request body too large (max 5242880 bytes)" }
       500:
         description: Erro inesperado
         schema:
@@ -124,24 +177,20 @@ def upload_file():
           application/json: { "error": "An unexpected error occurred" }
     """
     try:
-        if "file" not in request.files:
+        boundary = request.mimetype_params.get("boundary")
+        if request.mimetype != "multipart/form-data" or not boundary:
             return jsonify({"error": "No file part in the request"}), 400
 
-        file = request.files["file"]
-
-        if file.filename == "":
-            return jsonify({"error": "No file selected for uploading"}), 400
-
-        if not allowed_file(file.filename):
-            return (
-                jsonify({"error": "Invalid file extension. Allowed: png, jpg, jpeg"}),
-                400,
-            )
-
-        file_path = os.path.join(PATH_INPUT, file.filename)
-        file.save(file_path)
+        # Grava em blocos enquanto o corpo chega, conferindo antes o cabeçalho
+        file_id, file_name = save_upload(
+            request.stream, boundary.encode("latin-1"), uploads
+        )
 
-        return jsonify({"fileName": file.filename}), 200
+        return jsonify({"id": file_id, "fileName": file_name}), 200
+    except HTTPException:
+        raise
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except IOError as e:
         logging.exception("I/O error during file upload")
         return jsonify({"error": "Failed to save the file. Please try again."}), 500
@@ -160,14 +209,322 @@ except Exception as e:
 # Endpoint para remover o fundo da imagem
 
 
-def get_download_url(filename):
+def get_download_url(output_id):
     # Pega o host da requisição para gerar URL absoluta
     host = request.headers.get("Host", request.host)
     if "ngrok" in host:
         scheme = "https"
     else:
         scheme = request.scheme
-    return f"{scheme}://{host}/api/download?file={filename}"
+    # v=<sha256> versiona a URL: o conteúdo dela nunca muda e pode ir para cache
+    version = outputs.etag(output_id)
+    return f"{scheme}://{host}/api/download?id={output_id}&v={version}"
+
+
+def get_resolution() -> tuple:
+    """(max_side, preview) a partir dos parâmetros quality e max_side da requisição."""
+    quality = request.args.get("quality", Config.DEFAULT_QUALITY)
+    if quality not in Config.QUALITY_PRESETS:
+        raise ValueError(
+            f"Invalid quality. Allowed: {', '.join(Config.QUALITY_PRESETS)}"
+        )
+    max_side = Config.QUALITY_PRESETS[quality]
+    if request.args.get("max_side"):
+        try:
+            max_side = int(request.args["max_side"])
+        except ValueError:
+            max_side = 0
+        if max_side <= 0:
+            raise ValueError("max_side must be a positive integer")
+    return max_side, quality == "preview"
+
+
+def get_encoding(background: bool = False) -> tuple:
+    """
+    (formato, compressão) da requisição. Sem ?compression= a resposta síncrona
+    usa o nível rápido e jobs/lotes usam a compressão máxima.
+    """
+    output_format = validate_format(request.args.get("format", Config.OUTPUT_FORMAT))
+    default = Config.BACKGROUND_COMPRESSION if background else Config.SYNC_COMPRESSION
+    compression = validate_compression(request.args.get("compression", default))
+    return output_format, compression
+
+
+def choose_model(source, size: tuple | None = None) -> str:
+    """
+    Modelo pedido em ?model= (ou escolhido pelo roteamento) para a imagem
+    `source`, ou para uma imagem de tamanho `size` já conhecido.
+    """
+    if size is None:
+        with Image.open(source) as image:
+            size = image.size  # só o cabeçalho é lido
+    return resolve_model(request.args.get("model"), size, job_queue.pending)
+
+
+def input_size(file_id: str | None) -> tuple | None:
+    """(largura, altura) gravados com a entrada, sem abri-la (nem baixá-la do backend)."""
+    if not file_id:
+        return None
+    metadata = uploads.metadata(file_id)
+    if "width" not in metadata:
+        return None
+    return metadata["width"], metadata["height"]
+
+
+def result_key(
+    handler: ImageHandler,
+    color: str | None = None,
+    max_side: int | None = None,
+    preview: bool = False,
+) -> str:
+    """Chave do resultado no cache, que também é o id dele em saida/."""
+    operation = "remove-background" if color is None else "add-background"
+    params = {"model": handler.model_name, "color": color}
+    # Só entram na chave quando usados: os resultados em resolução total
+    # continuam com a mesma chave de antes
+    if max_side is not None:
+        params.update(max_side=max_side, preview=preview)
+    # O nível de compressão não entra: o conteúdo da imagem é o mesmo
+    if handler.output_format != "png":
+        params["format"] = handler.output_format
+    return make_key(handler.content_hash, operation, **params)
+
+
+def render_image(
+    handler: ImageHandler,
+    color: str | None = None,
+    max_side: int | None = None,
+    preview: bool = False,
+    compression: int = Config.SYNC_COMPRESSION,
+    store: Store | None = None,
+) -> bytes:
+    """
+    Imagem com o fundo removido (e a cor aplicada, se informada) no formato de
+    saída do handler, do cache quando possível.
+    `max_side` limita a resolução da inferência; com `preview` a própria imagem é
+    reduzida e o resultado sai nesse tamanho, com sufixo _preview.
+    Quem grava o resultado num store pelo id (ex. outputs) passa esse `store`,
+    que serve de cache no lugar do result_cache: o resultado fica guardado uma vez só.
+    """
+    if preview:
+        handler.output_path = handler._get_output_path("_preview")
+    key = None
+    if store is not None:
+        key = result_key(handler, color, max_side, preview)
+        if store.exists(key):
+            store.touch(key)
+            with store.open(key) as f:
+                return f.read()
+    elif result_cache.enabled:
+        key = result_key(handler, color, max_side, preview)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if preview and max_side is not None:
+        handler.resize_image(max_side)
+        max_side = None
+    if color is None:
+        handler.remove_background(max_side)
+    else:
+        handler.add_background(color, max_side)
+    data = handler.encode(compression)
+
+    if key is not None and store is None:
+        result_cache.put(key, data)
+    return data
+
+
+def resolve_input(file_id: str | None, file_name: str | None = None) -> tuple:
+    """
+    (caminho, nome original) da entrada com o id devolvido por /api/upload; o
+    caminho é None se o backend não guarda no disco local (s3, memory).
+    `file_name` é o acesso antigo, a um arquivo salvo direto em entrada/.
+    """
+    if file_id:
+        metadata = uploads.metadata(file_id)
+        uploads.touch(file_id)
+        return uploads.local_path(file_id), metadata["filename"]
+    if not file_name:
+        raise ValueError("File id is required")
+    path = os.path.join(PATH_INPUT, os.path.basename(file_name))
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"File not found: {file_name}")
+    return path, os.path.basename(file_name)
+
+
+def open_input(
+    file_id: str | None,
+    file_name: str | None = None,
+    model_name: str | None = None,
+    output_format: str = Config.OUTPUT_FORMAT,
+) -> ImageHandler:
+    input_path, name = resolve_input(file_id, file_name)
+    data = None
+    if input_path is None:
+        # Backend remoto: a entrada é processada em memória
+        with uploads.open(file_id) as f:
+            data = f.read()
+        input_path = name
+    handler = ImageHandler(
+        input_path,
+        model_name=model_name or Config.DEFAULT_MODEL,
+        data=data,
+        output_format=output_format,
+        name=name,
+    )
+    if file_id:
+        handler.content_hash = file_id  # o id já é o sha256 da entrada
+    return handler
+
+
+def save_result(
+    handler: ImageHandler, output_id: str, data: bytes, filename: str | None = None
+) -> None:
+    """Grava o resultado em saida/ e a entrada em originais/ (ORIGINALS_MODE), ambos por id."""
+    with metrics.timed("write"):
+        outputs.put(
+            output_id,
+            data,
+            extension_for(handler.output_format),
+            filename=filename or os.path.basename(handler.output_path),
+            source=handler.content_hash,
+        )
+    if Config.ORIGINALS_MODE == "skip":
+        return
+    hardlink = Config.ORIGINALS_MODE == "hardlink"
+    with metrics.timed("copy_original"):
+        if uploads.exists(handler.content_hash):
+            # Hardlink no backend local; no S3, cópia no servidor
+            originals.copy_from(
+                uploads, handler.content_hash, hardlink=hardlink,
+                filename=handler.nome_com_extensão,
+            )
+        else:
+            # Arquivo salvo direto em entrada/, antes dos ids
+            originals.copy(
+                handler.content_hash,
+                handler.input_path,
+                os.path.splitext(handler.input_path)[1].lstrip(".").lower(),
+                hardlink=hardlink,
+                filename=handler.nome_com_extensão,
+            )
+
+
+def process_image(
+    file_id: str | None = None,
+    color: str | None = None,
+    max_side: int | None = None,
+    preview: bool = False,
+    model_name: str | None = None,
+    output_format: str = Config.OUTPUT_FORMAT,
+    compression: int = Config.BACKGROUND_COMPRESSION,
+    file_name: str | None = None,
+) -> str:
+    """
+    Processa uma entrada (pelo id, ou pelo nome antigo em entrada/) e grava o
+    resultado em saida/; retorna o id do resultado. Um resultado que já está
+    em saida/ não é processado de novo.
+    """
+    handler = open_input(file_id, file_name, model_name, output_format)
+    output_id = result_key(handler, color, max_side, preview)
+    if outputs.exists(output_id):
+        outputs.touch(output_id)
+    else:
+        data = render_image(handler, color, max_side, preview, compression, outputs)
+        save_result(handler, output_id, data)
+    return output_id
+
+
+# Gravação opcional dos resultados de /api/process fora do caminho da resposta
+persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+
+
+def persist_result(
+    handler: ImageHandler,
+    data: bytes,
+    color: str | None = None,
+    max_side: int | None = None,
+    preview: bool = False,
+) -> None:
+    try:
+        extension = os.path.splitext(handler.input_path)[1].lstrip(".").lower()
+        with Image.open(io.BytesIO(handler.data)) as image:
+            width, height = image.size
+        uploads.put(
+            handler.content_hash,
+            handler.data,
+            extension,
+            filename=handler.nome_com_extensão,
+            width=width,
+            height=height,
+        )
+        save_result(handler, result_key(handler, color, max_side, preview), data)
+    except Exception:
+        logging.exception(f"Failed to persist {handler.nome_com_extensão}")
+
+
+job_queue.register("remove-background", process_image)
+job_queue.register("add-background", process_image)
+
+
+@app.before_request
+def start_job_queue():
+    # Inicia o pool e a retenção no processo que atende as requisições (após o
+    # fork do gunicorn)
+    job_queue.start()
+    sweeper.start()
+
+
+@app.before_request
+def track_request_start():
+    metrics.in_flight.inc()
+    g.in_flight = True
+
+
+@app.teardown_request
+def track_request_end(exception=None):
+    # teardown roda também quando a view falha ou a resposta é um stream, e
+    # também quando um before_request anterior (ex. o rate limit) encerrou a
+    # requisição antes da contagem
+    if g.pop("in_flight", False):
+        metrics.in_flight.dec()
+
+
+def is_async_request() -> bool:
+    return request.args.get("async", "").lower() in ("1", "true", "yes")
+
+
+def is_profile_request() -> bool:
+    """
+    Header X-Profile pedindo o profiling, só se PROFILING_ENABLED estiver ligado.
+    Não é aceito na query string, que vai para os logs de acesso com o token.
+    """
+    if not Config.PROFILING_ENABLED:
+        return False
+    flag = request.headers.get("X-Profile", "")
+    if Config.PROFILING_TOKEN:
+        return hmac.compare_digest(flag.encode(), Config.PROFILING_TOKEN.encode())
+    return flag.lower() in ("1", "true", "yes")
+
+
+def enqueue_job(operation: str, **params):
+    try:
+        job_id = job_queue.submit(operation, **params)
+    except QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "30"
+        return response, 503
+    return (
+        jsonify(
+            {
+                "message": "Job queued",
+                "job_id": job_id,
+                "status_url": f"/api/jobs/{job_id}",
+            }
+        ),
+        202,
+    )
 
 
 # Improved error handling with specific exceptions and meaningful messages
@@ -179,25 +536,83 @@ def remove_background():
     tags:
       - imagens
     parameters:
-      - name: file
+      - name: id
         in: query
         type: string
         required: true
-        description: Nome do arquivo (ex teste.jpg)
+        description: Id devolvido por /api/upload
+      - name: file
+        in: query
+        type: string
+        required: false
+        description: Nome de um arquivo salvo direto em entrada/ antes dos ids (ex teste.jpg); ignorado quando id é informado
+      - name: async
+        in: query
+        type: boolean
+        required: false
+        description: Enfileira o processamento e retorna o id do job (202)
+      - name: quality
+        in: query
+        type: string
+        required: false
+        default: full
+        enum: [full, balanced, fast, preview]
+        description: Resolução da inferência (maior lado full=original, balanced=2048, fast=1024); preview devolve um resultado reduzido (512) com sufixo _preview
+      - name: max_side
+        in: query
+        type: integer
+        required: false
+        description: Maior lado usado na inferência, em pixels (sobrepõe quality); a máscara é ampliada seguindo as bordas da imagem original
+      - name: model
+        in: query
+        type: string
+        required: false
+        enum: [u2net, u2netp, silueta, isnet-general-use, auto]
+        description: Modelo usado na inferência (padrão REMBG_MODEL); auto usa o modelo leve para imagens pequenas ou com a fila longa
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: png
+        enum: [png, webp, webp-lossy, avif]
+        description: Formato da saída; webp é sem perdas, webp-lossy e avif usam OUTPUT_QUALITY
+      - name: compression
+        in: query
+        type: integer
+        required: false
+        minimum: 0
+        maximum: 9
+        description: Compressão de 0 (mais rápido) a 9 (menor arquivo); padrão SYNC_COMPRESSION na resposta síncrona e BACKGROUND_COMPRESSION em jobs e lotes
+      - name: X-Profile
+        in: header
+        type: string
+        required: false
+        description: Com PROFILING_ENABLED, grava um perfil da requisição em PROFILE_DIR e devolve o id em X-Profile-Id (1, ou o PROFILING_TOKEN quando configurado). Ignorado em async=1
     responses:
       200:
         description: Fundo removido com sucesso
+        headers:
+          X-Profile-Id:
+            type: string
+            description: Id do perfil gravado (só com profile)
         schema:
           type: object
           properties:
             message:
               type: string
               description: Mensagem de sucesso
+            id:
+              type: string
+              description: Id do resultado; a mesma entrada com os mesmos parâmetros tem sempre o mesmo id
             download_url:
               type: string
               description: URL para download da imagem processada
         examples:
-          application/json: { "message": "Background removed successfully", "download_url": "http://localhost:8000/api/download?file=teste.png" }
+          application/json: { "message": "Background removed successfully", "id": "9a1f...", "download_url": "http://localhost:8000/api/download?id=9a1f...&v=..." }
+      202:
+        description: Job enfileirado (async=1)
+        examples:
+          application/json: { "message": "Job queued", "job_id": "3f1c...", "status_url": "/api/jobs/3f1c..." }
       400:
         description: Erro ao processar a imagem
         schema:
@@ -206,32 +621,56 @@ def remove_background():
             error:
               type: string
         examples:
-          application/json: { "error": "File path is required" }
+          application/json: { "error": "File id is required" }
+      503:
+        description: Fila de jobs cheia (async=1), tente novamente após Retry-After
     """
     try:
-        file_name = request.args.get("file")
-        if not file_name:
-            return jsonify({"error": "File path is required"}), 400
-
-        file_path = os.path.join(PATH_INPUT, file_name)
-        if not os.path.exists(file_path):
-            return jsonify({"error": f"File not found: {file_name}"}), 404
-
-        handler = ImageHandler(file_path)
-        handler.remove_background()
-        handler.save()
-        input_name = os.path.splitext(os.path.basename(file_name))[0]
-        download_filename = f"{input_name}.png"
-        download_url = get_download_url(download_filename)
-        return (
-            jsonify(
-                {
-                    "message": "Background removed successfully",
-                    "download_url": download_url,
-                }
-            ),
-            200,
+        file_id = request.args.get("id")
+        file_name = None if file_id else request.args.get("file")
+        file_path, name = resolve_input(file_id, file_name)
+
+        max_side, preview = get_resolution()
+        output_format, compression = get_encoding(background=is_async_request())
+        model_name = choose_model(file_path, input_size(file_id))
+        if is_async_request():
+            return enqueue_job(
+                "remove-background",
+                file_id=file_id,
+                file_name=file_name,
+                max_side=max_side,
+                preview=preview,
+                model_name=model_name,
+                output_format=output_format,
+                compression=compression,
+            )
+
+        args = (file_id, None, max_side, preview, model_name, output_format, compression)
+        profile_id = None
+        if is_profile_request():
+            output_id, profile_id = profile_call(
+                process_image,
+                *args,
+                file_name=file_name,
+                name=f"remove-background {name}",
+                profiler=Config.PROFILER,
+                directory=Config.PROFILE_DIR,
+                interval=Config.PROFILE_SAMPLE_INTERVAL,
+            )
+            logging.info(f"Profile {profile_id} written to {Config.PROFILE_DIR}")
+        else:
+            output_id = process_image(*args, file_name=file_name)
+        download_url = get_download_url(output_id)
+        response = jsonify(
+            {
+                "message": "Background removed successfully",
+                "id": output_id,
+                "download_url": download_url,
+            }
         )
+        if profile_id is not None:
+            response.headers["X-Profile-Id"] = profile_id
+        return response, 200
     except FileNotFoundError as e:
         logging.exception("File not found error")
         return jsonify({"error": str(e)}), 404
@@ -252,17 +691,59 @@ def add_background():
     tags:
       - imagens
     parameters:
-      - name: file
+      - name: id
         in: query
         type: string
         required: true
-        description: Nome do arquivo (ex teste.jpg)
+        description: Id devolvido por /api/upload
+      - name: file
+        in: query
+        type: string
+        required: false
+        description: Nome de um arquivo salvo direto em entrada/ antes dos ids (ex teste.jpg); ignorado quando id é informado
       - name: color
         in: query
         type: string
         required: false
         default: "#000000"
         description: Cor em hexadecimal (ex #FFFFFF)
+      - name: async
+        in: query
+        type: boolean
+        required: false
+        description: Enfileira o processamento e retorna o id do job (202)
+      - name: quality
+        in: query
+        type: string
+        required: false
+        default: full
+        enum: [full, balanced, fast, preview]
+        description: Resolução da inferência (maior lado full=original, balanced=2048, fast=1024); preview devolve um resultado reduzido (512) com sufixo _preview
+      - name: max_side
+        in: query
+        type: integer
+        required: false
+        description: Maior lado usado na inferência, em pixels (sobrepõe quality); a máscara é ampliada seguindo as bordas da imagem original
+      - name: model
+        in: query
+        type: string
+        required: false
+        enum: [u2net, u2netp, silueta, isnet-general-use, auto]
+        description: Modelo usado na inferência (padrão REMBG_MODEL); auto usa o modelo leve para imagens pequenas ou com a fila longa
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: png
+        enum: [png, webp, webp-lossy, avif]
+        description: Formato da saída; webp é sem perdas, webp-lossy e avif usam OUTPUT_QUALITY
+      - name: compression
+        in: query
+        type: integer
+        required: false
+        minimum: 0
+        maximum: 9
+        description: Compressão de 0 (mais rápido) a 9 (menor arquivo); padrão SYNC_COMPRESSION na resposta síncrona e BACKGROUND_COMPRESSION em jobs e lotes
     responses:
       200:
         description: Fundo adicionado com sucesso
@@ -272,11 +753,18 @@ def add_background():
             message:
               type: string
               description: Mensagem de sucesso
+            id:
+              type: string
+              description: Id do resultado; a mesma entrada com os mesmos parâmetros tem sempre o mesmo id
             download_url:
               type: string
               description: URL para download da imagem processada
         examples:
-          application/json: { "message": "Background added successfully", "download_url": "http://localhost:8000/api/download?file=teste.png" }
+          application/json: { "message": "Background added successfully", "id": "9a1f...", "download_url": "http://localhost:8000/api/download?id=9a1f...&v=..." }
+      202:
+        description: Job enfileirado (async=1)
+        examples:
+          application/json: { "message": "Job queued", "job_id": "3f1c...", "status_url": "/api/jobs/3f1c..." }
       400:
         description: Erro ao processar a imagem
         schema:
@@ -285,28 +773,48 @@ def add_background():
             error:
               type: string
         examples:
-          application/json: { "error": "File name is required" }
+          application/json: { "error": "File id is required" }
+      503:
+        description: Fila de jobs cheia (async=1), tente novamente após Retry-After
     """
     try:
-        file_name = request.args.get("file")
+        file_id = request.args.get("id")
+        file_name = None if file_id else request.args.get("file")
         color = request.args.get("color", "#000000")
-        if not file_name:
-            return jsonify({"error": "File name is required"}), 400
-
-        file_path = os.path.join(PATH_INPUT, file_name)
-        if not os.path.exists(file_path):
-            return jsonify({"error": f"File not found: {file_name}"}), 404
-
-        handler = ImageHandler(file_path)
-        handler.add_background(color)
-        handler.save()
-        input_name = os.path.splitext(file_name)[0]
-        download_filename = f"{input_name}.png"
-        download_url = get_download_url(download_filename)
+        file_path, _ = resolve_input(file_id, file_name)
+
+        max_side, preview = get_resolution()
+        output_format, compression = get_encoding(background=is_async_request())
+        model_name = choose_model(file_path, input_size(file_id))
+        if is_async_request():
+            return enqueue_job(
+                "add-background",
+                file_id=file_id,
+                file_name=file_name,
+                color=color,
+                max_side=max_side,
+                preview=preview,
+                model_name=model_name,
+                output_format=output_format,
+                compression=compression,
+            )
+
+        output_id = process_image(
+            file_id,
+            color,
+            max_side,
+            preview,
+            model_name,
+            output_format,
+            compression,
+            file_name=file_name,
+        )
+        download_url = get_download_url(output_id)
         return (
             jsonify(
                 {
                     "message": "Background added successfully",
+                    "id": output_id,
                     "download_url": download_url,
                 }
             ),
@@ -323,6 +831,444 @@ def add_background():
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 
+@app.route("/api/add-backgrounds", methods=["POST"])
+def add_backgrounds():
+    """
+    Adiciona vários fundos coloridos com uma única inferência
+    ---
+    tags:
+      - imagens
+    parameters:
+      - name: id
+        in: query
+        type: string
+        required: true
+        description: Id devolvido por /api/upload
+      - name: file
+        in: query
+        type: string
+        required: false
+        description: Nome de um arquivo salvo direto em entrada/ antes dos ids (ex teste.jpg); ignorado quando id é informado
+      - name: color
+        in: query
+        type: array
+        items:
+          type: string
+        collectionFormat: multi
+        required: true
+        description: Cores em hexadecimal, repita o parâmetro para cada cor (ex color=#FFFFFF&color=#000000)
+      - name: quality
+        in: query
+        type: string
+        required: false
+        default: full
+        enum: [full, balanced, fast, preview]
+        description: Resolução da inferência (maior lado full=original, balanced=2048, fast=1024); preview devolve resultados reduzidos (512) com sufixo _preview
+      - name: max_side
+        in: query
+        type: integer
+        required: false
+        description: Maior lado usado na inferência, em pixels (sobrepõe quality); a máscara é ampliada seguindo as bordas da imagem original
+      - name: model
+        in: query
+        type: string
+        required: false
+        enum: [u2net, u2netp, silueta, isnet-general-use, auto]
+        description: Modelo usado na inferência (padrão REMBG_MODEL); auto usa o modelo leve para imagens pequenas ou com a fila longa
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: png
+        enum: [png, webp, webp-lossy, avif]
+        description: Formato da saída; webp é sem perdas, webp-lossy e avif usam OUTPUT_QUALITY
+      - name: compression
+        in: query
+        type: integer
+        required: false
+        minimum: 0
+        maximum: 9
+        description: Compressão de 0 (mais rápido) a 9 (menor arquivo); padrão SYNC_COMPRESSION na resposta síncrona e BACKGROUND_COMPRESSION em jobs e lotes
+    responses:
+      200:
+        description: Fundos adicionados com sucesso
+        examples:
+          application/json: { "message": "Backgrounds added successfully", "ids": { "#FFFFFF": "9a1f..." }, "download_urls": { "#FFFFFF": "http://localhost:8000/api/download?id=9a1f...&v=..." } }
+      400:
+        description: Erro ao processar a imagem
+        examples:
+          application/json: { "error": "At least one color is required" }
+    """
+    try:
+        file_id = request.args.get("id")
+        file_name = None if file_id else request.args.get("file")
+        colors = request.args.getlist("color")
+        file_path, _ = resolve_input(file_id, file_name)
+        if not colors:
+            return jsonify({"error": "At least one color is required"}), 400
+
+        max_side, preview = get_resolution()
+        output_format, compression = get_encoding()
+        model_name = choose_model(file_path, input_size(file_id))
+        handler = open_input(file_id, file_name, model_name, output_format)
+        # Mesmos ids de /api/add-background com os mesmos parâmetros
+        ids = {color: result_key(handler, color, max_side, preview) for color in colors}
+        missing = []
+        for color, output_id in ids.items():
+            if outputs.exists(output_id):
+                outputs.touch(output_id)
+            else:
+                missing.append(color)
+
+        if preview and max_side is not None:
+            handler.resize_image(max_side)
+            max_side = None
+        for color, (output_path, data) in zip(
+            missing, handler.encode_backgrounds(missing, compression, max_side)
+        ):
+            filename = os.path.basename(output_path)
+            if preview:
+                stem, extension = os.path.splitext(filename)
+                filename = f"{stem}_preview{extension}"
+            save_result(handler, ids[color], data, filename)
+        return (
+            jsonify(
+                {
+                    "message": "Backgrounds added successfully",
+                    "ids": ids,
+                    "download_urls": {
+                        color: get_download_url(output_id)
+                        for color, output_id in ids.items()
+                    },
+                }
+            ),
+            200,
+        )
+    except FileNotFoundError as e:
+        logging.exception("File not found error")
+        return jsonify({"error": str(e)}), 404
+    except ValueError as e:
+        logging.exception("Value error")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.exception("Unexpected error in add_backgrounds")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+
+@app.route("/api/process", methods=["POST"])
+def process_in_memory():
+    """
+    Remove o fundo e devolve a imagem na própria resposta
+    ---
+    tags:
+      - imagens
+    consumes:
+      - multipart/form-data
+      - application/octet-stream
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: false
+        description: Arquivo de imagem (png, jpg, jpeg); alternativamente envie os bytes no corpo
+      - name: name
+        in: query
+        type: string
+        required: false
+        description: Nome do arquivo quando os bytes vão no corpo (ex teste.jpg)
+      - name: color
+        in: query
+        type: string
+        required: false
+        description: Cor do fundo em hexadecimal; sem cor o fundo fica transparente
+      - name: persist
+        in: query
+        type: boolean
+        required: false
+        description: Salva entrada e resultado nas pastas de imagens em segundo plano
+      - name: quality
+        in: query
+        type: string
+        required: false
+        default: full
+        enum: [full, balanced, fast, preview]
+        description: Resolução da inferência (maior lado full=original, balanced=2048, fast=1024); preview devolve um resultado reduzido (512) com sufixo _preview
+      - name: max_side
+        in: query
+        type: integer
+        required: false
+        description: Maior lado usado na inferência, em pixels (sobrepõe quality); a máscara é ampliada seguindo as bordas da imagem original
+      - name: model
+        in: query
+        type: string
+        required: false
+        enum: [u2net, u2netp, silueta, isnet-general-use, auto]
+        description: Modelo usado na inferência (padrão REMBG_MODEL); auto usa o modelo leve para imagens pequenas ou com a fila longa
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: png
+        enum: [png, webp, webp-lossy, avif]
+        description: Formato da saída; webp é sem perdas, webp-lossy e avif usam OUTPUT_QUALITY
+      - name: compression
+        in: query
+        type: integer
+        required: false
+        minimum: 0
+        maximum: 9
+        description: Compressão de 0 (mais rápido) a 9 (menor arquivo); padrão SYNC_COMPRESSION na resposta síncrona e BACKGROUND_COMPRESSION em jobs e lotes
+    produces:
+      - image/png
+      - image/webp
+      - image/avif
+    responses:
+      200:
+        description: Imagem processada no formato pedido
+        schema:
+          type: file
+      400:
+        description: Erro na requisição
+        examples:
+          application/json: { "error": "No image data in the request" }
+      413:
+        description: Corpo acima de MAX_CONTENT_LENGTH
+    """
+    try:
+        if "file" in request.files:
+            file = request.files["file"]
+            file_name = file.filename
+            data = file.read()
+        else:
+            file_name = request.args.get("name", "upload.png")
+            data = request.get_data()
+
+        if not data:
+            return jsonify({"error": "No image data in the request"}), 400
+        if not allowed_file(file_name):
+            return (
+                jsonify({"error": "Invalid file extension. Allowed: png, jpg, jpeg"}),
+                400,
+            )
+
+        max_side, preview = get_resolution()
+        output_format, compression = get_encoding()
+        handler = ImageHandler(
+            os.path.join(PATH_INPUT, os.path.basename(file_name)),
+            model_name=choose_model(io.BytesIO(data)),
+            data=data,
+            output_format=output_format,
+        )
+        color = request.args.get("color")
+        persist = request.args.get("persist", "").lower() in ("1", "true", "yes")
+        # Resultados persistidos ficam em saida/, que já é o cache deles
+        result = render_image(
+            handler, color, max_side, preview, compression, outputs if persist else None
+        )
+
+        if persist:
+            persist_executor.submit(persist_result, handler, result, color, max_side, preview)
+
+        return send_file(
+            io.BytesIO(result),
+            mimetype=mimetype_for(handler.output_path),
+            download_name=os.path.basename(handler.output_path),
+        )
+    except HTTPException:
+        raise
+    except UnidentifiedImageError:
+        return jsonify({"error": "The file is not a valid image"}), 400
+    except ValueError as e:
+        logging.exception("Value error")
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logging.exception("Unexpected error in process_in_memory")
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+
+batch_executor = ThreadPoolExecutor(
+    max_workers=Config.BATCH_WORKERS, thread_name_prefix="batch"
+)
+
+
+@app.route("/api/batch/remove-background", methods=["POST"])
+def batch_remove_background():
+    """
+    Remove o fundo de várias imagens e devolve um ZIP por streaming
+    ---
+    tags:
+      - imagens
+    consumes:
+      - multipart/form-data
+      - application/zip
+    parameters:
+      - name: files
+        in: formData
+        type: file
+        required: false
+        description: Imagens (png, jpg, jpeg); repita o campo para cada arquivo
+      - name: archive
+        in: formData
+        type: file
+        required: false
+        description: ZIP com as imagens; alternativamente envie o ZIP no corpo (application/zip)
+      - name: color
+        in: query
+        type: string
+        required: false
+        description: Cor do fundo em hexadecimal; sem cor o fundo fica transparente
+      - name: quality
+        in: query
+        type: string
+        required: false
+        default: full
+        enum: [full, balanced, fast, preview]
+        description: Resolução da inferência (maior lado full=original, balanced=2048, fast=1024); preview devolve um resultado reduzido (512) com sufixo _preview
+      - name: max_side
+        in: query
+        type: integer
+        required: false
+        description: Maior lado usado na inferência, em pixels (sobrepõe quality); a máscara é ampliada seguindo as bordas da imagem original
+      - name: model
+        in: query
+        type: string
+        required: false
+        enum: [u2net, u2netp, silueta, isnet-general-use, auto]
+        description: Modelo usado na inferência (padrão REMBG_MODEL); auto usa o modelo leve para imagens pequenas ou com a fila longa
+      - name: format
+        in: query
+        type: string
+        required: false
+        default: png
+        enum: [png, webp, webp-lossy, avif]
+        description: Formato da saída; webp é sem perdas, webp-lossy e avif usam OUTPUT_QUALITY
+      - name: compression
+        in: query
+        type: integer
+        required: false
+        minimum: 0
+        maximum: 9
+        description: Compressão de 0 (mais rápido) a 9 (menor arquivo); padrão SYNC_COMPRESSION na resposta síncrona e BACKGROUND_COMPRESSION em jobs e lotes
+    produces:
+      - application/zip
+    responses:
+      200:
+        description: ZIP com um PNG por imagem processada e manifest.json com o status de cada item
+        schema:
+          type: file
+      400:
+        description: Erro na requisição
+        examples:
+          application/json: { "error": "No images in the request" }
+      413:
+        description: Corpo acima de BATCH_MAX_CONTENT_LENGTH
+    """
+    request.max_content_length = Config.BATCH_MAX_CONTENT_LENGTH
+    body = None
+    try:
+        try:
+            if "archive" in request.files:
+                items = iter_zip_items(request.files["archive"].stream)
+            elif request.mimetype == "application/zip":
+                # Corpo lido do stream para um temporário, sem get_data()
+                body = spool(request.stream)
+                items = iter_zip_items(body)
+            else:
+                items = [
+                    (file.filename, file.read)
+                    for file in request.files.getlist("files")
+                    if file.filename
+                ]
+        except zipfile.BadZipFile:
+            return jsonify({"error": "Invalid ZIP archive"}), 400
+
+        if not items:
+            return jsonify({"error": "No images in the request"}), 400
+        if len(items) > Config.BATCH_MAX_ITEMS:
+            return (
+                jsonify({"error": f"Too many images (max {Config.BATCH_MAX_ITEMS})"}),
+                400,
+            )
+
+        color = request.args.get("color")
+        requested_model = request.args.get("model")
+        try:
+            max_side, preview = get_resolution()
+            output_format, compression = get_encoding(background=True)
+            # Valida o modelo antes de começar o streaming
+            resolve_model(requested_model, (0, 0))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        def render(name: str, data: bytes) -> bytes:
+            with Image.open(io.BytesIO(data)) as image:
+                size = image.size
+            if size[0] * size[1] > Config.MAX_IMAGE_PIXELS:
+                raise ValueError(
+                    f"Image too large: {size[0]}x{size[1]}"
+                    f" (max {Config.MAX_IMAGE_PIXELS} pixels)"
+                )
+            handler = ImageHandler(
+                os.path.join(PATH_INPUT, os.path.basename(name)),
+                model_name=resolve_model(requested_model, size, job_queue.pending),
+                data=data,
+                output_format=output_format,
+            )
+            return render_image(handler, color, max_side, preview, compression)
+
+        results = process_batch(
+            render, items, batch_executor, window=2 * Config.BATCH_WORKERS
+        )
+        response = Response(
+            stream_with_context(stream_zip(results, extension_for(output_format))),
+            mimetype="application/zip",
+            headers={"Content-Disposition": "attachment; filename=resultados.zip"},
+        )
+        if body is not None:
+            # Os membros são lidos durante o streaming: fecha só no fim da resposta
+            response.call_on_close(body.close)
+            body = None
+        return response
+    finally:
+        if body is not None:
+            body.close()
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """
+    Status de um job assíncrono
+    ---
+    tags:
+      - imagens
+    parameters:
+      - name: job_id
+        in: path
+        type: string
+        required: true
+        description: Id retornado por remove-background/add-background com async=1
+    responses:
+      200:
+        description: Status do job (queued, running, done ou failed)
+        examples:
+          application/json: { "job_id": "3f1c...", "status": "done", "download_url": "http://localhost:8000/api/download?id=9a1f...&v=..." }
+      404:
+        description: Job não encontrado
+        examples:
+          application/json: { "error": "Job not found: 3f1c..." }
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+
+    body = {"job_id": job["id"], "status": job["status"]}
+    if job["result"]:
+        body["download_url"] = get_download_url(job["result"])
+    if job["error"]:
+        body["error"] = job["error"]
+    return jsonify(body), 200
+
+
 @app.route("/api/download", methods=["GET", "OPTIONS"])
 def download_image():
     """
@@ -331,11 +1277,31 @@ def download_image():
     tags:
       - imagens
     parameters:
-      - name: file
+      - name: id
         in: query
         type: string
         required: true
-        description: Nome do arquivo (ex teste.png)
+        description: Id do resultado, como na download_url; o arquivo é baixado com o nome original
+      - name: file
+        in: query
+        type: string
+        required: false
+        description: Nome de um arquivo salvo direto em saida/ antes dos ids (ex teste.png)
+      - name: v
+        in: query
+        type: string
+        required: false
+        description: Versão (sha256) do arquivo, como na download_url; quando confere a resposta pode ficar em cache por DOWNLOAD_MAX_AGE
+      - name: If-None-Match
+        in: header
+        type: string
+        required: false
+        description: ETag de uma cópia anterior; se o arquivo não mudou a resposta é 304
+      - name: Range
+        in: header
+        type: string
+        required: false
+        description: Intervalo de bytes (ex bytes=0-1023), respondido com 206
     responses:
       200:
         description: Sucesso
@@ -343,6 +1309,12 @@ def download_image():
           type: file
         examples:
           application/octet-stream: (arquivo binário)
+      206:
+        description: Parte do arquivo (Range)
+      302:
+        description: Redirecionamento para uma URL pré-assinada (STORAGE_BACKEND=s3), válida por PRESIGNED_URL_EXPIRES segundos
+      304:
+        description: Não modificado (If-None-Match)
       400:
         description: Parâmetro ausente ou inválido
         schema:
@@ -351,7 +1323,7 @@ def download_image():
             error:
               type: string
         examples:
-          application/json: { "error": "File parameter is required" }
+          application/json: { "error": "File id is required" }
       404:
         description: Arquivo não encontrado
         schema:
@@ -377,26 +1349,64 @@ def download_image():
         response.headers["Access-Control-Allow-Methods"] = "GET, OPTIONS"
         response.headers["Access-Control-Allow-Headers"] = "*"
         response.headers["Access-Control-Allow-Credentials"] = "true"
-        response.headers["Access-Control-Expose-Headers"] = (
-            "Content-Disposition, Content-Length, Content-Type"
+        response.headers["Access-Control-Expose-Headers"] = ", ".join(
+            Config.CORS_EXPOSE_HEADERS
         )
         response.headers["Vary"] = "Origin"
         return response
     try:
+        output_id = request.args.get("id")
         file_name = request.args.get("file")
-        if not file_name:
-            return jsonify({"error": "File parameter is required"}), 400
-
-        output_path = os.path.join(PATH_OUTPUT, file_name)
-        if not os.path.exists(output_path):
-            return jsonify({"error": f"File not found: {file_name}"}), 404
+        size = None
+        if output_id:
+            metadata = outputs.metadata(output_id)
+            file_name = metadata["filename"]
+            outputs.touch(output_id)
+            url = outputs.url(output_id, file_name)
+            if url is not None:
+                # URL pré-assinada (s3): o cliente baixa direto do bucket
+                return redirect(url)
+            etag = outputs.etag(output_id)
+            output = outputs.local_path(output_id)
+            if output is None:
+                # Sem disco local o arquivo vem do backend em stream, com o
+                # tamanho gravado nos metadados
+                output, size = RangeReader(outputs, output_id), metadata["size"]
+        elif file_name:
+            # Arquivos salvos direto em saida/, antes dos ids
+            file_name = os.path.basename(file_name)
+            output = os.path.join(PATH_OUTPUT, file_name)
+            if not os.path.isfile(output):
+                return jsonify({"error": f"File not found: {file_name}"}), 404
+            etag = file_etag(output)
+        else:
+            return jsonify({"error": "File id is required"}), 400
 
+        # Caminho em vez de bytes: o servidor WSGI envia o arquivo com sendfile
+        # (wsgi.file_wrapper), e conditional trata If-None-Match e Range
         response = send_file(
-            output_path,
+            output,
             as_attachment=True,
             download_name=file_name,
-            mimetype="image/png",
+            mimetype=mimetype_for(file_name),
+            etag=etag,
+            conditional=size is None,
         )
+        if size is not None:
+            # O FileWrapper do werkzeug repassa o seek do Range ao RangeReader,
+            # que pede ao backend só o trecho (o file_wrapper do servidor WSGI
+            # leria e descartaria o começo)
+            response.response = FileWrapper(output)
+            response.content_length = size
+            response.make_conditional(request, accept_ranges=True, complete_length=size)
+        if request.args.get("v") == etag:
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = Config.DOWNLOAD_MAX_AGE
+            response.cache_control.immutable = True
+        else:
+            # Nome reaproveitado entre processamentos: revalida sempre pelo ETag
+            response.cache_control.no_cache = True
         origin = request.headers.get("Origin")
         if origin in Config.CORS_ORIGINS:
             response.headers["Access-Control-Allow-Origin"] = origin
@@ -404,8 +1414,8 @@ def download_image():
             response.headers["Access-Control-Allow-Headers"] = ", ".join(
                 Config.CORS_ALLOW_HEADERS
             )
-            response.headers["Access-Control-Expose-Headers"] = (
-                "Content-Disposition, Content-Length, Content-Type"
+            response.headers["Access-Control-Expose-Headers"] = ", ".join(
+                Config.CORS_EXPOSE_HEADERS
             )
             response.headers["Vary"] = "Origin"
         return response
@@ -415,6 +1425,9 @@ def download_image():
     except ValueError as e:
         logging.exception("Value error")
         return jsonify({"error": str(e)}), 400
+    except HTTPException:
+        # 416 de um Range fora do arquivo
+        raise
     except Exception as e:
         logging.exception("Unexpected error in download_image")
         return jsonify({"error": "An unexpected error occurred"}), 500
@@ -437,8 +1450,16 @@ def health_check():
               "upload": { "href": "/api/upload", "method": "POST" },
               "remove_background": { "href": "/api/remove-background", "method": "POST" },
               "add_background": { "href": "/api/add-background", "method": "POST" },
-              "download": { "href": "/api/download", "method": "GET" }
-            }
+              "add_backgrounds": { "href": "/api/add-backgrounds", "method": "POST" },
+              "process": { "href": "/api/process", "method": "POST" },
+              "batch_remove_background": { "href": "/api/batch/remove-background", "method": "POST" },
+              "download": { "href": "/api/download", "method": "GET" },
+              "jobs": { "href": "/api/jobs/<job_id>", "method": "GET" },
+              "metrics": { "href": "/api/metrics", "method": "GET" }
+            },
+            "sessions": { "hits": 12, "misses": 1, "loaded": ["u2net"], "loads": { "u2net": { "count": 1, "seconds": 1.83 } } },
+            "batching": { "u2net": { "batches": 4, "images": 13, "max_batch": 4, "avg_batch": 3.25 } },
+            "cache": { "memory_hits": 3, "disk_hits": 1, "misses": 6, "evictions": 0, "hit_ratio": 0.4 }
           }
     """
     return (
@@ -452,13 +1473,62 @@ def health_check():
                         "method": "POST",
                     },
                     "add_background": {"href": "/api/add-background", "method": "POST"},
+                    "add_backgrounds": {
+                        "href": "/api/add-backgrounds",
+                        "method": "POST",
+                    },
+                    "process": {"href": "/api/process", "method": "POST"},
+                    "batch_remove_background": {
+                        "href": "/api/batch/remove-background",
+                        "method": "POST",
+                    },
                     "download": {"href": "/api/download", "method": "GET"},
+                    "jobs": {"href": "/api/jobs/<job_id>", "method": "GET"},
+                    "metrics": {"href": "/api/metrics", "method": "GET"},
                 },
+                "models": {
+                    "default": Config.DEFAULT_MODEL,
+                    "allowed": Config.ALLOWED_MODELS,
+                    "light": Config.LIGHT_MODEL,
+                    "routing": Config.MODEL_ROUTING,
+                },
+                "sessions": registry.stats(),
+                "batching": batching_stats(),
+                "cache": result_cache.stats(),
+                "mask_cache": mask_cache.stats(),
+                "retention": sweeper.stats(),
             }
         ),
         200,
     )
 
 
+@app.route("/api/metrics", methods=["GET"])
+@limiter.exempt
+def metrics_endpoint():
+    """
+    Métricas no formato de texto do Prometheus
+    ---
+    tags:
+      - system
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: >
+          Histograma removebg_stage_seconds por etapa (decode, inference, upsample,
+          composite, encode, write, copy_original), requisições em andamento,
+          profundidade da fila de jobs, tempo de carga dos modelos, hits/misses e
+          hit ratio dos caches e RSS do processo. Os valores são do worker que
+          atendeu a requisição.
+    """
+    body = metrics.render(
+        sessions=registry.stats(),
+        caches={"result": result_cache.stats(), "mask": mask_cache.stats()},
+        queue_depth=job_queue.pending(),
+    )
+    return Response(body, mimetype="text/plain; version=0.0.4")
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,154 @@
+"""
+Processamento em lote com resposta em ZIP por streaming.
+
+Os itens (arquivos do formulário ou membros de um ZIP enviado) são
+processados num pool de threads com uma janela limitada de itens em andamento,
+e cada PNG entra no ZIP de saída assim que fica pronto. O ZIP é escrito num
+buffer não-seekable que é esvaziado a cada item, então nem a entrada inteira
+nem a saída inteira ficam em memória: um ZIP enviado como corpo vai para um
+arquivo temporário acima de BATCH_SPOOL_MEMORY_BYTES (spool), e membros acima
+de BATCH_MAX_MEMBER_BYTES descompactados são recusados sem serem lidos. Erros
+de um item vão para o manifest.json no fim do arquivo e não interrompem o lote.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from util.constants import (
+    ALLOWED_EXTENSIONS,
+    BATCH_MAX_MEMBER_BYTES,
+    BATCH_SPOOL_MEMORY_BYTES,
+)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkWriter:
+    """Destino de escrita do zipfile que acumula os bytes até o próximo drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        yield from chunks
+
+
+def spool(stream, max_memory: int = BATCH_SPOOL_MEMORY_BYTES):
+    """Copia `stream` para um arquivo seekable, em memória só até `max_memory` bytes."""
+    file = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        shutil.copyfileobj(stream, file, CHUNK_SIZE)
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo, max_bytes: int) -> bytes:
+    # O zipfile não descompacta além de file_size, então o tamanho declarado
+    # limita a memória usada mesmo num ZIP malicioso (zip bomb)
+    if info.file_size > max_bytes:
+        raise ValueError(f"File too large: {info.file_size} bytes (max {max_bytes})")
+    return archive.read(info)
+
+
+def iter_zip_items(file, max_member_bytes: int = BATCH_MAX_MEMBER_BYTES) -> list:
+    """(nome, loader) de cada membro do ZIP; o conteúdo só é lido pelo worker."""
+    archive = zipfile.ZipFile(file)
+    return [
+        (info.filename, lambda info=info: _read_member(archive, info, max_member_bytes))
+        for info in archive.infolist()
+        if not info.is_dir()
+    ]
+
+
+def output_name(name: str, extension: str = "png") -> str:
+    # Nomes vindos do ZIP enviado não podem escapar do diretório ao extrair
+    parts = [
+        part
+        for part in name.replace("\\", "/").split("/")
+        if part not in ("", ".", "..")
+    ]
+    return f"{os.path.splitext('/'.join(parts))[0]}.{extension}"
+
+
+def _unique_name(name: str, used_names: set) -> str:
+    # foto.jpg e foto.png no mesmo lote geram o mesmo foto.png
+    stem, extension = os.path.splitext(name)
+    candidate, counter = name, 1
+    while candidate in used_names:
+        candidate = f"{stem}_{counter}{extension}"
+        counter += 1
+    used_names.add(candidate)
+    return candidate
+
+
+def _process_item(render, name: str, loader) -> bytes:
+    extension = os.path.splitext(name)[1].lstrip(".").lower()
+    if extension not in ALLOWED_EXTENSIONS:
+        raise ValueError(
+            f"Invalid file extension. Allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))}"
+        )
+    return render(name, loader())
+
+
+def process_batch(render, items: list, executor, window: int):
+    """
+    Gera (nome, resultado, erro) na ordem em que os itens terminam.
+    `render(nome, bytes) -> bytes` roda no executor; no máximo `window` itens
+    ficam em andamento (e com resultado em memória) ao mesmo tempo.
+    """
+    items = iter(items)
+    pending = {}
+    while True:
+        while len(pending) < window:
+            item = next(items, None)
+            if item is None:
+                break
+            name, loader = item
+            pending[executor.submit(_process_item, render, name, loader)] = name
+        if not pending:
+            return
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = pending.pop(future)
+            try:
+                yield name, future.result(), None
+            except Exception as e:
+                yield name, None, str(e)
+
+
+def stream_zip(results, extension: str = "png"):
+    """Monta o ZIP de saída a partir de process_batch, com manifest.json no final."""
+    writer = _ChunkWriter()
+    manifest = []
+    used_names = set()
+    # PNG/WebP/AVIF já são comprimidos: ZIP_STORED evita gastar CPU recomprimindo
+    with zipfile.ZipFile(writer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, data, error in results:
+            if error is None:
+                output = _unique_name(output_name(name, extension), used_names)
+                archive.writestr(output, data)
+                manifest.append({"name": name, "output": output, "status": "ok"})
+            else:
+                manifest.append({"name": name, "status": "error", "error": error})
+            yield from writer.drain()
+
+        failed = sum(1 for item in manifest if item["status"] == "error")
+        summary = {"ok": len(manifest) - failed, "failed": failed, "items": manifest}
+        archive.writestr("manifest.json", json.dumps(summary, indent=2))
+    yield from writer.drain()
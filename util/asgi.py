@@ -0,0 +1,246 @@
+"""
+Servidor assíncrono (ASGI) para a mesma aplicação Flask.
+
+No Gunicorn cada requisição ocupa uma thread do começo ao fim, inclusive
+enquanto um cliente lento envia o upload ou baixa o resultado. Aqui o corpo é
+lido inteiro no event loop, e só então a app WSGI roda num pool limitado de
+threads (ASGI_WORKERS), onde acontecem decode, inferência e encode. A resposta
+volta ao loop bloco a bloco. Conexões lentas ou ociosas custam só uma corrotina
+e o pool define a concorrência real.
+
+As leituras de arquivo (send_file, via wsgi.file_wrapper) e as respostas em
+stream (stream_with_context) rodam fora do loop, um bloco por vez. Corpos acima
+de MAX_CONTENT_LENGTH da app (ou do limite da rota em `max_body_sizes`) são
+recusados com 413 antes de chegar ao Flask.
+"""
+
+import asyncio
+import contextvars
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from util.constants import ASGI_WORKERS
+
+CHUNK_SIZE = 64 * 1024
+# Acima disso o corpo recebido vai para um arquivo temporário
+SPOOL_MAX_BYTES = 1024 * 1024
+
+
+class FileWrapper:
+    """wsgi.file_wrapper: marca a resposta como arquivo para ser lida fora do loop."""
+
+    def __init__(self, file, block_size: int = CHUNK_SIZE):
+        self.file = file
+        self.block_size = block_size
+
+    def __iter__(self):
+        return iter(lambda: self.file.read(self.block_size), b"")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def build_environ(scope: dict, body, body_size: int = 0) -> dict:
+    """
+    Environ WSGI (PEP 3333) a partir do scope HTTP do ASGI. O corpo já foi lido
+    inteiro, então CONTENT_LENGTH é o tamanho real, mesmo em uploads chunked.
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode().decode("latin-1"),
+        "PATH_INFO": scope["path"].encode().decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+        "wsgi.file_wrapper": FileWrapper,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ[name] = value
+        elif name not in ("CONTENT_LENGTH", "TRANSFER_ENCODING"):
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    if body_size:
+        environ["CONTENT_LENGTH"] = str(body_size)
+    return environ
+
+
+class AsgiApp:
+    """
+    Adaptador ASGI para uma app WSGI. `on_startup` são funções síncronas
+    executadas no pool durante o lifespan (ex. pré-carregar os modelos) e
+    `max_body_sizes` mapeia caminhos para limites de corpo próprios.
+    """
+
+    def __init__(
+        self, wsgi_app, workers: int = ASGI_WORKERS, on_startup=(), max_body_sizes=None
+    ):
+        self.wsgi_app = wsgi_app
+        self.workers = workers
+        self.on_startup = list(on_startup)
+        self.max_body_sizes = dict(max_body_sizes or {})
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="asgi")
+
+    def max_body_size(self, path: str):
+        if path in self.max_body_sizes:
+            return self.max_body_sizes[path]
+        config = getattr(self.wsgi_app, "config", {})
+        return config.get("MAX_CONTENT_LENGTH")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            await self._http(scope, receive, send)
+        elif scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                try:
+                    for function in self.on_startup:
+                        await loop.run_in_executor(self.executor, function)
+                except Exception as e:
+                    logger.exception("ASGI startup failed")
+                    await send({"type": "lifespan.startup.failed", "message": str(e)})
+                    return
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.executor.shutdown(wait=True, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def _read_body(self, scope, receive) -> tuple:
+        """(corpo num arquivo temporário, tamanho), ou (None, 0) se exceder o limite."""
+        limit = self.max_body_size(scope["path"])
+        for name, value in scope["headers"]:
+            if name == b"content-length" and limit is not None and value.isdigit():
+                if int(value) > limit:
+                    return None, 0
+        body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                body.close()
+                raise ConnectionResetError("Client disconnected during upload")
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if limit is not None and size > limit:
+                body.close()
+                return None, 0
+            # Escrita em memória até SPOOL_MAX_BYTES; acima disso, em disco
+            body.write(chunk)
+            more_body = message.get("more_body", False)
+        body.seek(0)
+        return body, size
+
+    async def _http(self, scope, receive, send) -> None:
+        try:
+            body, body_size = await self._read_body(scope, receive)
+        except ConnectionResetError:
+            return
+        if body is None:
+            await _send_simple(send, 413, b'{"error": "Request body too large"}')
+            return
+
+        loop = asyncio.get_running_loop()
+        # Contexto próprio da requisição: a app e o stream da resposta rodam em
+        # threads diferentes do pool, mas veem as mesmas variáveis de contexto
+        context = contextvars.copy_context()
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (name.lower().encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers
+            ]
+            return lambda data: None  # write() legado não é suportado
+
+        environ = build_environ(scope, body, body_size)
+        try:
+            iterable = await loop.run_in_executor(
+                self.executor, context.run, self.wsgi_app, environ, start_response
+            )
+        except Exception:
+            body.close()
+            logger.exception("Unhandled error in WSGI app")
+            await _send_simple(send, 500, b'{"error": "An unexpected error occurred"}')
+            return
+
+        try:
+            await self._send_response(iterable, response, context, send)
+        finally:
+            close = getattr(iterable, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, context.run, close)
+            body.close()
+
+    async def _send_response(self, iterable, response, context, send) -> None:
+        loop = asyncio.get_running_loop()
+        if isinstance(iterable, (list, tuple)):
+            # Já materializada pela app (ex. jsonify)
+            chunks = iter(iterable)
+
+            async def next_chunk():
+                return next(chunks, None)
+
+        else:
+            iterator = iter(iterable)
+            # Arquivos são lidos no pool padrão do loop, sem disputar o da inferência
+            executor = None if isinstance(iterable, FileWrapper) else self.executor
+
+            async def next_chunk():
+                return await loop.run_in_executor(
+                    executor, context.run, next, iterator, None
+                )
+
+        # start_response pode ser chamado só no primeiro bloco de um gerador
+        chunk = await next_chunk()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": response["status"],
+                "headers": response["headers"],
+            }
+        )
+        while chunk is not None:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            chunk = await next_chunk()
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+async def _send_simple(send, status: int, body: bytes) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
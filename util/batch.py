@@ -0,0 +1,333 @@
+"""
+Processamento offline de um diretório inteiro de imagens.
+
+Percorre a árvore de entrada, pula as imagens cujo resultado já está em dia e
+distribui o restante num pool de processos, cada um com a sua sessão do
+modelo. Dentro de cada processo threads de I/O leem e decodificam as próximas
+imagens enquanto a atual está na inferência. O progresso fica num arquivo de
+estado no diretório de saída, então uma execução interrompida continua de onde
+parou. O cache de máscaras do servidor não é usado: com --mask-cache as máscaras
+ficam num diretório próprio do lote.
+
+Uso:
+    python -m util.batch imagens/entrada imagens/saida --processes 4
+    python -m util.batch fotos/ resultados/ --color "#FFFFFF" --model u2netp
+    python -m util.batch fotos/ resultados/ --format webp --compression 9
+    python -m util.batch fotos/ resultados/ --mask-cache resultados/.mascaras
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from util.constants import (
+    ALLOWED_EXTENSIONS,
+    BACKGROUND_COMPRESSION,
+    DEFAULT_MODEL,
+    MASK_CACHE_MAX_BYTES,
+    MASK_CACHE_MEMORY_BYTES,
+)
+from util.encoding import FORMATS, extension_for
+from util.metrics import Histogram, stage_seconds, timed
+
+STATE_FILE = ".batch_state.json"
+
+
+def find_images(input_dir: str) -> list:
+    """Caminhos relativos das imagens da árvore, em ordem estável."""
+    images = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for name in sorted(files):
+            if "." in name and name.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS:
+                images.append(os.path.relpath(os.path.join(root, name), input_dir))
+    return images
+
+
+def output_path_for(output_dir: str, relative_path: str, extension: str = "png") -> str:
+    return os.path.join(
+        output_dir, f"{os.path.splitext(relative_path)[0]}.{extension}"
+    )
+
+
+def _signature(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class BatchState:
+    """Estado persistido da execução: itens concluídos e falhas por caminho relativo."""
+
+    def __init__(self, output_dir: str, settings: dict):
+        self.path = os.path.join(output_dir, STATE_FILE)
+        self.settings = settings
+        self.done = {}
+        self.failed = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            # Com outro modelo ou cor os resultados anteriores não servem
+            if state.get("settings") == settings:
+                self.done = state.get("done", {})
+                self.failed = state.get("failed", {})
+
+    def is_up_to_date(self, input_dir: str, output_dir: str, relative_path: str) -> bool:
+        extension = extension_for(self.settings.get("format", "png"))
+        output_path = output_path_for(output_dir, relative_path, extension)
+        if not os.path.exists(output_path):
+            return False
+        signature = _signature(os.path.join(input_dir, relative_path))
+        if relative_path in self.done:
+            return self.done[relative_path] == signature
+        return os.stat(output_path).st_mtime_ns >= signature[0]
+
+    def save(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(
+                {"settings": self.settings, "done": self.done, "failed": self.failed}, f
+            )
+        os.replace(tmp_path, self.path)
+
+
+# Estado de cada processo do pool
+_worker = {}
+
+
+def _init_worker(
+    model_name: str,
+    color: str | None,
+    threads: int,
+    output_format: str = "png",
+    compression: int = BACKGROUND_COMPRESSION,
+    mask_cache_dir: str | None = None,
+) -> None:
+    # Uma thread de inferência por processo: o paralelismo vem do pool
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    _use_mask_cache(mask_cache_dir)
+    from util.sessions import get_session
+
+    get_session(model_name)
+    _worker.update(
+        model_name=model_name,
+        color=color,
+        output_format=output_format,
+        compression=compression,
+    )
+
+
+def _use_mask_cache(directory: str | None) -> None:
+    """Troca o cache de máscaras do servidor pelo do lote (desligado sem diretório)."""
+    from util import ImageHandler as image_handler_module
+    from util.cache import ResultCache
+
+    if directory:
+        cache = ResultCache(directory, MASK_CACHE_MAX_BYTES, MASK_CACHE_MEMORY_BYTES)
+    else:
+        cache = ResultCache("", max_bytes=0)
+    image_handler_module.mask_cache = cache
+
+
+def _load(input_path: str):
+    from util.ImageHandler import ImageHandler
+
+    with open(input_path, "rb") as f:
+        handler = ImageHandler(
+            input_path,
+            model_name=_worker["model_name"],
+            data=f.read(),
+            output_format=_worker["output_format"],
+        )
+    handler.load()
+    return handler
+
+
+def _process_chunk(input_dir: str, output_dir: str, chunk: list, io_threads: int) -> tuple:
+    """
+    Processa um grupo de imagens, decodificando as próximas em threads de I/O.
+    Retorna os resultados e os tempos por etapa do grupo.
+    """
+    stage_seconds.clear()
+    results = []
+    with ThreadPoolExecutor(max_workers=io_threads) as io_pool:
+        loads = [
+            io_pool.submit(_load, os.path.join(input_dir, relative_path))
+            for relative_path in chunk
+        ]
+        for relative_path, load in zip(chunk, loads):
+            try:
+                handler = load.result()
+                if _worker["color"] is None:
+                    handler.remove_background()
+                else:
+                    handler.add_background(_worker["color"])
+                output_path = output_path_for(
+                    output_dir, relative_path, extension_for(_worker["output_format"])
+                )
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                data = handler.encode(_worker["compression"])
+                with timed("write"), open(output_path, "wb") as f:
+                    f.write(data)
+                results.append((relative_path, None))
+            except Exception as e:
+                results.append((relative_path, str(e)))
+    return results, stage_seconds.snapshot()
+
+
+def _progress(total: int):
+    try:
+        from tqdm import tqdm
+
+        return tqdm(total=total, unit="img")
+    except ImportError:
+        return None
+
+
+def run(
+    input_dir: str,
+    output_dir: str,
+    processes: int = 0,
+    model_name: str = DEFAULT_MODEL,
+    color: str | None = None,
+    chunk_size: int = 4,
+    io_threads: int = 2,
+    force: bool = False,
+    output_format: str = "png",
+    compression: int = BACKGROUND_COMPRESSION,
+    mask_cache_dir: str | None = None,
+) -> dict:
+    processes = processes or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {"model": model_name, "color": color}
+    if output_format != "png":
+        settings["format"] = output_format
+    state = BatchState(output_dir, settings)
+
+    images = find_images(input_dir)
+    pending = [
+        path
+        for path in images
+        if force or not state.is_up_to_date(input_dir, output_dir, path)
+    ]
+    summary = {"total": len(images), "skipped": len(images) - len(pending)}
+    print(
+        f"{len(images)} images found, {summary['skipped']} up to date, "
+        f"{len(pending)} to process with {processes} processes"
+    )
+
+    chunks = [pending[i : i + chunk_size] for i in range(0, len(pending), chunk_size)]
+    processed = failed = 0
+    stages = Histogram(stage_seconds.name, stage_seconds.documentation, "stage")
+    progress = _progress(len(pending))
+    start_time = time.perf_counter()
+    # spawn: o onnxruntime não é fork-safe depois de importado no processo pai
+    with ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, color, 1, output_format, compression, mask_cache_dir),
+    ) as executor:
+        futures = [
+            executor.submit(_process_chunk, input_dir, output_dir, chunk, io_threads)
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            results, chunk_stages = future.result()
+            stages.merge(chunk_stages)
+            for relative_path, error in results:
+                if error is None:
+                    processed += 1
+                    state.done[relative_path] = _signature(
+                        os.path.join(input_dir, relative_path)
+                    )
+                    state.failed.pop(relative_path, None)
+                else:
+                    failed += 1
+                    state.failed[relative_path] = error
+                    print(f"Error processing {relative_path}: {error}", file=sys.stderr)
+                if progress is not None:
+                    progress.update(1)
+            state.save()
+    if progress is not None:
+        progress.close()
+
+    elapsed = time.perf_counter() - start_time
+    summary.update(
+        processed=processed,
+        failed=failed,
+        seconds=round(elapsed, 2),
+        images_per_sec=round(processed / elapsed, 2) if elapsed and processed else 0.0,
+        # Tempo médio por etapa, somado entre os processos
+        stages={
+            stage: round(series["sum"] / series["count"] * 1000, 1)
+            for stage, series in sorted(stages.snapshot().items())
+        },
+    )
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--processes", type=int, default=0, help="0 = one per CPU")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--color", default=None, help="Background color (default transparent)")
+    parser.add_argument("--chunk-size", type=int, default=4)
+    parser.add_argument("--io-threads", type=int, default=2)
+    parser.add_argument("--force", action="store_true", help="Reprocess up to date images")
+    parser.add_argument("--format", choices=list(FORMATS), default="png")
+    parser.add_argument(
+        "--compression",
+        type=int,
+        choices=range(10),
+        default=BACKGROUND_COMPRESSION,
+        help="0 = fastest, 9 = smallest",
+    )
+    parser.add_argument(
+        "--mask-cache",
+        default=None,
+        help="Directory to cache masks in (default: no mask cache)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run(
+            args.input_dir,
+            args.output_dir,
+            processes=args.processes,
+            model_name=args.model,
+            color=args.color,
+            chunk_size=args.chunk_size,
+            io_threads=args.io_threads,
+            force=args.force,
+            output_format=args.format,
+            compression=args.compression,
+            mask_cache_dir=args.mask_cache,
+        )
+    except BrokenProcessPool:
+        # O initializer falha quando o modelo não pode ser carregado
+        print(
+            f"Worker process failed, check that model {args.model} can be loaded",
+            file=sys.stderr,
+        )
+        return 1
+    print(
+        f"Processed {summary['processed']} images ({summary['failed']} failed, "
+        f"{summary['skipped']} skipped) in {summary['seconds']}s: "
+        f"{summary['images_per_sec']} images/sec"
+    )
+    if summary["stages"]:
+        print("Average ms per stage: " + ", ".join(
+            f"{stage} {ms}" for stage, ms in summary["stages"].items()
+        ))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
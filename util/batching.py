@@ -0,0 +1,152 @@
+"""
+Micro-batching de inferência.
+
+Requisições concorrentes para o mesmo modelo são agrupadas por até
+INFERENCE_BATCH_WAIT_MS ou INFERENCE_BATCH_SIZE imagens e executadas numa única
+chamada ao onnxruntime com um tensor NCHW. O pré-processamento (resize e
+normalização) e o pós-processamento da máscara rodam na thread de cada
+requisição: o predict da própria sessão do rembg é executado com o
+inner_session trocado por um proxy que enfileira o tensor de entrada, então
+mean/std, tamanho e máscara são sempre os da sessão. Só a chamada ao modelo
+passa pela thread do agrupador.
+
+BatchingSession tem a mesma interface de predict das sessões do rembg, então
+pode ser passada diretamente para rembg.remove(session=...).
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+from PIL import Image
+
+from util.constants import INFERENCE_BATCH_SIZE, INFERENCE_BATCH_WAIT_MS
+from util.sessions import get_session
+
+
+class _BatchedInnerSession:
+    """inner_session de uma chamada: run com uma única entrada vai para o agrupador."""
+
+    def __init__(self, batcher):
+        self._batcher = batcher
+        self._inner = batcher.session.inner_session
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def run(self, output_names, feed, *args, **kwargs):
+        tensor = feed.get(self._batcher._input_name)
+        if len(feed) != 1 or tensor is None or tensor.shape[0] != 1 or output_names:
+            return self._inner.run(output_names, feed, *args, **kwargs)
+        future = Future()
+        self._batcher._queue.put((tensor, future))
+        return future.result()
+
+
+class _SessionView:
+    """A sessão do rembg com outro inner_session, sem alterar a sessão compartilhada."""
+
+    def __init__(self, session, inner_session):
+        self._session = session
+        self.inner_session = inner_session
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+class BatchingSession:
+    def __init__(
+        self,
+        session,
+        max_batch_size: int = INFERENCE_BATCH_SIZE,
+        max_wait_ms: float = INFERENCE_BATCH_WAIT_MS,
+    ):
+        self.session = session
+        self.model_name = session.model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        model_input = session.inner_session.get_inputs()[0]
+        self._input_name = model_input.name
+        # Modelos exportados com batch fixo recebem uma chamada por imagem
+        self._dynamic_batch = not isinstance(model_input.shape[0], int)
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "images": 0, "max_batch": 0}
+        self._thread = threading.Thread(
+            target=self._run, name=f"batching-{self.model_name}", daemon=True
+        )
+        self._thread.start()
+
+    def predict(self, img: Image.Image, *args, **kwargs) -> list:
+        view = _SessionView(self.session, _BatchedInnerSession(self))
+        return type(self.session).predict(view, img, *args, **kwargs)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            tensors = [tensor for tensor, _ in batch]
+            try:
+                if self._dynamic_batch:
+                    outputs = self._infer(np.concatenate(tensors))
+                else:
+                    results = [self._infer(t) for t in tensors]
+                    outputs = [np.concatenate(output) for output in zip(*results)]
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for i, (_, future) in enumerate(batch):
+                future.set_result([output[i : i + 1] for output in outputs])
+
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["images"] += len(batch)
+                self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+
+    def _infer(self, tensor: np.ndarray) -> list:
+        return self.session.inner_session.run(None, {self._input_name: tensor})
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_batch"] = (
+            round(stats["images"] / stats["batches"], 2) if stats["batches"] else 0
+        )
+        return stats
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batching_session(model_name: str) -> BatchingSession:
+    """BatchingSession do processo para o modelo, criada na primeira chamada."""
+    with _batchers_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            batcher = BatchingSession(get_session(model_name))
+            _batchers[model_name] = batcher
+        return batcher
+
+
+def batching_stats() -> dict:
+    with _batchers_lock:
+        return {name: batcher.stats() for name, batcher in _batchers.items()}
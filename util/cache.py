@@ -0,0 +1,226 @@
+"""
+Cache de resultados endereçado por conteúdo.
+
+A chave é o sha256 dos bytes de entrada junto com a operação e seus
+parâmetros (modelo, cor, ...), então reenviar a mesma foto com outro nome ainda
+acerta o cache. Os resultados ficam em disco em diretórios de dois níveis
+(<dir>/ab/<chave>) com limite de tamanho e remoção LRU; um tier opcional em
+memória guarda os itens mais acessados.
+
+O diretório é compartilhado pelos workers do gunicorn: uma chave fora do
+índice deste processo ainda é procurada no disco, e o índice é refeito a partir
+do disco a cada RESULT_CACHE_RESCAN_INTERVAL segundos (no put), então o limite
+de bytes vale para o que todos gravaram, com atraso de até um intervalo.
+
+A mesma estrutura guarda as máscaras alfa (mask_cache), para que trocar a cor
+do fundo não precise de uma nova inferência.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+from util.constants import (
+    MASK_CACHE_DIR,
+    MASK_CACHE_MAX_BYTES,
+    MASK_CACHE_MEMORY_BYTES,
+    RESULT_CACHE_DIR,
+    RESULT_CACHE_MAX_BYTES,
+    RESULT_CACHE_MEMORY_BYTES,
+    RESULT_CACHE_RESCAN_INTERVAL,
+)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """sha256 do conteúdo do arquivo."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@functools.lru_cache(maxsize=4096)
+def _stat_digest(path: str, mtime_ns: int, size: int) -> str:
+    return file_digest(path)
+
+
+def file_etag(path: str) -> str:
+    """sha256 do arquivo, recalculado só quando o mtime ou o tamanho mudam."""
+    stat = os.stat(path)
+    return _stat_digest(path, stat.st_mtime_ns, stat.st_size)
+
+
+def make_key(content_hash: str, operation: str, **params) -> str:
+    payload = json.dumps([content_hash, operation, params], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        directory: str = RESULT_CACHE_DIR,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        memory_max_bytes: int = RESULT_CACHE_MEMORY_BYTES,
+        rescan_interval: float = RESULT_CACHE_RESCAN_INTERVAL,
+    ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_max_bytes = memory_max_bytes
+        self.rescan_interval = rescan_interval
+        self._scanned_at = 0.0
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._scan()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def _scan(self) -> None:
+        """
+        Refaz o índice LRU a partir do que está em disco (mais antigo primeiro),
+        incluindo o que outros processos gravaram.
+        """
+        if not self.enabled or not os.path.isdir(self.directory):
+            return
+        self._scanned_at = time.monotonic()
+        entries = []
+        for shard in os.scandir(self.directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, entry.name, stat.st_size))
+                except FileNotFoundError:
+                    # Removido por outro processo durante a varredura
+                    pass
+        disk = OrderedDict((key, size) for _, key, size in sorted(entries))
+        with self._lock:
+            self._disk = disk
+            self._disk_bytes = sum(disk.values())
+
+    def get(self, key: str) -> bytes | None:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+
+        # Também fora do índice: pode ter sido gravado por outro processo
+        data = None
+        try:
+            with open(self._path(key), "rb") as f:
+                data = f.read()
+            # mtime guarda o último acesso para o LRU sobreviver a restarts
+            os.utime(self._path(key))
+        except FileNotFoundError:
+            pass
+
+        with self._lock:
+            if data is None:
+                self._stats["misses"] += 1
+                if key in self._disk:
+                    self._disk_bytes -= self._disk.pop(key)
+                return None
+            self._stats["disk_hits"] += 1
+            if key in self._disk:
+                self._disk.move_to_end(key)
+            else:
+                self._disk[key] = len(data)
+                self._disk_bytes += len(data)
+            self._remember(key, data)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        if time.monotonic() - self._scanned_at >= self.rescan_interval:
+            self._scan()
+
+        with self._lock:
+            if key in self._disk:
+                self._disk_bytes -= self._disk.pop(key)
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._remember(key, data)
+            evicted = self._evict()
+
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except FileNotFoundError:
+                pass
+
+    def _remember(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, old = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old)
+
+    def _evict(self) -> list:
+        evicted = []
+        while self._disk_bytes > self.max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key))
+            evicted.append(key)
+        if evicted:
+            self._stats["evictions"] += len(evicted)
+            logger.debug(f"Result cache evicted {len(evicted)} items")
+        return evicted
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["disk_items"] = len(self._disk)
+            stats["disk_bytes"] = self._disk_bytes
+            stats["memory_items"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_ratio"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+result_cache = ResultCache()
+
+# Máscaras alfa (PNG 8 bits) por entrada e modelo, reaproveitadas entre cores
+mask_cache = ResultCache(MASK_CACHE_DIR, MASK_CACHE_MAX_BYTES, MASK_CACHE_MEMORY_BYTES)
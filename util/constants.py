@@ -24,8 +24,162 @@ MAX_CONTENT_LENGTH = int(
     os.getenv("MAX_CONTENT_LENGTH", 5 * 1024 * 1024)
 )  # 5MB default
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
+# Uploads whose header declares more pixels than this are refused before the
+# rest of the body is read
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", 100_000_000))
+
+# Model configurations
+DEFAULT_MODEL = os.getenv("REMBG_MODEL", "u2net")
+# Models a request may choose with ?model= (each one is loaded on first use)
+ALLOWED_MODELS = os.getenv(
+    "ALLOWED_MODELS", "u2net,u2netp,silueta,isnet-general-use"
+).split(",")
+# Routing (?model=auto, or every request without a model when MODEL_ROUTING=1):
+# the light model serves small images and requests made while the queue is long
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "0") == "1"
+LIGHT_MODEL = os.getenv("LIGHT_MODEL", "u2netp")
+ROUTING_MAX_PIXELS = int(os.getenv("ROUTING_MAX_PIXELS", 640 * 640))
+ROUTING_QUEUE_DEPTH = int(os.getenv("ROUTING_QUEUE_DEPTH", 8))
+
+# ONNX Runtime session options, applied to every model session.
+# Threads: 0 = OMP_NUM_THREADS when set, otherwise the ONNX Runtime default.
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", 0))
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", 0))
+ORT_EXECUTION_MODE = os.getenv("ORT_EXECUTION_MODE", "sequential")  # or parallel
+# disable, basic, extended or all
+ORT_GRAPH_OPTIMIZATION = os.getenv("ORT_GRAPH_OPTIMIZATION", "all")
+ORT_CPU_MEM_ARENA = os.getenv("ORT_CPU_MEM_ARENA", "1") == "1"
+ORT_MEM_PATTERN = os.getenv("ORT_MEM_PATTERN", "1") == "1"
+# Directory for optimized models, so later startups skip graph optimization
+# (empty = disabled)
+ORT_OPTIMIZED_MODEL_DIR = os.getenv("ORT_OPTIMIZED_MODEL_DIR", "")
+
+# INT8 models generated by `python -m util.quantize`, loaded as "<model>-int8"
+QUANTIZED_MODEL_DIR = os.getenv(
+    "QUANTIZED_MODEL_DIR", os.path.join(BASE_DIR, "imagens", "modelos")
+)
+
+# Inference resolution: longest side used by the model for each quality
+# (None = original size). "preview" also returns the result at that size.
+QUALITY_PRESETS = {"full": None, "balanced": 2048, "fast": 1024, "preview": 512}
+DEFAULT_QUALITY = os.getenv("DEFAULT_QUALITY", "full")
+
+# Inference batching (1 = disabled, each request runs its own inference)
+INFERENCE_BATCH_SIZE = int(os.getenv("INFERENCE_BATCH_SIZE", 1))
+INFERENCE_BATCH_WAIT_MS = float(os.getenv("INFERENCE_BATCH_WAIT_MS", 10))
+
+# Async job queue
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", os.path.join(BASE_DIR, "imagens", "jobs.db"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 32))
+# Seconds without a heartbeat before a running job is considered orphaned
+JOB_LEASE_TIMEOUT = float(os.getenv("JOB_LEASE_TIMEOUT", 60))
+# Seconds finished (done/failed) jobs are kept before being deleted (0 = forever)
+JOB_TTL = float(os.getenv("JOB_TTL", 24 * 60 * 60))
+
+# Batch endpoint
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", 2))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 1000))
+# Request body limit of the batch endpoint (the others use MAX_CONTENT_LENGTH)
+BATCH_MAX_CONTENT_LENGTH = int(
+    os.getenv("BATCH_MAX_CONTENT_LENGTH", 200 * 1024 * 1024)
+)  # 200MB default
+# Largest uncompressed member accepted from an uploaded ZIP
+BATCH_MAX_MEMBER_BYTES = int(os.getenv("BATCH_MAX_MEMBER_BYTES", 50 * 1024 * 1024))
+# A raw ZIP body is kept in memory up to this size, then spooled to disk
+BATCH_SPOOL_MEMORY_BYTES = int(os.getenv("BATCH_SPOOL_MEMORY_BYTES", 8 * 1024 * 1024))
+
+# Content-addressed result cache (0 bytes = disabled)
+RESULT_CACHE_DIR = os.getenv(
+    "RESULT_CACHE_DIR", os.path.join(BASE_DIR, "imagens", "cache")
+)
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+RESULT_CACHE_MEMORY_BYTES = int(
+    os.getenv("RESULT_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)
+)
+# Seconds between rescans of the cache directory, so the size limit also counts
+# what other worker processes wrote
+RESULT_CACHE_RESCAN_INTERVAL = float(os.getenv("RESULT_CACHE_RESCAN_INTERVAL", 60))
+
+# Alpha mask cache, reused by add-background with any color (0 bytes = disabled)
+MASK_CACHE_DIR = os.getenv(
+    "MASK_CACHE_DIR", os.path.join(BASE_DIR, "imagens", "mascaras")
+)
+MASK_CACHE_MAX_BYTES = int(os.getenv("MASK_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+MASK_CACHE_MEMORY_BYTES = int(os.getenv("MASK_CACHE_MEMORY_BYTES", 32 * 1024 * 1024))
+
+# Storage backend for inputs, results and originals stored by id: local
+# (imagens/entrada, saida and originais), memory (one process only; tests and
+# development) or s3 (AWS or any S3-compatible service such as MinIO, via
+# S3_ENDPOINT_URL; credentials from the usual AWS_* variables). With s3 the
+# objects go to S3_BUCKET under S3_PREFIX + entrada/, saida/ and originais/.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "")
+S3_REGION = os.getenv("S3_REGION", "")
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 32))
+# Objects above the threshold are uploaded in parallel parts of
+# S3_MULTIPART_CHUNKSIZE bytes (S3 requires at least 5 MB per part)
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 16 * 1024 * 1024))
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE", 8 * 1024 * 1024))
+# /api/download?id= redirects to a presigned URL valid for this many seconds
+# when the backend offers one (s3); 0 = the app streams the file
+PRESIGNED_URL_EXPIRES = int(os.getenv("PRESIGNED_URL_EXPIRES", 3600))
+
+# Retention of imagens/entrada, saida and originais with the local backend
+# (only files stored by id; flat files saved before ids are never removed). TTL
+# in seconds since the last access and quota in bytes per directory, 0 = no
+# limit; over the quota the least recently accessed files go first. Every
+# RETENTION_INTERVAL seconds the sweeper scans RETENTION_SHARDS_PER_STEP
+# first-level shard directories.
+INPUT_TTL = int(os.getenv("INPUT_TTL", 7 * 24 * 60 * 60))
+INPUT_MAX_BYTES = int(os.getenv("INPUT_MAX_BYTES", 0))
+OUTPUT_TTL = int(os.getenv("OUTPUT_TTL", 7 * 24 * 60 * 60))
+OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", 0))
+ORIGINALS_TTL = int(os.getenv("ORIGINALS_TTL", 30 * 24 * 60 * 60))
+ORIGINALS_MAX_BYTES = int(os.getenv("ORIGINALS_MAX_BYTES", 0))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", 5))  # seconds
+RETENTION_SHARDS_PER_STEP = int(os.getenv("RETENTION_SHARDS_PER_STEP", 4))
+RETENTION_LOCK = os.getenv(
+    "RETENTION_LOCK", os.path.join(BASE_DIR, "imagens", ".retention.lock")
+)
+# Copy of every input kept in imagens/originais: hardlink (same file, no extra
+# space; falls back to a copy across filesystems), copy or skip
+ORIGINALS_MODE = os.getenv("ORIGINALS_MODE", "hardlink")
+
+# Output encoding: format (png, webp, webp-lossy, avif) and compression level
+# from 0 (fastest) to 9 (smallest). The synchronous API answers with the fast
+# level; async jobs and batches use the maximum.
+OUTPUT_FORMAT = os.getenv("OUTPUT_FORMAT", "png")
+OUTPUT_QUALITY = int(os.getenv("OUTPUT_QUALITY", 90))  # webp-lossy and avif
+SYNC_COMPRESSION = int(os.getenv("SYNC_COMPRESSION", 1))
+BACKGROUND_COMPRESSION = int(os.getenv("BACKGROUND_COMPRESSION", 9))
+
+# Background removal and compositing run in strips of this many rows, so the
+# RGBA working copies stay bounded by the strip size instead of the image size
+COMPOSITE_TILE_ROWS = int(os.getenv("COMPOSITE_TILE_ROWS", 256))
+
+# Downloads: max-age for versioned URLs (?v=<sha256>), whose content never changes
+DOWNLOAD_MAX_AGE = int(os.getenv("DOWNLOAD_MAX_AGE", 365 * 24 * 60 * 60))
+
+# Per-request profiling (X-Profile header on /api/remove-background; not a
+# query parameter, so the token stays out of access logs). Off by default; with
+# PROFILING_TOKEN set the header must carry the token. PROFILER is sampling (speedscope JSON) or cprofile
+# (pstats .prof); artifacts are written to PROFILE_DIR.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILER = os.getenv("PROFILER", "sampling")
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))  # seconds
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(BASE_DIR, "logs", "profiles"))
+
+# ASGI mode (uvicorn asgi:app): request bodies and responses are streamed on
+# the event loop and the Flask app (decode, inference, encode) runs on a pool of
+# ASGI_WORKERS threads, which sets the real concurrency limit
+ASGI_WORKERS = int(os.getenv("ASGI_WORKERS", 4))
 
 # Flask configurations
+RATELIMIT_ENABLED = os.getenv("RATELIMIT_ENABLED", "1") == "1"
 DEBUG = os.getenv("FLASK_ENV", "production") == "development"
 TESTING = False
 SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "fallback-development-key")
@@ -51,6 +205,14 @@ CORS_ALLOW_HEADERS = [
     "Access-Control-Allow-Headers",
 ]
 
-CORS_EXPOSE_HEADERS = ["Content-Disposition", "Content-Length", "Content-Type"]
+CORS_EXPOSE_HEADERS = [
+    "Content-Disposition",
+    "Content-Length",
+    "Content-Type",
+    "ETag",
+    "Accept-Ranges",
+    "Content-Range",
+    "X-Profile-Id",
+]
 CORS_SUPPORTS_CREDENTIALS = True
 CORS_MAX_AGE = 86400
@@ -0,0 +1,97 @@
+"""
+Codificação das imagens de saída.
+
+Formatos aceitos em ?format=: png, webp (sem perdas), webp-lossy e avif (com
+perdas, só quando o Pillow tem suporte, nativo ou via pillow-avif-plugin). O
+nível de compressão vai de 0 (mais rápido) a 9 (menor arquivo) e é convertido
+para o parâmetro equivalente de cada codificador. Quem chama escolhe o nível:
+a API síncrona usa um nível rápido, jobs e lotes usam compressão máxima.
+"""
+
+import io
+import os
+
+from PIL import Image
+
+from util.constants import OUTPUT_QUALITY
+
+# formato -> (formato do Pillow, extensão, mimetype)
+FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "webp-lossy": ("WEBP", "webp", "image/webp"),
+    "avif": ("AVIF", "avif", "image/avif"),
+}
+MIMETYPES = {extension: mimetype for _, extension, mimetype in FORMATS.values()}
+# Metadados da entrada repassados para a saída
+METADATA_KEYS = ("icc_profile", "dpi")
+
+
+def avif_available() -> bool:
+    try:
+        import pillow_avif  # noqa: F401 registra o plugin no Pillow
+    except ImportError:
+        pass
+    return "AVIF" in Image.SAVE
+
+
+def validate_format(output_format: str) -> str:
+    if output_format not in FORMATS:
+        raise ValueError(f"Invalid format. Allowed: {', '.join(FORMATS)}")
+    if output_format == "avif" and not avif_available():
+        raise ValueError("AVIF output is not available on this server")
+    return output_format
+
+
+def validate_compression(compression) -> int:
+    try:
+        compression = int(compression)
+    except (TypeError, ValueError):
+        compression = -1
+    if not 0 <= compression <= 9:
+        raise ValueError("compression must be an integer from 0 (fastest) to 9 (smallest)")
+    return compression
+
+
+def extension_for(output_format: str) -> str:
+    return FORMATS[output_format][1]
+
+
+def mimetype_for(file_name: str) -> str:
+    extension = os.path.splitext(file_name)[1].lstrip(".").lower()
+    return MIMETYPES.get(extension, "application/octet-stream")
+
+
+def save_options(output_format: str, compression: int, quality: int = OUTPUT_QUALITY) -> dict:
+    """Parâmetros do Image.save para o formato e o nível de compressão (0-9)."""
+    if output_format == "png":
+        return {"compress_level": compression}
+    if output_format in ("webp", "webp-lossy"):
+        lossless = output_format == "webp"
+        return {
+            "lossless": lossless,
+            # No modo sem perdas quality é o esforço de compressão
+            "quality": round(compression * 100 / 9) if lossless else quality,
+            "method": round(compression * 6 / 9),
+        }
+    # avif: speed vai de 10 (mais rápido) a 0
+    return {"quality": quality, "speed": 10 - compression}
+
+
+def source_metadata(image: Image.Image) -> dict:
+    """Perfil de cor e dpi da imagem, como parâmetros do Image.save."""
+    return {key: image.info[key] for key in METADATA_KEYS if image.info.get(key)}
+
+
+def encode(image: Image.Image, output_format: str, compression: int) -> bytes:
+    pillow_format = FORMATS[output_format][0]
+    if pillow_format == "AVIF":
+        avif_available()
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        pillow_format,
+        **save_options(output_format, compression),
+        **source_metadata(image),
+    )
+    return buffer.getvalue()
@@ -0,0 +1,272 @@
+"""
+Fila de jobs assíncronos persistida em SQLite.
+
+As rotas enfileiram o processamento e respondem na hora com o id do job; um
+pool limitado de threads consome a fila. Como o estado fica no banco, jobs
+enfileirados sobrevivem a um restart e jobs que estavam rodando quando o
+processo caiu voltam para a fila. A posse de cada job é feita numa transação
+BEGIN IMMEDIATE, então vários workers do gunicorn podem dividir o mesmo banco.
+
+A posse é um lease: enquanto o job roda, uma thread do processo renova o
+updated_at a cada JOB_LEASE_TIMEOUT / 3 segundos. Um job "running" sem
+renovação há mais de JOB_LEASE_TIMEOUT é de um processo que morreu e volta para
+a fila (sem depender de sinais ou pids, que não funcionam igual no Windows).
+Cada posse grava um token próprio em owner; renovação e conclusão só valem
+para esse token, então um worker que perdeu o lease não sobrescreve o job
+depois que outro o pegou de novo.
+Jobs concluídos ou com falha são apagados JOB_TTL segundos depois.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+
+from loguru import logger
+
+from util.constants import (
+    JOB_LEASE_TIMEOUT,
+    JOB_QUEUE_SIZE,
+    JOB_TTL,
+    JOB_WORKERS,
+    JOBS_DB_PATH,
+)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobQueue:
+    def __init__(
+        self,
+        db_path: str = JOBS_DB_PATH,
+        workers: int = JOB_WORKERS,
+        max_pending: int = JOB_QUEUE_SIZE,
+        poll_interval: float = 1.0,
+        lease_timeout: float = JOB_LEASE_TIMEOUT,
+        ttl: float = JOB_TTL,
+    ):
+        self.db_path = db_path
+        self.workers = workers
+        self.max_pending = max_pending
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.ttl = ttl
+        self._handlers = {}
+        self._running = {}  # id -> token de posse dos jobs rodando neste processo
+        self._running_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._stop = threading.Event()
+        self._init_db()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _init_db(self) -> None:
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    operation TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    owner TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)"
+            )
+
+    def register(self, operation: str, handler) -> None:
+        """Registra a função que executa jobs da operação: handler(**params) -> result."""
+        self._handlers[operation] = handler
+
+    def start(self) -> None:
+        """Inicia o pool no processo atual (idempotente, refaz as threads após fork)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._running.clear()
+            self._maintain()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+            self._threads.append(
+                threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            )
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        with self._lock:
+            self._pid = None
+
+    def _heartbeat(self) -> None:
+        while not self._stop.wait(self.lease_timeout / 3):
+            try:
+                self._maintain()
+            except sqlite3.Error:
+                logger.exception("Job queue maintenance failed")
+
+    def _maintain(self) -> None:
+        """Renova o lease dos jobs deste processo, devolve os expirados e apaga os antigos."""
+        now = time.time()
+        with self._running_lock:
+            running = list(self._running.values())
+        with closing(self._connect()) as connection:
+            if running:
+                connection.execute(
+                    "UPDATE jobs SET updated_at = ? WHERE status = ?"
+                    f" AND owner IN ({', '.join('?' * len(running))})",
+                    (now, RUNNING, *running),
+                )
+            # Jobs "running" de um processo que morreu no meio do processamento
+            requeued = connection.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, updated_at = ?"
+                " WHERE status = ? AND updated_at < ?",
+                (QUEUED, now, RUNNING, now - self.lease_timeout),
+            ).rowcount
+            if requeued:
+                logger.warning(f"Requeued {requeued} job(s) with an expired lease")
+                self._wakeup.set()
+            if self.ttl:
+                connection.execute(
+                    "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                    (DONE, FAILED, now - self.ttl),
+                )
+
+    def submit(self, operation: str, **params) -> str:
+        if operation not in self._handlers:
+            raise ValueError(f"Unknown operation: {operation}")
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            (pending,) = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchone()
+            if pending >= self.max_pending:
+                connection.execute("ROLLBACK")
+                raise QueueFullError(f"Job queue is full ({pending} pending jobs)")
+            connection.execute(
+                "INSERT INTO jobs (id, operation, params, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, operation, json.dumps(params), QUEUED, now, now),
+            )
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with closing(self._connect()) as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        return job
+
+    def pending(self) -> int:
+        with closing(self._connect()) as connection:
+            (pending,) = connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()
+        return pending
+
+    def _claim(self) -> dict | None:
+        """Pega o job mais antigo da fila; owner do job retornado é o token da posse."""
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1",
+                (QUEUED,),
+            ).fetchone()
+            job = None
+            if row is not None:
+                job = dict(row, status=RUNNING, owner=uuid.uuid4().hex)
+                connection.execute(
+                    "UPDATE jobs SET status = ?, owner = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, job["owner"], time.time(), job["id"]),
+                )
+            connection.execute("COMMIT")
+            return job
+        finally:
+            connection.close()
+
+    def _finish(self, job: dict, status: str, result=None, error=None) -> bool:
+        """Grava o resultado se a posse ainda é deste worker; senão descarta."""
+        with closing(self._connect()) as connection:
+            updated = connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?"
+                " WHERE id = ? AND owner = ? AND status = ?",
+                (status, result, error, time.time(), job["id"], job["owner"], RUNNING),
+            ).rowcount
+        if not updated:
+            logger.warning(f"Job {job['id']} lost its lease; discarding the result")
+        return bool(updated)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+            except sqlite3.Error:
+                logger.exception("Failed to claim job")
+                job = None
+
+            if job is None:
+                # Outros processos também enfileiram no banco, então além do
+                # aviso local a fila é consultada periodicamente.
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            with self._running_lock:
+                self._running[job["id"]] = job["owner"]
+            try:
+                handler = self._handlers[job["operation"]]
+                result = handler(**json.loads(job["params"]))
+                self._finish(job, DONE, result=result)
+            except Exception as e:
+                logger.exception(f"Job {job['id']} failed")
+                self._finish(job, FAILED, error=str(e))
+            finally:
+                with self._running_lock:
+                    self._running.pop(job["id"], None)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,228 @@
+"""
+Métricas do processo no formato de texto do Prometheus.
+
+Os tempos de cada etapa do ImageHandler (decode, inference, upsample,
+composite, encode, write, copy_original) vão para um histograma com o rótulo
+`stage`; como os timers ficam no próprio handler, API, jobs e o processamento
+offline alimentam o mesmo histograma. Os valores são por processo: com vários
+workers do gunicorn cada scrape vê o worker que atendeu a requisição.
+"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows: sem getrusage, o RSS só sai de /proc (ou fica de fora)
+    resource = None
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Histograma cumulativo com um rótulo, seguro entre threads."""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets=STAGE_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.setdefault(
+                value, {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            )
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["count"] += 1
+            series["sum"] += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                value: {"buckets": list(s["buckets"]), "count": s["count"], "sum": s["sum"]}
+                for value, s in self._series.items()
+            }
+
+    def merge(self, snapshot: dict) -> None:
+        """Soma um snapshot() de outro histograma com os mesmos buckets (ex. de outro processo)."""
+        with self._lock:
+            for value, other in snapshot.items():
+                series = self._series.setdefault(
+                    value, {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+                )
+                series["buckets"] = [a + b for a, b in zip(series["buckets"], other["buckets"])]
+                series["count"] += other["count"]
+                series["sum"] += other["sum"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> list:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        for value, series in sorted(self.snapshot().items()):
+            label = f'{self.label}="{_escape(value)}"'
+            for bound, count in zip(self.buckets, series["buckets"]):
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {series["count"]}')
+            lines.append(f"{self.name}_sum{{{label}}} {series['sum']}")
+            lines.append(f"{self.name}_count{{{label}}} {series['count']}")
+        return lines
+
+
+stage_seconds = Histogram(
+    "removebg_stage_seconds", "Time spent in each image processing stage.", "stage"
+)
+
+
+@contextmanager
+def timed(stage: str):
+    """Registra no histograma o tempo do bloco, mesmo se ele falhar."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(stage, time.perf_counter() - start)
+
+
+class Stopwatch:
+    """Soma o tempo de um trecho que roda intercalado com outros (ex. faixas e escrita)."""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    @contextmanager
+    def running(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def iterate(self, iterable):
+        """Repassa os itens contando só o tempo gasto para produzi-los."""
+        iterator = iter(iterable)
+        while True:
+            with self.running():
+                item = next(iterator, StopIteration)
+            if item is StopIteration:
+                return
+            yield item
+
+
+class TimedWriter:
+    """Arquivo que soma em `stopwatch` o tempo gasto nas escritas."""
+
+    def __init__(self, fp, stopwatch: Stopwatch):
+        self._fp = fp
+        self._stopwatch = stopwatch
+
+    def write(self, data) -> int:
+        with self._stopwatch.running():
+            return self._fp.write(data)
+
+
+class Gauge:
+    """Contador de valor atual (ex. requisições em andamento)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self) -> None:
+        with self._lock:
+            self.value += 1
+
+    def dec(self) -> None:
+        with self._lock:
+            self.value -= 1
+
+
+in_flight = Gauge()
+
+
+def resident_memory_bytes() -> int | None:
+    """RSS atual do processo; fora do Linux, o pico (ru_maxrss); None se indisponível."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        if resource is None:
+            return None
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss é em bytes no macOS e em KiB nos demais
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _metric(name: str, metric_type: str, documentation: str, samples) -> list:
+    """`samples` é uma lista de (rótulos, valor); rótulos é um dict, possivelmente vazio."""
+    lines = [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+        lines.append(f"{name}{{{text}}} {value}" if text else f"{name} {value}")
+    return lines
+
+
+def render(sessions: dict, caches: dict, queue_depth: int) -> str:
+    """
+    Texto da exposição: `sessions` é o SessionRegistry.stats(), `caches` mapeia o
+    nome do cache para o ResultCache.stats() e `queue_depth` é o número de jobs
+    na fila.
+    """
+    loads = sessions.get("loads", {})
+    lines = stage_seconds.render()
+    lines += _metric(
+        "removebg_requests_in_flight", "gauge",
+        "Requests currently being handled.", [({}, in_flight.value)],
+    )
+    lines += _metric(
+        "removebg_job_queue_depth", "gauge",
+        "Jobs waiting in the queue.", [({}, queue_depth)],
+    )
+    lines += _metric(
+        "removebg_model_load_seconds", "gauge",
+        "Time of the last load of each model.",
+        [({"model": name}, load["seconds"]) for name, load in sorted(loads.items())],
+    )
+    lines += _metric(
+        "removebg_model_loads_total", "counter",
+        "Model loads since the process started.",
+        [({"model": name}, load["count"]) for name, load in sorted(loads.items())],
+    )
+    lines += _metric(
+        "removebg_cache_hits_total", "counter", "Cache hits (memory and disk).",
+        [
+            ({"cache": name}, stats["memory_hits"] + stats["disk_hits"])
+            for name, stats in caches.items()
+        ],
+    )
+    lines += _metric(
+        "removebg_cache_misses_total", "counter", "Cache misses.",
+        [({"cache": name}, stats["misses"]) for name, stats in caches.items()],
+    )
+    lines += _metric(
+        "removebg_cache_hit_ratio", "gauge", "Cache hits over lookups.",
+        [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()],
+    )
+    rss = resident_memory_bytes()
+    lines += _metric(
+        "process_resident_memory_bytes", "gauge",
+        "Resident memory size in bytes.", [({}, rss)] if rss is not None else [],
+    )
+    return "\n".join(lines) + "\n"
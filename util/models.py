@@ -0,0 +1,56 @@
+"""
+Escolha do modelo usado em cada requisição.
+
+O cliente pode pedir um modelo da lista permitida (ALLOWED_MODELS) ou "auto".
+No modo automático o modelo leve (LIGHT_MODEL) atende imagens pequenas, em que
+a diferença de qualidade quase não aparece, e qualquer imagem enquanto a fila
+de jobs estiver longa; o resto fica com o modelo padrão. As sessões de cada
+modelo são carregadas sob demanda pelo registry de util.sessions.
+"""
+
+from util.constants import (
+    ALLOWED_MODELS,
+    DEFAULT_MODEL,
+    LIGHT_MODEL,
+    MODEL_ROUTING,
+    ROUTING_MAX_PIXELS,
+    ROUTING_QUEUE_DEPTH,
+)
+
+AUTO = "auto"
+
+
+def route_model(
+    size: tuple,
+    queue_depth=lambda: 0,
+    default_model: str = DEFAULT_MODEL,
+    light_model: str = LIGHT_MODEL,
+    max_pixels: int = ROUTING_MAX_PIXELS,
+    max_queue_depth: int = ROUTING_QUEUE_DEPTH,
+) -> str:
+    """
+    Modelo leve para imagens pequenas ou fila longa, senão o modelo padrão.
+    `queue_depth` é chamado só quando a imagem não é pequena.
+    """
+    if size[0] * size[1] <= max_pixels or queue_depth() >= max_queue_depth:
+        return light_model
+    return default_model
+
+
+def resolve_model(
+    requested: str | None,
+    size: tuple,
+    queue_depth=lambda: 0,
+    allowed_models: list = ALLOWED_MODELS,
+    routing: bool = MODEL_ROUTING,
+) -> str:
+    """Nome do modelo para a requisição; ValueError se não estiver na lista permitida."""
+    if requested == AUTO or (not requested and routing):
+        return route_model(size, queue_depth)
+    if not requested:
+        return DEFAULT_MODEL
+    if requested not in allowed_models:
+        raise ValueError(
+            f"Invalid model. Allowed: {', '.join(allowed_models + [AUTO])}"
+        )
+    return requested
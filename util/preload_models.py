@@ -2,26 +2,31 @@
 Preload models for rembg to improve startup time
 """
 
-import os
 import sys
 import time
-from pathlib import Path
 
+from util.constants import DEFAULT_MODEL, LIGHT_MODEL, MODEL_ROUTING
 
-def preload_models():
+
+def startup_models() -> tuple:
+    """Models loaded before the first request; the others load on demand."""
+    return (DEFAULT_MODEL, LIGHT_MODEL) if MODEL_ROUTING else (DEFAULT_MODEL,)
+
+
+def preload_models(model_names: tuple = (DEFAULT_MODEL,)):
     """
-    Preload rembg models to avoid timeout during first request
-    Uses a timeout to avoid hanging the startup process
+    Preload rembg models into the process-wide session registry so the first
+    request does not pay the model load time. Must run inside the process that
+    serves requests (e.g. the gunicorn worker), otherwise the session is lost.
     """
     start_time = time.time()
     print("Preloading rembg models...")
 
     try:
-        # Import rembg and preload the model
-        from rembg import new_session
+        from util.sessions import registry
 
-        # Create a session which will load the model - u2net is mais leve que u2netp
-        _ = new_session("u2net")
+        for model_name in model_names:
+            registry.get(model_name)
 
         elapsed = time.time() - start_time
         print(f"Models preloaded successfully in {elapsed:.2f} seconds")
@@ -31,6 +36,35 @@ def preload_models():
         return False
 
 
+def download_models(model_names: tuple = (DEFAULT_MODEL,)):
+    """
+    Download the model files (if they are not in U2NET_HOME yet) without
+    creating onnxruntime sessions. Run in a separate process by the gunicorn
+    master (GUNICORN_PRELOAD=1): importing onnxruntime in the master is not
+    fork-safe, so sessions are only created by the workers.
+    """
+    try:
+        from rembg.sessions import sessions
+
+        from util.sessions import base_model
+
+        for model_name in model_names:
+            if model_name != base_model(model_name):
+                # INT8 variant: generated locally by util.quantize
+                continue
+            session_class = sessions.get(model_name)
+            if session_class is None:
+                raise ValueError(f"Unknown model: {model_name}")
+            session_class.download_models()
+        return True
+    except Exception as e:
+        print(f"Error downloading models: {e}")
+        return False
+
+
 if __name__ == "__main__":
-    success = preload_models()
+    if "--download-only" in sys.argv[1:]:
+        success = download_models(startup_models())
+    else:
+        success = preload_models()
     sys.exit(0 if success else 1)
@@ -0,0 +1,144 @@
+"""
+Profiling sob demanda de uma chamada (ex. uma requisição lenta).
+
+sampling: uma thread amostra a pilha da thread da chamada a cada
+PROFILE_SAMPLE_INTERVAL segundos e grava <id>.speedscope.json, que abre direto
+no speedscope (https://www.speedscope.app) como flamegraph. O tempo dentro do
+onnxruntime ou do Pillow aparece na função Python que chamou o código nativo.
+cprofile: grava <id>.prof (pstats), para snakeviz, flameprof ou gprof2dot.
+
+Só a thread que chama é observada; com INFERENCE_BATCH_SIZE > 1 a inferência
+roda na thread do BatchingSession e aparece como espera.
+"""
+
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+from util.constants import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILER
+
+PROFILERS = ("sampling", "cprofile")
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+
+class SamplingProfiler:
+    """Amostra a pilha da thread que criou o profiler enquanto estiver ativo."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.frames = []  # (função, arquivo, linha) de cada frame visto
+        self.samples = []  # índices em frames, da raiz para a folha
+        self.weights = []  # segundos representados por cada amostra
+        self._frame_index = {}
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            now = time.perf_counter()
+            if frame is not None:
+                self._record(frame, now - last)
+            last = now
+
+    def _record(self, frame, weight: float) -> None:
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self._frame_index.get(key)
+            if index is None:
+                index = self._frame_index[key] = len(self.frames)
+                self.frames.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        stack.reverse()
+        self.samples.append(stack)
+        self.weights.append(weight)
+
+    def speedscope(self, name: str) -> dict:
+        """Perfil no formato de arquivo do speedscope (tipo sampled)."""
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "shared": {
+                "frames": [
+                    {"name": function, "file": file, "line": line}
+                    for function, file, line in self.frames
+                ]
+            },
+            "profiles": [
+                {
+                    "type": "sampled",
+                    "name": name,
+                    "unit": "seconds",
+                    "startValue": 0,
+                    "endValue": sum(self.weights),
+                    "samples": self.samples,
+                    "weights": self.weights,
+                }
+            ],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "remove-bg",
+        }
+
+
+def new_profile_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def profile_path(profile_id: str, profiler: str = PROFILER, directory: str = PROFILE_DIR) -> str:
+    extension = "speedscope.json" if profiler == "sampling" else "prof"
+    return os.path.join(directory, f"{profile_id}.{extension}")
+
+
+def profile_call(
+    func,
+    *args,
+    name: str = "",
+    profiler: str = PROFILER,
+    directory: str = PROFILE_DIR,
+    interval: float = PROFILE_SAMPLE_INTERVAL,
+    **kwargs,
+) -> tuple:
+    """
+    Executa func(*args, **kwargs) sob o profiler e grava o artefato em `directory`
+    (`interval`: segundos entre amostras do sampling).
+    Retorna (resultado, id do perfil); o perfil é gravado mesmo se func falhar.
+    """
+    if profiler not in PROFILERS:
+        raise ValueError(f"Invalid profiler: {profiler}. Allowed: {', '.join(PROFILERS)}")
+    profile_id = new_profile_id()
+    path = profile_path(profile_id, profiler, directory)
+    os.makedirs(directory, exist_ok=True)
+
+    if profiler == "sampling":
+        sampler = SamplingProfiler(interval)
+        try:
+            with sampler:
+                result = func(*args, **kwargs)
+        finally:
+            with open(path, "w") as f:
+                json.dump(sampler.speedscope(name or profile_id), f)
+    else:
+        profile = cProfile.Profile()
+        try:
+            result = profile.runcall(func, *args, **kwargs)
+        finally:
+            profile.dump_stats(path)
+    return result, profile_id
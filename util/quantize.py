@@ -0,0 +1,151 @@
+"""
+Gera a versão INT8 de um modelo do rembg.
+
+dynamic: pesos em INT8 e ativações quantizadas durante a inferência; não
+precisa de calibração.
+static: pesos e ativações em INT8 (formato QDQ), com as escalas das ativações
+calibradas nas imagens de --calibration, pré-processadas como na inferência.
+
+O arquivo gerado fica em QUANTIZED_MODEL_DIR/<modelo>-int8.onnx e é carregado
+pelo mesmo caminho de sessão do ImageHandler com REMBG_MODEL=u2net-int8 (ou
+?model=u2net-int8, se estiver em ALLOWED_MODELS). Requer o pacote onnx.
+
+Uso:
+    python -m util.quantize --model u2net --mode dynamic
+    python -m util.quantize --model u2net --mode static --calibration imagens/originais
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+from util.batch import find_images
+from util.constants import DEFAULT_MODEL, PATH_ORIGINALS, QUANTIZED_MODEL_DIR
+from util.sessions import QUANTIZED_SUFFIX, quantized_model_path
+
+# (mean, std, tamanho de entrada) da calibração; modelos fora da tabela são recusados
+NORMALIZATION = {
+    "u2net": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2netp": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "u2net_human_seg": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "silueta": ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320)),
+    "isnet-general-use": ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+def normalize(image: Image.Image, mean: tuple, std: tuple, size: tuple) -> np.ndarray:
+    """Tensor NCHW igual ao BaseSession.normalize do rembg."""
+    pixels = np.array(image.convert("RGB").resize(size, Image.Resampling.LANCZOS))
+    pixels = pixels / np.max(pixels)
+    tensor = (pixels - np.array(mean)) / np.array(std)
+    return np.expand_dims(tensor.transpose((2, 0, 1)), 0).astype(np.float32)
+
+
+def calibration_inputs(paths: list, model_name: str, input_name: str):
+    """Gera as entradas do modelo para cada imagem de calibração."""
+    mean, std, size = NORMALIZATION[model_name]
+    for path in paths:
+        with Image.open(path) as image:
+            yield {input_name: normalize(image, mean, std, size)}
+
+
+def _source_model(model_name: str) -> str:
+    from rembg.sessions import sessions
+
+    session_class = sessions.get(model_name)
+    if session_class is None or model_name not in NORMALIZATION:
+        raise ValueError(f"Unsupported model: {model_name}")
+    return str(session_class.download_models())
+
+
+def quantize(
+    model_name: str = DEFAULT_MODEL,
+    mode: str = "dynamic",
+    calibration_dir: str = PATH_ORIGINALS,
+    limit: int = 64,
+    output_dir: str = QUANTIZED_MODEL_DIR,
+) -> str:
+    """Quantiza o modelo e retorna o caminho do arquivo gerado."""
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    source = _source_model(model_name)
+    output_path = quantized_model_path(f"{model_name}{QUANTIZED_SUFFIX}", output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Inferência de shapes e fusões antes de quantizar, como recomenda o onnxruntime
+        prepared = os.path.join(tmp_dir, "prepared.onnx")
+        quant_pre_process(source, prepared)
+        tmp_output = os.path.join(tmp_dir, "quantized.onnx")
+
+        if mode == "dynamic":
+            # ConvInteger no CPU só aceita pesos uint8
+            quantize_dynamic(prepared, tmp_output, weight_type=QuantType.QUInt8)
+        elif mode == "static":
+            paths = [
+                os.path.join(calibration_dir, path)
+                for path in find_images(calibration_dir)
+            ][:limit]
+            if not paths:
+                raise ValueError(f"No calibration images found in {calibration_dir}")
+            input_name = onnx.load(prepared).graph.input[0].name
+
+            class Reader(CalibrationDataReader):
+                def __init__(self):
+                    self._inputs = calibration_inputs(paths, model_name, input_name)
+
+                def get_next(self):
+                    return next(self._inputs, None)
+
+            quantize_static(
+                prepared,
+                tmp_output,
+                Reader(),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+        else:
+            raise ValueError(f"Invalid mode: {mode}. Allowed: dynamic, static")
+        os.replace(tmp_output, output_path)
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--mode", choices=["dynamic", "static"], default="dynamic")
+    parser.add_argument("--calibration", default=PATH_ORIGINALS)
+    parser.add_argument("--limit", type=int, default=64, help="Max calibration images")
+    parser.add_argument("--output-dir", default=QUANTIZED_MODEL_DIR)
+    args = parser.parse_args(argv)
+
+    try:
+        output_path = quantize(
+            args.model, args.mode, args.calibration, args.limit, args.output_dir
+        )
+    except ImportError as e:
+        print(f"Quantization requires the onnx package: {e}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    size_mb = os.path.getsize(output_path) / 1024 / 1024
+    print(f"Quantized model saved to {output_path} ({size_mb:.1f} MB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Retenção dos arquivos guardados por id (util.storage) em entrada/, saida/ e
+originais/, no backend local.
+
+Cada diretório tem um TTL, contado do último acesso, e uma cota em bytes. O
+último acesso é o mtime do <id>.json (FileStore.touch), então vale entre
+processos e sobrevive a restarts. Em vez de listar a árvore inteira de uma vez,
+uma thread (Sweeper) varre poucos diretórios do primeiro nível (ab/) a cada
+RETENTION_INTERVAL segundos: remove o que passou do TTL e atualiza um índice
+com o tamanho e o último acesso de cada id. Depois de uma volta completa o
+índice cobre o diretório todo e, acima da cota, os ids acessados há mais tempo
+saem primeiro (LRU). Arquivos novos entram na conta quando o diretório deles é
+varrido, então a cota pode ser excedida por até uma volta.
+
+Com ORIGINALS_MODE=hardlink o mesmo arquivo está em entrada/ e originais/: os
+Retention de um Sweeper compartilham um mapa (st_dev, st_ino) -> dono, então os
+dados contam só na cota do primeiro diretório que os indexa, e a remoção de um
+link que não é o último não entra em freed_bytes.
+
+Só os ids são removidos: arquivos soltos na raiz, de antes dos ids, ficam. Com
+vários processos (workers do gunicorn) só o que tem o lock de RETENTION_LOCK
+varre; os outros tentam de novo no próximo intervalo. Sem flock (Windows) não
+há como garantir isso e a varredura fica desligada.
+"""
+
+import os
+import re
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
+from loguru import logger
+
+from util.constants import (
+    INPUT_MAX_BYTES,
+    INPUT_TTL,
+    ORIGINALS_MAX_BYTES,
+    ORIGINALS_TTL,
+    OUTPUT_MAX_BYTES,
+    OUTPUT_TTL,
+    RETENTION_INTERVAL,
+    RETENTION_LOCK,
+    RETENTION_SHARDS_PER_STEP,
+)
+from util.storage import ID_PATTERN, FileStore, originals, outputs, uploads
+
+SHARD_PATTERN = re.compile(r"[0-9a-f]{2}")
+# Arquivo sem .json (gravação interrompida) ou temporário esquecido, removido
+# depois desse tempo
+ORPHAN_AGE = 60 * 60
+
+
+def _scandir(path: str) -> list:
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except FileNotFoundError:
+        return []
+
+
+class Retention:
+    """TTL e cota de um FileStore, aplicados aos poucos por step()."""
+
+    def __init__(
+        self,
+        store: FileStore,
+        ttl: float = 0,
+        max_bytes: int = 0,
+        links: dict | None = None,
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        # (st_dev, st_ino) de arquivos com mais de um link -> Retention que os conta
+        self._links = {} if links is None else links
+        # shard do primeiro nível -> {id: (último acesso, bytes, inode ou None)}
+        self._index = {}
+        self._bytes = 0
+        self._files = 0
+        self._cursor = 0
+        self._complete = False
+        self._stats = {"expired": 0, "evicted": 0, "orphans": 0, "freed_bytes": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 or self.max_bytes > 0
+
+    def _shards(self) -> list:
+        return sorted(
+            entry.name
+            for entry in _scandir(self.store.directory)
+            if entry.is_dir() and SHARD_PATTERN.fullmatch(entry.name)
+        )
+
+    def step(self, shards: int = RETENTION_SHARDS_PER_STEP, now: float | None = None) -> None:
+        """Varre os próximos `shards` diretórios do primeiro nível e aplica TTL e cota."""
+        now = time.time() if now is None else now
+        names = self._shards()
+        for name in names[self._cursor : self._cursor + shards]:
+            self._scan(name, now)
+        self._cursor += shards
+        if self._cursor >= len(names):
+            # Fim da volta: o índice cobre o diretório todo
+            self._cursor = 0
+            self._complete = True
+            for name in set(self._index) - set(names):
+                self._replace(name, {})
+            self._remove_stale_temp_files(now)
+        if self.max_bytes and self._complete:
+            self._enforce_quota()
+
+    def _scan(self, shard: str, now: float) -> None:
+        # id -> [mtime do .json, bytes, caminho do arquivo, mtime do arquivo, inode]
+        found = {}
+        for directory in _scandir(os.path.join(self.store.directory, shard)):
+            if not directory.is_dir():
+                continue
+            for entry in _scandir(directory.path):
+                file_id, _, extension = entry.name.partition(".")
+                if not ID_PATTERN.fullmatch(file_id):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                item = found.setdefault(file_id, [None, 0, None, 0.0, None])
+                if extension == "json":
+                    item[0] = stat.st_mtime
+                    item[1] += stat.st_size
+                    continue
+                item[2], item[3] = entry.path, stat.st_mtime
+                if stat.st_nlink > 1:
+                    inode = (stat.st_dev, stat.st_ino)
+                    item[4] = inode
+                    if self._links.setdefault(inode, self) is not self:
+                        continue  # já conta na cota de outro diretório
+                item[1] += stat.st_size
+
+        entries = {}
+        for file_id, (access, size, data_path, modified, inode) in found.items():
+            if access is None:
+                if data_path and now - modified > ORPHAN_AGE:
+                    self._delete_orphan(data_path, size)
+            elif self.ttl and now - access > self.ttl:
+                self._stats["expired"] += 1
+                self._remove(file_id)
+            else:
+                entries[file_id] = (access, size, inode)
+                continue
+            self._release(inode)
+        self._replace(shard, entries)
+
+    def _replace(self, shard: str, entries: dict) -> None:
+        old = self._index.pop(shard, {})
+        for file_id, (_, _, inode) in old.items():
+            if file_id not in entries:
+                self._release(inode)
+        self._bytes -= sum(size for _, size, _ in old.values())
+        self._files -= len(old)
+        if entries:
+            self._index[shard] = entries
+        self._bytes += sum(size for _, size, _ in entries.values())
+        self._files += len(entries)
+
+    def _forget(self, shard: str, file_id: str) -> None:
+        _, size, inode = self._index[shard].pop(file_id)
+        self._release(inode)
+        self._bytes -= size
+        self._files -= 1
+
+    def _release(self, inode: tuple | None) -> None:
+        """Deixa os dados de `inode` para a cota de outro diretório que tenha um link."""
+        if inode is not None and self._links.get(inode) is self:
+            del self._links[inode]
+
+    def _remove(self, file_id: str) -> None:
+        """Remove o id; os dados só contam como liberados se este era o último link."""
+        shared = 0
+        try:
+            stat = os.stat(self.store.path(file_id))
+            if stat.st_nlink > 1:
+                shared = stat.st_size
+        except FileNotFoundError:
+            pass
+        self._stats["freed_bytes"] += self.store.remove(file_id) - shared
+
+    def _enforce_quota(self) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        candidates = sorted(
+            (access, shard, file_id)
+            for shard, entries in self._index.items()
+            for file_id, (access, _, _) in entries.items()
+        )
+        for access, shard, file_id in candidates:
+            if self._bytes <= self.max_bytes:
+                break
+            current = self.store.last_access(file_id)
+            if current is not None and current > access:
+                # Acessado (por outro processo) depois da varredura: fica
+                _, size, inode = self._index[shard][file_id]
+                self._index[shard][file_id] = (current, size, inode)
+                continue
+            self._forget(shard, file_id)
+            self._stats["evicted"] += 1
+            self._remove(file_id)
+
+    def _delete_orphan(self, path: str, size: int) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        self._stats["orphans"] += 1
+        self._stats["freed_bytes"] += size
+
+    def _remove_stale_temp_files(self, now: float) -> None:
+        for entry in _scandir(self.store.directory):
+            if entry.name.startswith(".tmp-") and entry.is_file():
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > ORPHAN_AGE:
+                    self._delete_orphan(entry.path, stat.st_size)
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "max_bytes": self.max_bytes,
+            "files": self._files,
+            "bytes": self._bytes,
+            "complete": self._complete,
+            **self._stats,
+        }
+
+
+class Sweeper:
+    """Thread que chama step() de cada Retention a cada `interval` segundos."""
+
+    def __init__(
+        self,
+        retentions: dict,
+        interval: float = RETENTION_INTERVAL,
+        shards_per_step: int = RETENTION_SHARDS_PER_STEP,
+        lock_path: str = RETENTION_LOCK,
+    ):
+        self.retentions = retentions
+        self.interval = interval
+        self.shards_per_step = shards_per_step
+        self.lock_path = lock_path
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._lock_file = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(retention.enabled for retention in self.retentions.values())
+
+    def start(self) -> None:
+        """Inicia a thread no processo atual (idempotente, refaz a thread após fork)."""
+        if not self.enabled:
+            return
+        if fcntl is None:
+            logger.warning("File locks are not available: retention sweeper disabled")
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._lock_file = None
+            self._thread = threading.Thread(target=self._run, name="retention", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            self._pid = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.step()
+            except Exception:
+                logger.exception("Retention sweep failed")
+
+    def step(self) -> bool:
+        """Um passo em cada diretório, se este processo tem o lock; retorna se varreu."""
+        if not self._acquire():
+            return False
+        for retention in self.retentions.values():
+            if retention.enabled:
+                retention.step(self.shards_per_step)
+        return True
+
+    def _acquire(self) -> bool:
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return False
+        os.makedirs(os.path.dirname(self.lock_path), exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            # Outro processo já varre
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def stats(self) -> dict:
+        return {name: retention.stats() for name, retention in self.retentions.items()}
+
+
+# Só os stores locais (STORAGE_BACKEND=local); no S3 valem as regras de lifecycle.
+# O mapa de hardlinks é comum aos três diretórios.
+_links = {}
+sweeper = Sweeper(
+    {
+        name: Retention(store, ttl, max_bytes, _links)
+        for name, store, ttl, max_bytes in (
+            ("input", uploads, INPUT_TTL, INPUT_MAX_BYTES),
+            ("output", outputs, OUTPUT_TTL, OUTPUT_MAX_BYTES),
+            ("originals", originals, ORIGINALS_TTL, ORIGINALS_MAX_BYTES),
+        )
+        if isinstance(store, FileStore)
+    }
+)
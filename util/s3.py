@@ -0,0 +1,218 @@
+"""
+Backend de armazenamento em S3 (AWS ou compatível, ex. MinIO com S3_ENDPOINT_URL).
+
+Cada id é um objeto <prefixo>ab/cd/<id>, com os metadados (nome original,
+extensão, sha256, ...) nos metadados do próprio objeto: um PUT grava tudo de
+uma vez e um HEAD responde exists/metadata. Um único cliente boto3, seguro
+entre threads, é compartilhado por todos os stores, com até
+S3_MAX_POOL_CONNECTIONS conexões reaproveitadas. Uploads acima de
+S3_MULTIPART_THRESHOLD vão em partes de S3_MULTIPART_CHUNKSIZE enviadas em
+paralelo pelo transfer manager, cópias entre stores no mesmo serviço são feitas
+no servidor (CopyObject) e leituras são em stream, a partir de um offset com
+um GET com Range. Os downloads podem ser redirecionados para uma URL
+pré-assinada (url), sem passar pelo worker.
+
+Objetos no S3 são imutáveis, então não há registro de acesso (touch) nem a
+retenção de util.retention: a expiração fica com as regras de lifecycle do
+bucket.
+
+Requer boto3 (requirements-s3.txt), importado só quando o backend é usado.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import mimetypes
+import os
+from urllib.parse import quote
+
+from util.constants import (
+    PRESIGNED_URL_EXPIRES,
+    S3_BUCKET,
+    S3_ENDPOINT_URL,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_MULTIPART_CHUNKSIZE,
+    S3_MULTIPART_THRESHOLD,
+    S3_PREFIX,
+    S3_REGION,
+)
+from util.encoding import MIMETYPES
+from util.storage import Store, _remove, user_metadata, validate_id
+
+# Chave dos metadados do store nos metadados do objeto (x-amz-meta-store)
+METADATA_KEY = "store"
+NOT_FOUND_CODES = {"404", "NoSuchKey", "NotFound"}
+
+
+@functools.lru_cache(maxsize=None)
+def s3_client():
+    """Cliente compartilhado, com o pool de conexões de S3_MAX_POOL_CONNECTIONS."""
+    try:
+        import boto3
+        from botocore.config import Config
+    except ImportError as e:
+        raise ImportError(
+            "STORAGE_BACKEND=s3 requires boto3: pip install -r requirements-s3.txt"
+        ) from e
+
+    return boto3.client(
+        "s3",
+        endpoint_url=S3_ENDPOINT_URL or None,
+        region_name=S3_REGION or None,
+        config=Config(
+            max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+            retries={"mode": "standard"},
+            # Serviços compatíveis (MinIO) costumam não ter DNS por bucket
+            s3={"addressing_style": "path"} if S3_ENDPOINT_URL else None,
+        ),
+    )
+
+
+class S3Store(Store):
+    def __init__(
+        self,
+        bucket: str = S3_BUCKET,
+        prefix: str = "",
+        client=None,
+        temp_dir: str | None = None,
+        multipart_threshold: int = S3_MULTIPART_THRESHOLD,
+        multipart_chunksize: int = S3_MULTIPART_CHUNKSIZE,
+        presigned_expires: int = PRESIGNED_URL_EXPIRES,
+    ):
+        if not bucket:
+            raise ValueError("S3_BUCKET is required for the s3 storage backend")
+        super().__init__(temp_dir)
+        self.bucket = bucket
+        self.prefix = f"{S3_PREFIX}{prefix}"
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.presigned_expires = presigned_expires
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = s3_client()
+        return self._client
+
+    def _key(self, file_id: str) -> str:
+        validate_id(file_id)
+        return f"{self.prefix}{file_id[:2]}/{file_id[2:4]}/{file_id}"
+
+    def _transfer_config(self):
+        from boto3.s3.transfer import TransferConfig
+
+        return TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_chunksize,
+        )
+
+    def _call(self, operation: str, file_id: str, **params) -> dict:
+        """Chamada ao objeto do id; FileNotFoundError se ele não existe."""
+        try:
+            return getattr(self.client, operation)(
+                Bucket=self.bucket, Key=self._key(file_id), **params
+            )
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in NOT_FOUND_CODES:
+                raise FileNotFoundError(f"File not found: {file_id}") from None
+            raise
+
+    def _extra_args(self, metadata: dict) -> dict:
+        # ensure_ascii: metadados de objeto só aceitam ASCII
+        return {
+            "Metadata": {METADATA_KEY: json.dumps(metadata)},
+            "ContentType": _content_type(metadata["extension"]),
+        }
+
+    def metadata(self, file_id: str) -> dict:
+        head = self._call("head_object", file_id)
+        return json.loads(head["Metadata"][METADATA_KEY])
+
+    def open(self, file_id: str, start: int = 0):
+        # StreamingBody: lido do socket aos poucos, sem baixar o objeto antes
+        params = {"Range": f"bytes={start}-"} if start else {}
+        return self._call("get_object", file_id, **params)["Body"]
+
+    def remove(self, file_id: str) -> int:
+        try:
+            size = self._call("head_object", file_id)["ContentLength"]
+        except FileNotFoundError:
+            return 0
+        self._call("delete_object", file_id)
+        return size
+
+    def put_file(self, file_id: str, temp_path: str, extension: str, **metadata) -> bool:
+        try:
+            if self.exists(file_id):
+                return False
+            metadata = self._metadata(file_id, extension, os.path.getsize(temp_path), metadata)
+            # Em partes paralelas acima de multipart_threshold
+            self.client.upload_file(
+                temp_path,
+                self.bucket,
+                self._key(file_id),
+                ExtraArgs=self._extra_args(metadata),
+                Config=self._transfer_config(),
+            )
+            return True
+        finally:
+            _remove(temp_path)
+
+    def put(self, file_id: str, data: bytes, extension: str, **metadata) -> bool:
+        # Os bytes já estão em memória: vão direto, sem o arquivo temporário
+        if self.exists(file_id):
+            return False
+        metadata.setdefault("sha256", hashlib.sha256(data).hexdigest())
+        metadata = self._metadata(file_id, extension, len(data), metadata)
+        self.client.upload_fileobj(
+            io.BytesIO(data),
+            self.bucket,
+            self._key(file_id),
+            ExtraArgs=self._extra_args(metadata),
+            Config=self._transfer_config(),
+        )
+        return True
+
+    def copy_from(self, store: Store, file_id: str, hardlink: bool = False, **metadata) -> bool:
+        if not isinstance(store, S3Store):
+            return super().copy_from(store, file_id, hardlink=hardlink, **metadata)
+        if self.exists(file_id):
+            return False
+        source = store.metadata(file_id)
+        metadata = self._metadata(
+            file_id, source["extension"], source["size"], {**user_metadata(source), **metadata}
+        )
+        # Cópia no servidor (em partes acima de multipart_threshold); nada passa pelo worker
+        self.client.copy(
+            {"Bucket": store.bucket, "Key": store._key(file_id)},
+            self.bucket,
+            self._key(file_id),
+            ExtraArgs={"MetadataDirective": "REPLACE", **self._extra_args(metadata)},
+            Config=self._transfer_config(),
+        )
+        return True
+
+    def url(self, file_id: str, filename: str) -> str | None:
+        if not self.presigned_expires:
+            return None
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._key(file_id),
+                "ResponseContentDisposition": f"attachment; filename*=UTF-8''{quote(filename)}",
+                "ResponseContentType": _content_type(os.path.splitext(filename)[1]),
+            },
+            ExpiresIn=self.presigned_expires,
+        )
+
+
+def _content_type(extension: str) -> str:
+    extension = extension.lstrip(".").lower()
+    return (
+        MIMETYPES.get(extension)
+        or mimetypes.types_map.get(f".{extension}")
+        or "application/octet-stream"
+    )
@@ -0,0 +1,234 @@
+"""
+Registry de sessões do rembg compartilhado pelo processo inteiro.
+
+Carregar o modelo ONNX é a parte mais cara de uma requisição, então cada
+combinação (modelo, providers) é criada uma única vez por processo e reutilizada
+por todas as threads.
+"""
+
+import os
+import platform
+import threading
+import time
+
+from loguru import logger
+
+from util.constants import (
+    DEFAULT_MODEL,
+    ORT_CPU_MEM_ARENA,
+    ORT_EXECUTION_MODE,
+    ORT_GRAPH_OPTIMIZATION,
+    ORT_INTER_OP_THREADS,
+    ORT_INTRA_OP_THREADS,
+    ORT_MEM_PATTERN,
+    ORT_OPTIMIZED_MODEL_DIR,
+    QUANTIZED_MODEL_DIR,
+)
+
+QUANTIZED_SUFFIX = "-int8"
+
+EXECUTION_MODES = {"sequential": "ORT_SEQUENTIAL", "parallel": "ORT_PARALLEL"}
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+def session_options(
+    intra_op_threads: int = ORT_INTRA_OP_THREADS,
+    inter_op_threads: int = ORT_INTER_OP_THREADS,
+    execution_mode: str = ORT_EXECUTION_MODE,
+    graph_optimization: str = ORT_GRAPH_OPTIMIZATION,
+    cpu_mem_arena: bool = ORT_CPU_MEM_ARENA,
+    mem_pattern: bool = ORT_MEM_PATTERN,
+):
+    """SessionOptions do onnxruntime montadas a partir da configuração."""
+    import onnxruntime as ort
+
+    if execution_mode not in EXECUTION_MODES:
+        raise ValueError(
+            f"Invalid ORT execution mode: {execution_mode}. "
+            f"Allowed: {', '.join(EXECUTION_MODES)}"
+        )
+    if graph_optimization not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(
+            f"Invalid ORT graph optimization level: {graph_optimization}. "
+            f"Allowed: {', '.join(GRAPH_OPTIMIZATION_LEVELS)}"
+        )
+
+    sess_opts = ort.SessionOptions()
+    # Mesmo comportamento do rembg.new_session quando não há valor explícito
+    omp_threads = int(os.environ.get("OMP_NUM_THREADS", 0))
+    if intra_op_threads or omp_threads:
+        sess_opts.intra_op_num_threads = intra_op_threads or omp_threads
+    if inter_op_threads or omp_threads:
+        sess_opts.inter_op_num_threads = inter_op_threads or omp_threads
+    sess_opts.execution_mode = getattr(
+        ort.ExecutionMode, EXECUTION_MODES[execution_mode]
+    )
+    sess_opts.graph_optimization_level = getattr(
+        ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[graph_optimization]
+    )
+    sess_opts.enable_cpu_mem_arena = cpu_mem_arena
+    sess_opts.enable_mem_pattern = mem_pattern
+    return sess_opts
+
+
+def optimized_model_path(
+    model_name: str,
+    directory: str = ORT_OPTIMIZED_MODEL_DIR,
+    graph_optimization: str = ORT_GRAPH_OPTIMIZATION,
+) -> str:
+    """
+    Caminho do modelo otimizado em cache. O nível "all" gera operadores
+    específicos do hardware, então a versão do onnxruntime, a arquitetura e o
+    dispositivo (CPU ou GPU, que define os providers da sessão do rembg)
+    fazem parte do nome: um grafo otimizado para CUDA não é carregado na CPU.
+    """
+    import onnxruntime as ort
+
+    name = (
+        f"{model_name}-{graph_optimization}-ort{ort.__version__}"
+        f"-{platform.machine()}-{ort.get_device().lower()}"
+    )
+    return os.path.join(directory, f"{name}.onnx")
+
+
+def base_model(model_name: str) -> str:
+    """Modelo de origem de uma variante quantizada (u2net-int8 -> u2net)."""
+    if model_name.endswith(QUANTIZED_SUFFIX):
+        return model_name[: -len(QUANTIZED_SUFFIX)]
+    return model_name
+
+
+def quantized_model_path(model_name: str, directory: str = QUANTIZED_MODEL_DIR) -> str:
+    return os.path.join(directory, f"{model_name}.onnx")
+
+
+def _with_model_path(session_class, model_path: str):
+    """Subclasse da sessão do rembg que carrega `model_path` em vez do modelo baixado."""
+
+    class CachedModelSession(session_class):
+        @classmethod
+        def download_models(cls, *args, **kwargs):
+            return model_path
+
+    CachedModelSession.__name__ = session_class.__name__
+    return CachedModelSession
+
+
+def _create_session(model_name: str, providers: tuple = ()):
+    """Cria uma sessão do rembg para o modelo informado."""
+    from rembg.sessions import sessions
+
+    session_class = sessions.get(base_model(model_name))
+    if session_class is None:
+        raise ValueError(f"Unknown model: {model_name}")
+    if model_name != base_model(model_name):
+        # Variante INT8: mesma sessão (pré e pós-processamento) com outro arquivo
+        model_path = quantized_model_path(model_name, QUANTIZED_MODEL_DIR)
+        if not os.path.exists(model_path):
+            raise ValueError(
+                f"Quantized model not found: {model_path}. "
+                f"Generate it with python -m util.quantize --model {base_model(model_name)}"
+            )
+        session_class = _with_model_path(session_class, model_path)
+
+    sess_opts = session_options()
+    tmp_path = None
+    if ORT_OPTIMIZED_MODEL_DIR:
+        cached_path = optimized_model_path(model_name, ORT_OPTIMIZED_MODEL_DIR)
+        if os.path.exists(cached_path):
+            # O grafo já está otimizado: só carrega
+            session_class = _with_model_path(session_class, cached_path)
+            sess_opts = session_options(graph_optimization="disable")
+        else:
+            os.makedirs(ORT_OPTIMIZED_MODEL_DIR, exist_ok=True)
+            tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+            sess_opts.optimized_model_filepath = tmp_path
+
+    session = session_class(model_name, sess_opts)
+    if tmp_path is not None and os.path.exists(tmp_path):
+        # Vários workers podem otimizar ao mesmo tempo; a troca é atômica
+        os.replace(tmp_path, cached_path)
+        logger.info(f"Optimized model {model_name} saved to {cached_path}")
+    if providers and list(providers) != session.inner_session.get_providers():
+        session.inner_session.set_providers(list(providers))
+    return session
+
+
+class SessionRegistry:
+    def __init__(self, factory=_create_session):
+        self._factory = factory
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._stats = {"hits": 0, "misses": 0, "loads": {}}
+
+    @staticmethod
+    def _key(model_name: str, providers) -> tuple:
+        return (model_name, tuple(providers or ()))
+
+    def get(self, model_name: str = DEFAULT_MODEL, providers=None):
+        """Retorna a sessão em cache, carregando o modelo na primeira chamada."""
+        key = self._key(model_name, providers)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._stats["hits"] += 1
+                return session
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Um lock por chave: threads pedindo o mesmo modelo esperam um único
+        # carregamento, sem bloquear o acesso a modelos já carregados.
+        with key_lock:
+            with self._lock:
+                session = self._sessions.get(key)
+                if session is not None:
+                    self._stats["hits"] += 1
+                    return session
+                self._stats["misses"] += 1
+
+            start_time = time.perf_counter()
+            session = self._factory(*key)
+            elapsed = time.perf_counter() - start_time
+
+            with self._lock:
+                self._sessions[key] = session
+                load = self._stats["loads"].setdefault(
+                    self._label(key), {"count": 0, "seconds": 0.0}
+                )
+                load["count"] += 1
+                load["seconds"] = round(elapsed, 4)
+            logger.info(f"Model {model_name} loaded in {elapsed:.2f} seconds")
+            return session
+
+    @staticmethod
+    def _label(key: tuple) -> str:
+        model_name, providers = key
+        return f"{model_name}[{','.join(providers)}]" if providers else model_name
+
+    def stats(self) -> dict:
+        """Contadores de hit/miss e tempo de carga de cada modelo."""
+        with self._lock:
+            return {
+                "hits": self._stats["hits"],
+                "misses": self._stats["misses"],
+                "loaded": sorted(self._label(key) for key in self._sessions),
+                "loads": {name: dict(load) for name, load in self._stats["loads"].items()},
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self._key_locks.clear()
+            self._stats = {"hits": 0, "misses": 0, "loads": {}}
+
+
+registry = SessionRegistry()
+
+
+def get_session(model_name: str = DEFAULT_MODEL, providers=None):
+    return registry.get(model_name, providers)
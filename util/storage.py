@@ -0,0 +1,384 @@
+"""
+Armazenamento das entradas e dos resultados por id.
+
+Nas entradas o id é o sha256 dos bytes, então o mesmo arquivo enviado duas
+vezes, com qualquer nome, é gravado uma vez só. Nos resultados o id é a chave
+do cache (entrada, operação e parâmetros): repetir uma requisição chega ao mesmo
+arquivo em vez de sobrescrever o de outra com o mesmo nome.
+
+Store é a interface comum dos backends, escolhido por STORAGE_BACKEND:
+- FileStore (local): cada arquivo fica em <diretório>/ab/cd/<id>.<extensão>,
+  com o id distribuído em dois níveis de diretórios pelos primeiros
+  caracteres, para que nenhum diretório cresça com o volume. Os metadados (nome
+  original, tamanho, ...) ficam ao lado, em <id>.json, gravado por último: um
+  id só existe depois que o arquivo está completo. O mtime do <id>.json marca o
+  último acesso (touch), usado pela retenção (util.retention).
+- MemoryStore (memory): dicionário no processo, para testes e desenvolvimento.
+- S3Store (s3, em util.s3): qualquer serviço compatível com S3, compartilhado
+  entre máquinas.
+
+As gravações passam por um arquivo local (temp_file/put_file), então uploads
+e resultados grandes não precisam estar inteiros em memória para ir a um
+backend remoto; as leituras são em stream (open), a partir de um offset
+quando só um trecho é pedido (RangeReader, para os downloads com Range).
+local_path é o caminho no disco quando o backend tem um, e url um link direto
+(pré-assinado) para o download.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+
+from util.cache import file_etag
+from util.constants import PATH_INPUT, PATH_ORIGINALS, PATH_OUTPUT, STORAGE_BACKEND
+
+ID_PATTERN = re.compile(r"[0-9a-f]{64}")
+CHUNK_SIZE = 1024 * 1024
+# Campos preenchidos pelo próprio store em cada gravação
+STORE_FIELDS = ("id", "extension", "size", "created")
+
+
+def validate_id(file_id: str) -> str:
+    if not isinstance(file_id, str) or not ID_PATTERN.fullmatch(file_id):
+        raise ValueError(f"Invalid file id: {file_id}")
+    return file_id
+
+
+class Store:
+    """Operações comuns; os backends implementam metadata, put_file, open e remove."""
+
+    def __init__(self, temp_dir: str | None = None):
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+
+    def metadata(self, file_id: str) -> dict:
+        """Metadados gravados com o arquivo; FileNotFoundError se o id não existe."""
+        raise NotImplementedError
+
+    def exists(self, file_id: str) -> bool:
+        try:
+            self.metadata(file_id)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put_file(self, file_id: str, temp_path: str, extension: str, **metadata) -> bool:
+        """
+        Move o arquivo `temp_path` (de temp_file) para o id, com os metadados. Se
+        o id já existe o arquivo novo é descartado (e conta como acesso ao id);
+        retorna se ele foi gravado.
+        """
+        raise NotImplementedError
+
+    def open(self, file_id: str, start: int = 0):
+        """
+        Arquivo binário para leitura em stream a partir do byte `start`;
+        FileNotFoundError se o id não existe.
+        """
+        raise NotImplementedError
+
+    def remove(self, file_id: str) -> int:
+        """Remove o id; retorna os bytes liberados."""
+        raise NotImplementedError
+
+    def touch(self, file_id: str) -> None:
+        """Registra um acesso ao id (só onde a retenção usa)."""
+
+    def local_path(self, file_id: str) -> str | None:
+        """Caminho do arquivo no disco local, se o backend guarda nele."""
+        return None
+
+    def url(self, file_id: str, filename: str) -> str | None:
+        """URL temporária para baixar direto do backend, se ele oferece."""
+        return None
+
+    def etag(self, file_id: str) -> str:
+        """sha256 do conteúdo, para o ETag e as URLs versionadas do download."""
+        return self.metadata(file_id).get("sha256", file_id)
+
+    def temp_file(self):
+        """Arquivo temporário local (no mesmo sistema de arquivos, no FileStore), para put_file."""
+        os.makedirs(self.temp_dir, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=self.temp_dir, prefix=".tmp-", delete=False)
+
+    def put(self, file_id: str, data: bytes, extension: str, **metadata) -> bool:
+        """Grava `data` no id, se ainda não existe; retorna se gravou."""
+        if self.exists(file_id):
+            self.touch(file_id)
+            return False
+        with self.temp_file() as f:
+            f.write(data)
+        metadata.setdefault("sha256", hashlib.sha256(data).hexdigest())
+        return self.put_file(file_id, f.name, extension, **metadata)
+
+    def copy(
+        self, file_id: str, path: str, extension: str, hardlink: bool = False, **metadata
+    ) -> bool:
+        """
+        Grava uma cópia do arquivo local em `path` no id, se ainda não existe. Com
+        `hardlink` o FileStore aponta o id para o mesmo arquivo, sem ocupar
+        espaço de novo (cópia se `path` está em outro sistema de arquivos).
+        """
+        if self.exists(file_id):
+            self.touch(file_id)
+            return False
+        with self.temp_file() as f:
+            if not (hardlink and _link(path, f.name)):
+                with open(path, "rb") as src:
+                    shutil.copyfileobj(src, f, CHUNK_SIZE)
+        return self.put_file(file_id, f.name, extension, **metadata)
+
+    def copy_from(self, store: "Store", file_id: str, hardlink: bool = False, **metadata) -> bool:
+        """
+        Copia o id de outro store, com a mesma extensão e os mesmos metadados
+        (`metadata` sobrepõe campos); retorna se gravou.
+        """
+        if self.exists(file_id):
+            self.touch(file_id)
+            return False
+        source = store.metadata(file_id)
+        metadata = {**user_metadata(source), **metadata}
+        path = store.local_path(file_id)
+        if path is not None:
+            return self.copy(file_id, path, source["extension"], hardlink=hardlink, **metadata)
+        with self.temp_file() as f, store.open(file_id) as src:
+            shutil.copyfileobj(src, f, CHUNK_SIZE)
+        return self.put_file(file_id, f.name, source["extension"], **metadata)
+
+    @staticmethod
+    def _metadata(file_id: str, extension: str, size: int, metadata: dict) -> dict:
+        return {
+            **metadata,
+            "id": file_id,
+            "extension": extension,
+            "size": size,
+            "created": time.time(),
+        }
+
+
+class FileStore(Store):
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self.directory = directory
+
+    def _base(self, file_id: str) -> str:
+        validate_id(file_id)
+        return os.path.join(self.directory, file_id[:2], file_id[2:4], file_id)
+
+    def metadata(self, file_id: str) -> dict:
+        try:
+            with open(f"{self._base(file_id)}.json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"File not found: {file_id}") from None
+
+    def path(self, file_id: str) -> str:
+        return f"{self._base(file_id)}.{self.metadata(file_id)['extension']}"
+
+    def local_path(self, file_id: str) -> str:
+        return self.path(file_id)
+
+    def exists(self, file_id: str) -> bool:
+        return os.path.exists(f"{self._base(file_id)}.json")
+
+    def open(self, file_id: str, start: int = 0):
+        f = open(self.path(file_id), "rb")
+        f.seek(start)
+        return f
+
+    def etag(self, file_id: str) -> str:
+        metadata = self.metadata(file_id)
+        if "sha256" in metadata:
+            return metadata["sha256"]
+        # Gravado sem o sha256 nos metadados: calculado do arquivo
+        return file_etag(f"{self._base(file_id)}.{metadata['extension']}")
+
+    def touch(self, file_id: str) -> None:
+        """Registra um acesso ao id (mtime do .json; o do arquivo fica intacto)."""
+        try:
+            os.utime(f"{self._base(file_id)}.json")
+        except FileNotFoundError:
+            pass
+
+    def last_access(self, file_id: str) -> float | None:
+        try:
+            return os.stat(f"{self._base(file_id)}.json").st_mtime
+        except FileNotFoundError:
+            return None
+
+    def remove(self, file_id: str) -> int:
+        # Primeiro o .json, então o id deixa de existir na hora
+        base = self._base(file_id)
+        try:
+            metadata = self.metadata(file_id)
+        except (FileNotFoundError, ValueError):
+            metadata = {}
+        freed = 0
+        paths = [f"{base}.json"]
+        if "extension" in metadata:
+            paths.append(f"{base}.{metadata['extension']}")
+        for path in paths:
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        return freed
+
+    def put_file(self, file_id: str, temp_path: str, extension: str, **metadata) -> bool:
+        try:
+            base = self._base(file_id)
+            if self.exists(file_id):
+                self.touch(file_id)
+                return False
+            os.makedirs(os.path.dirname(base), exist_ok=True)
+            os.replace(temp_path, f"{base}.{extension}")
+            metadata = self._metadata(
+                file_id, extension, os.path.getsize(f"{base}.{extension}"), metadata
+            )
+            with self.temp_file() as f:
+                temp_path = f.name
+                f.write(json.dumps(metadata).encode())
+            os.replace(temp_path, f"{base}.json")
+            return True
+        finally:
+            _remove(temp_path)
+
+
+class MemoryStore(Store):
+    """Arquivos num dicionário, visíveis só no processo atual."""
+
+    def __init__(self, temp_dir: str | None = None):
+        super().__init__(temp_dir)
+        self._lock = threading.Lock()
+        self._files = {}  # id -> (bytes, metadados)
+
+    def _get(self, file_id: str) -> tuple:
+        validate_id(file_id)
+        with self._lock:
+            if file_id not in self._files:
+                raise FileNotFoundError(f"File not found: {file_id}")
+            return self._files[file_id]
+
+    def metadata(self, file_id: str) -> dict:
+        return dict(self._get(file_id)[1])
+
+    def open(self, file_id: str, start: int = 0):
+        f = io.BytesIO(self._get(file_id)[0])
+        f.seek(start)
+        return f
+
+    def remove(self, file_id: str) -> int:
+        validate_id(file_id)
+        with self._lock:
+            data, _ = self._files.pop(file_id, (b"", None))
+        return len(data)
+
+    def put_file(self, file_id: str, temp_path: str, extension: str, **metadata) -> bool:
+        try:
+            validate_id(file_id)
+            with open(temp_path, "rb") as f:
+                data = f.read()
+            metadata = self._metadata(file_id, extension, len(data), metadata)
+            with self._lock:
+                if file_id in self._files:
+                    return False
+                self._files[file_id] = (data, metadata)
+            return True
+        finally:
+            _remove(temp_path)
+
+
+class RangeReader(io.RawIOBase):
+    """
+    Leitura de um id com seek: o stream do backend só é aberto na primeira
+    leitura, a partir do offset atual (no S3, um GET com Range), então pular
+    para o meio do arquivo não baixa o começo.
+    """
+
+    def __init__(self, store: Store, file_id: str):
+        super().__init__()
+        self.store = store
+        self.file_id = file_id
+        self._offset = 0
+        self._stream = None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._offset
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence != io.SEEK_SET:
+            raise io.UnsupportedOperation("Only absolute seeks are supported")
+        if offset != self._offset:
+            self._close_stream()
+            self._offset = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        if self._stream is None:
+            self._stream = self.store.open(self.file_id, self._offset)
+        data = self._stream.read(len(buffer))
+        buffer[: len(data)] = data
+        self._offset += len(data)
+        return len(data)
+
+    def _close_stream(self) -> None:
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+
+    def close(self) -> None:
+        self._close_stream()
+        super().close()
+
+
+def user_metadata(metadata: dict) -> dict:
+    """Metadados sem os campos que o store preenche."""
+    return {key: value for key, value in metadata.items() if key not in STORE_FIELDS}
+
+
+def _link(source: str, temp_path: str) -> bool:
+    """Troca o temporário vazio por um hardlink de `source`; False se não for possível."""
+    try:
+        os.link(source, f"{temp_path}.link")
+    except OSError:
+        # Outro sistema de arquivos (EXDEV) ou sem suporte a hardlinks
+        return False
+    os.replace(f"{temp_path}.link", temp_path)
+    return True
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def create_store(directory: str, name: str) -> Store:
+    """Store do STORAGE_BACKEND: `directory` no local, `name` como prefixo no S3."""
+    if STORAGE_BACKEND == "s3":
+        from util.s3 import S3Store
+
+        return S3Store(prefix=f"{name}/")
+    if STORAGE_BACKEND == "memory":
+        return MemoryStore()
+    if STORAGE_BACKEND != "local":
+        raise ValueError(f"Invalid storage backend: {STORAGE_BACKEND}")
+    return FileStore(directory)
+
+
+uploads = create_store(PATH_INPUT, "entrada")
+outputs = create_store(PATH_OUTPUT, "saida")
+originals = create_store(PATH_ORIGINALS, "originais")
@@ -0,0 +1,122 @@
+"""
+Aplicação da máscara e composição do fundo em faixas horizontais.
+
+O caminho direto (naive_cutout + Image.new + alpha_composite) mantém várias
+cópias RGBA da imagem inteira ao mesmo tempo. Aqui cada faixa de
+COMPOSITE_TILE_ROWS linhas passa pelas mesmas operações do Pillow, que são
+por pixel, então o resultado é idêntico; além da entrada e da máscara só uma
+faixa RGBA fica em memória. O PNG pode ser escrito faixa a faixa (write_png),
+sem montar a imagem de saída: o encoder zip do Pillow só comprime uma imagem
+inteira (e um tile por faixa abriria um stream zlib por faixa, o que o PNG não
+permite), então só os dados das faixas são comprimidos aqui; os chunks são
+escritos com o putchunk do Pillow, e perfil de cor e dpi da entrada vão junto.
+"""
+
+import struct
+import zlib
+
+import numpy as np
+from PIL import Image
+from PIL.PngImagePlugin import putchunk
+
+from util.constants import COMPOSITE_TILE_ROWS
+from util.encoding import source_metadata
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def composite_strips(
+    image: Image.Image,
+    mask: Image.Image,
+    color=None,
+    rows: int = COMPOSITE_TILE_ROWS,
+):
+    """Gera as faixas RGBA do recorte (e do fundo `color`, se informado), de cima para baixo."""
+    width, height = image.size
+    for top in range(0, height, rows):
+        box = (0, top, width, min(top + rows, height))
+        strip = image.crop(box)
+        # Igual ao rembg.bg.naive_cutout, restrito à faixa
+        cutout = Image.composite(strip, Image.new("RGBA", strip.size, 0), mask.crop(box))
+        if color is None:
+            yield cutout
+        else:
+            output = Image.new(mode="RGBA", size=strip.size, color=color)
+            output.alpha_composite(cutout)
+            yield output
+
+
+def composite(
+    image: Image.Image,
+    mask: Image.Image,
+    color=None,
+    rows: int = COMPOSITE_TILE_ROWS,
+) -> Image.Image:
+    """Imagem RGBA completa montada a partir das faixas."""
+    output = Image.new("RGBA", image.size)
+    output.info.update(source_metadata(image))
+    top = 0
+    for strip in composite_strips(image, mask, color, rows):
+        output.paste(strip, (0, top))
+        top += strip.size[1]
+    return output
+
+
+def _filter_rows(rows: np.ndarray, previous: np.ndarray, bpp: int) -> bytes:
+    """
+    Filtra as linhas (h, w*bpp) com None, Sub ou Up, o que der a menor soma
+    absoluta em cada linha, e prefixa o tipo do filtro como pede o PNG.
+    """
+    sub = rows.copy()
+    sub[:, bpp:] -= rows[:, :-bpp]  # uint8, com wraparound
+    up = rows.copy()
+    up[0] -= previous
+    up[1:] -= rows[:-1]
+
+    filtered = np.empty((rows.shape[0], rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 0
+    filtered[:, 1:] = rows
+    # Heurística do próprio libpng; abs(-128) estoura em int8, o que só afeta
+    # a escolha do filtro, nunca o resultado
+    best = np.abs(rows.view(np.int8)).sum(axis=1, dtype=np.int64)
+    for filter_type, candidate in ((1, sub), (2, up)):
+        score = np.abs(candidate.view(np.int8)).sum(axis=1, dtype=np.int64)
+        better = score < best
+        best[better] = score[better]
+        filtered[better, 0] = filter_type
+        filtered[better, 1:] = candidate[better]
+    return filtered.tobytes()
+
+
+def write_png(
+    strips,
+    size: tuple,
+    fp,
+    compression: int = 6,
+    icc_profile: bytes | None = None,
+    dpi: tuple | None = None,
+) -> None:
+    """
+    Escreve um PNG RGBA de 8 bits em `fp` a partir das faixas, sem montar a
+    imagem. `icc_profile` e `dpi` viram os chunks iCCP e pHYs, como no Image.save.
+    """
+    width, height = size
+    fp.write(PNG_SIGNATURE)
+    putchunk(fp, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+    if icc_profile:
+        putchunk(fp, b"iCCP", b"ICC Profile\0\0" + zlib.compress(icc_profile))
+    if dpi:
+        # pHYs em pixels por metro, arredondado como o PngImagePlugin
+        ppm = [int(value / 0.0254 + 0.5) for value in dpi]
+        putchunk(fp, b"pHYs", struct.pack(">IIB", *ppm, 1))
+
+    compressor = zlib.compressobj(compression)
+    previous = np.zeros(width * 4, dtype=np.uint8)
+    for strip in strips:
+        rows = np.asarray(strip.convert("RGBA")).reshape(strip.size[1], width * 4)
+        data = compressor.compress(_filter_rows(rows, previous, 4))
+        if data:
+            putchunk(fp, b"IDAT", data)
+        previous = rows[-1]
+    putchunk(fp, b"IDAT", compressor.flush())
+    putchunk(fp, b"IEND", b"")
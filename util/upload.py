@@ -0,0 +1,225 @@
+"""
+Upload de imagens em streaming.
+
+O corpo multipart é lido em blocos de CHUNK_SIZE e o arquivo vai para o disco
+enquanto chega, sem o buffer completo do Werkzeug (request.files) nem a cópia
+do file.save(); o sha256 calculado no caminho vira o id do arquivo no
+armazenamento (util.storage). Só os primeiros bytes ficam em memória, até o cabeçalho da
+imagem ser lido: a assinatura (PNG ou JPEG) precisa bater com a extensão e as
+dimensões com MAX_IMAGE_PIXELS, senão o upload é recusado sem ler o resto do
+corpo. O tamanho total é limitado pelo MAX_CONTENT_LENGTH da app, aplicado pelo
+próprio request.stream (RequestEntityTooLarge, 413).
+"""
+
+import hashlib
+import os
+import re
+import struct
+
+from werkzeug.sansio.multipart import (
+    Data,
+    Epilogue,
+    Field,
+    File,
+    MultipartDecoder,
+    NeedData,
+)
+
+from util.constants import ALLOWED_EXTENSIONS, MAX_IMAGE_PIXELS
+from util.storage import FileStore
+
+CHUNK_SIZE = 64 * 1024
+# O cabeçalho do JPEG vem depois dos segmentos EXIF/ICC; sem SOF até aqui o
+# arquivo é recusado
+HEADER_MAX_BYTES = 512 * 1024
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+# extensão -> formato esperado no conteúdo
+EXTENSION_FORMATS = {"png": "PNG", "jpg": "JPEG", "jpeg": "JPEG"}
+# formato -> extensão do arquivo armazenado
+FORMAT_EXTENSIONS = {"PNG": "png", "JPEG": "jpg"}
+# Marcadores SOF (início do quadro, com as dimensões), exceto DHT, JPG e DAC
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Marcadores sem campo de tamanho
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD9)}
+# filename entre aspas no Content-Disposition, sem decodificar escapes
+FILENAME_PATTERN = re.compile(r'filename="([^"]*)"', re.IGNORECASE)
+
+
+def read_header(head: bytes):
+    """
+    (formato, largura, altura) a partir dos primeiros bytes da imagem, ou None
+    se ainda faltam bytes. ValueError se o conteúdo não for PNG nem JPEG.
+    """
+    if head[:8] == PNG_SIGNATURE:
+        if len(head) < 24:
+            return None
+        if head[12:16] != b"IHDR":
+            raise ValueError("The file is not a valid image")
+        width, height = struct.unpack(">II", head[16:24])
+        return "PNG", width, height
+    if head[:3] == JPEG_SIGNATURE:
+        return _jpeg_header(head)
+    if PNG_SIGNATURE.startswith(head) or JPEG_SIGNATURE.startswith(head):
+        return None
+    raise ValueError("The file is not a valid image")
+
+
+def _jpeg_header(head: bytes):
+    """Percorre os segmentos do JPEG até o SOF, que traz as dimensões."""
+    position = 2
+    while True:
+        if position + 2 > len(head):
+            return None
+        if head[position] != 0xFF:
+            raise ValueError("The file is not a valid image")
+        marker = head[position + 1]
+        if marker == 0xFF:  # preenchimento antes do marcador
+            position += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker == 0xDA:  # início dos dados sem um SOF antes
+            raise ValueError("The file is not a valid image")
+        if marker in JPEG_SOF_MARKERS:
+            if position + 9 > len(head):
+                return None
+            height, width = struct.unpack(">HH", head[position + 5 : position + 9])
+            return "JPEG", width, height
+        if position + 4 > len(head):
+            return None
+        (length,) = struct.unpack(">H", head[position + 2 : position + 4])
+        position += 2 + length
+
+
+def check_header(head: bytes, extension: str, max_pixels: int = MAX_IMAGE_PIXELS):
+    """Confere formato e dimensões; None se ainda faltam bytes, ValueError se inválido."""
+    header = read_header(head)
+    if header is None:
+        if len(head) >= HEADER_MAX_BYTES:
+            raise ValueError("The file is not a valid image")
+        return None
+    image_format, width, height = header
+    if EXTENSION_FORMATS[extension] != image_format:
+        raise ValueError(f"File content ({image_format}) does not match its extension")
+    if width == 0 or height == 0:
+        raise ValueError("The file is not a valid image")
+    if width * height > max_pixels:
+        raise ValueError(f"Image too large: {width}x{height} (max {max_pixels} pixels)")
+    return header
+
+
+class _ImageWriter:
+    """Grava a parte do arquivo num temporário, validando o cabeçalho primeiro."""
+
+    def __init__(self, store: FileStore, extension: str, max_pixels: int):
+        self.store = store
+        self.extension = extension
+        self.max_pixels = max_pixels
+        self.head = b""
+        self.header = None
+        self.digest = hashlib.sha256()
+        self.file = store.temp_file()
+
+    def write(self, data: bytes) -> None:
+        if self.header is None:
+            self.head += data
+            self.header = check_header(self.head, self.extension, self.max_pixels)
+            if self.header is None:
+                return
+            data, self.head = self.head, b""
+        self.digest.update(data)
+        self.file.write(data)
+
+    def finish(self, filename: str) -> str:
+        """Move o arquivo para o armazenamento; retorna o id (sha256)."""
+        if self.header is None:
+            check_header(self.head, self.extension, self.max_pixels)
+            raise ValueError("The file is not a valid image")
+        self.file.close()
+        image_format, width, height = self.header
+        file_id = self.digest.hexdigest()
+        # Mesmo conteúdo já enviado: o temporário é descartado e fica o primeiro
+        self.store.put_file(
+            file_id,
+            self.file.name,
+            FORMAT_EXTENSIONS[image_format],
+            filename=filename,
+            format=image_format,
+            width=width,
+            height=height,
+        )
+        return file_id
+
+    def discard(self) -> None:
+        self.file.close()
+        try:
+            os.remove(self.file.name)
+        except FileNotFoundError:
+            pass
+
+
+def client_filename(event: File) -> str:
+    """
+    Nome do arquivo enviado, sem os diretórios de Windows ou Unix. Navegadores
+    antigos mandam o caminho (C:\\fotos\\foto.jpg) com "\\" literal, que o
+    Werkzeug descarta como escape; nesse caso vale o valor cru do cabeçalho.
+    """
+    match = FILENAME_PATTERN.search(event.headers.get("Content-Disposition", ""))
+    raw = match.group(1) if match else ""
+    filename = raw if "\\" in raw else (event.filename or "")
+    return filename.replace("\\", "/").rsplit("/", 1)[-1]
+
+
+def save_upload(
+    stream,
+    boundary: bytes,
+    store: FileStore,
+    field: str = "file",
+    chunk_size: int = CHUNK_SIZE,
+    max_pixels: int = MAX_IMAGE_PIXELS,
+) -> tuple:
+    """
+    Lê o corpo multipart de `stream` e grava a parte `field` em `store`.
+    Retorna (id, nome original do arquivo); ValueError se a parte faltar ou o
+    arquivo for recusado.
+    """
+    decoder = MultipartDecoder(boundary)
+    writer = None
+    skipping = True  # dados de outras partes são descartados
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            decoder.receive_data(chunk or None)
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, File) and event.name == field and writer is None:
+                    filename = client_filename(event)
+                    if filename == "":
+                        raise ValueError("No file selected for uploading")
+                    extension = filename.rsplit(".", 1)[-1].lower()
+                    if "." not in filename or extension not in ALLOWED_EXTENSIONS:
+                        raise ValueError(
+                            "Invalid file extension. Allowed: png, jpg, jpeg"
+                        )
+                    writer = _ImageWriter(store, extension, max_pixels)
+                    skipping = False
+                elif isinstance(event, (Field, File)):
+                    if event.name == field and writer is None:
+                        raise ValueError("No file selected for uploading")
+                    skipping = True
+                elif isinstance(event, Data) and not skipping:
+                    writer.write(event.data)
+                    if not event.more_data:
+                        file_id = writer.finish(filename)
+                        # O resto do corpo não interessa
+                        return file_id, filename
+                event = decoder.next_event()
+            if not chunk:
+                raise ValueError("No file part in the request")
+    except BaseException:
+        if writer is not None:
+            writer.discard()
+        raise
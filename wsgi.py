@@ -1,4 +1,5 @@
 from util import api
+from util.preload_models import preload_models, startup_models
 from util.setup_dirs import setup_directories
 
 app = api.app
@@ -6,5 +7,9 @@ app = api.app
 # Ensure directories exist
 setup_directories()
 
+# Warm the session registry of this worker before it accepts requests; the
+# other allowed models load on their first request
+preload_models(startup_models())
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000)